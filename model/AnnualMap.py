@@ -9,6 +9,7 @@ from core.model.GeospatialImageFile import GeospatialImageFile
 from modis_water.model.BandReader import BandReader
 from modis_water.model.Classifier import Classifier
 from modis_water.model.Utils import Utils
+from modis_water.model.ValidRegion import ValidRegion
 
 
 # -----------------------------------------------------------------------------
@@ -26,9 +27,19 @@ class AnnualMap(object):
                        sensor, 
                        classifierName, 
                        logger,
-                       bandReader: BandReader):
+                       bandReader: BandReader,
+                       validRegion: ValidRegion = None):
+
+        # ---
+        # With a valid region, only its window of each day is read and
+        # accumulated.  The rest of each result is no data.
+        # ---
+        if validRegion:
+            shape = validRegion.getShape()
+
+        else:
+            shape = (bandReader.getCols(), bandReader.getRows())
 
-        shape = (bandReader.getCols(), bandReader.getRows())
         sumWater = np.zeros(shape, dtype=np.int16)
         sumLand = np.zeros(shape, dtype=np.int16)
         sumBad = np.zeros(shape, dtype=np.int16)
@@ -68,7 +79,8 @@ class AnnualMap(object):
                                             sumWater,
                                             sumLand,
                                             sumBad,
-                                            logger)
+                                            logger,
+                                            validRegion)
             else:
                 if logger:
                     logger.info('Excluding day ' + str(day))
@@ -84,6 +96,12 @@ class AnnualMap(object):
                         Classifier.WATER,
                         Classifier.LAND).astype(np.int16)
 
+        if validRegion:
+
+            sumWater, sumLand, sumObs, probWater, mask = \
+                [validRegion.expand(raster, Classifier.NO_DATA)
+                 for raster in (sumWater, sumLand, sumObs, probWater, mask)]
+
         return sumWater, sumLand, sumObs, probWater, mask
 
     # -------------------------------------------------------------------------
@@ -91,7 +109,8 @@ class AnnualMap(object):
     # -------------------------------------------------------------------------
     @staticmethod
     def accumulateDay(dailyDir, year, day, tile, sensor, classifierName,
-                      sumWater, sumLand, sumBad, logger):
+                      sumWater, sumLand, sumBad, logger,
+                      validRegion: ValidRegion = None):
 
         # Read the daily probability image.
         imageName = \
@@ -102,7 +121,18 @@ class AnnualMap(object):
         if os.path.exists(imageName):
 
             ds = gdal.Open(imageName)
-            image = ds.ReadAsArray()
+
+            if validRegion:
+
+                rowStart, rowEnd, colStart, colEnd = validRegion.getWindow()
+
+                image = ds.ReadAsArray(colStart,
+                                       rowStart,
+                                       colEnd - colStart,
+                                       rowEnd - rowStart)
+
+            else:
+                image = ds.ReadAsArray()
 
             sumWater += np.where(image == Classifier.WATER, 1, 0)
             sumLand += np.where(image == Classifier.LAND, 1, 0)
@@ -126,7 +156,8 @@ class AnnualMap(object):
                         classifierName, 
                         logger,
                         bandReader: BandReader,
-                        georeferenced=False):
+                        georeferenced=False,
+                        validRegion: ValidRegion = None):
 
         sumWater, sumLand, sumObs, probWater, mask = \
             AnnualMap.accumulateDays(dailyDir,
@@ -135,7 +166,8 @@ class AnnualMap(object):
                                      sensor,
                                      classifierName,
                                      logger,
-                                     bandReader)
+                                     bandReader,
+                                     validRegion)
                                      
         if georeferenced:
             
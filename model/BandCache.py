@@ -0,0 +1,252 @@
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+
+import numpy as np
+
+
+# -----------------------------------------------------------------------------
+# class BandCache
+#
+# An on-disk cache of decoded bands, so reruns over the same granules skip
+# the HDF decode.  Each entry is a raw .npy file, with a small .json file
+# holding the geotransform and projection.  The key covers the granule path,
+# its modification time, the band and the size read, so a replaced granule
+# is never served from the cache.
+#
+# Entries are loaded with np.load(mmap_mode='c'), a copy-on-write np.memmap,
+# so a hit costs little more than reading pages already in the page cache.
+# Writing to a loaded array does not change the entry.
+#
+# When the entries exceed maxBytes, the least recently used are removed.  A
+# hit updates the entry's modification time, which is the LRU clock.  The
+# entries' sizes and order are kept in memory, seeded by scanning the
+# directory once.  Copies in other processes share the directory, so it is
+# scanned again only when the entries known exceed maxBytes.
+# -----------------------------------------------------------------------------
+class BandCache(object):
+
+    DEFAULT_MAX_BYTES = 100 * 1024 ** 3
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 cacheDir: Path,
+                 maxBytes: int = DEFAULT_MAX_BYTES,
+                 logger: logging.RootLogger = None):
+
+        if not cacheDir or not cacheDir.is_dir():
+
+            raise RuntimeError('Cache dir., ' +
+                               str(cacheDir) +
+                               ', does not exist.')
+
+        self._cacheDir: Path = cacheDir
+        self._maxBytes: int = maxBytes
+        self._logger: logging.RootLogger = logger
+        self._lock = threading.Lock()
+        self._scan()
+
+    # -------------------------------------------------------------------------
+    # __getstate__
+    # -------------------------------------------------------------------------
+    def __getstate__(self) -> dict:
+
+        state = self.__dict__.copy()
+        del state['_entries']
+        del state['_lock']
+        del state['_totalBytes']
+
+        return state
+
+    # -------------------------------------------------------------------------
+    # __setstate__
+    #
+    # Copies in other processes share the cache directory.  Entries are
+    # written under temporary names and renamed, and eviction skips entries
+    # another copy removed, so they need not share the lock.
+    # -------------------------------------------------------------------------
+    def __setstate__(self, state: dict) -> None:
+
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._scan()
+
+    # -------------------------------------------------------------------------
+    # _add
+    #
+    # Record an entry as the most recently used.  Call this while holding the
+    # lock.
+    # -------------------------------------------------------------------------
+    def _add(self, key: str, size: int) -> None:
+
+        self._totalBytes += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+
+    # -------------------------------------------------------------------------
+    # _evict
+    #
+    # Rescan the directory, which other processes may have changed, and
+    # remove the least recently used entries until they fit in maxBytes.
+    # Call this while holding the lock.
+    # -------------------------------------------------------------------------
+    def _evict(self) -> None:
+
+        self._scan()
+
+        while self._totalBytes > self._maxBytes and self._entries:
+
+            key, size = self._entries.popitem(last=False)
+            self._remove(key)
+            self._totalBytes -= size
+
+            if self._logger:
+
+                self._logger.info('Evicted ' + key +
+                                  '.npy from the band cache.')
+
+    # -------------------------------------------------------------------------
+    # get
+    #
+    # Returns (array, geotransform, projection) or None.
+    # -------------------------------------------------------------------------
+    def get(self,
+            granule: Path,
+            bandName: str,
+            cols: int = None,
+            rows: int = None) -> tuple:
+
+        key = self._getKey(granule, bandName, cols, rows)
+        arrayPath = self._cacheDir / (key + '.npy')
+        geoPath = self._cacheDir / (key + '.json')
+
+        try:
+
+            with open(geoPath) as f:
+                geo = json.load(f)
+
+            array = np.load(arrayPath, mmap_mode='c')
+            os.utime(arrayPath)
+
+            # An entry another process wrote is not known yet.
+            size = self._entries.get(key) or arrayPath.stat().st_size
+
+        except (FileNotFoundError, ValueError):
+            return None
+
+        with self._lock:
+            self._add(key, size)
+
+        xform = tuple(geo['xform']) if geo['xform'] else None
+
+        return array, xform, geo['proj']
+
+    # -------------------------------------------------------------------------
+    # _getKey
+    # -------------------------------------------------------------------------
+    def _getKey(self,
+                granule: Path,
+                bandName: str,
+                cols: int,
+                rows: int) -> str:
+
+        path = Path(granule).resolve()
+        mtime = path.stat().st_mtime_ns
+
+        key = '|'.join([str(path), str(mtime), bandName, str(cols), str(rows)])
+
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    # -------------------------------------------------------------------------
+    # put
+    # -------------------------------------------------------------------------
+    def put(self,
+            granule: Path,
+            bandName: str,
+            array: np.ndarray,
+            xform: tuple,
+            proj: str,
+            cols: int = None,
+            rows: int = None) -> None:
+
+        key = self._getKey(granule, bandName, cols, rows)
+        suffix = '.tmp' + str(os.getpid()) + '.' + str(threading.get_ident())
+        arrayTmp = self._cacheDir / (key + '.npy' + suffix)
+        geoTmp = self._cacheDir / (key + '.json' + suffix)
+
+        # ---
+        # Write the geo-information first, because get() treats the array
+        # file as the sign of a complete entry.
+        # ---
+        with open(geoTmp, 'w') as f:
+            json.dump({'xform': xform, 'proj': proj}, f)
+
+        os.replace(geoTmp, self._cacheDir / (key + '.json'))
+
+        with open(arrayTmp, 'wb') as f:
+            np.save(f, array)
+
+        arrayPath = self._cacheDir / (key + '.npy')
+        os.replace(arrayTmp, arrayPath)
+
+        with self._lock:
+
+            self._add(key, arrayPath.stat().st_size)
+
+            if self._totalBytes > self._maxBytes:
+                self._evict()
+
+    # -------------------------------------------------------------------------
+    # _remove
+    # -------------------------------------------------------------------------
+    def _remove(self, key: str) -> None:
+
+        for ext in ['.npy', '.json']:
+
+            try:
+                (self._cacheDir / (key + ext)).unlink()
+
+            except FileNotFoundError:
+                pass
+
+    # -------------------------------------------------------------------------
+    # _scan
+    #
+    # Set the entries, least recently used first, and their total size from
+    # the cache directory.
+    # -------------------------------------------------------------------------
+    def _scan(self) -> None:
+
+        entries = []
+
+        with os.scandir(self._cacheDir) as dirEntries:
+
+            for entry in dirEntries:
+
+                if entry.name.endswith('.npy'):
+
+                    try:
+                        stat = entry.stat()
+
+                    except FileNotFoundError:
+                        continue
+
+                    entries.append((stat.st_mtime_ns,
+                                    stat.st_size,
+                                    entry.name[:-len('.npy')]))
+
+        self._entries: OrderedDict = \
+            OrderedDict((key, size) for mtime, size, key in sorted(entries))
+
+        self._totalBytes: int = sum(self._entries.values())
+
+    # -------------------------------------------------------------------------
+    # setLogger
+    # -------------------------------------------------------------------------
+    def setLogger(self, logger: logging.RootLogger) -> None:
+        self._logger = logger
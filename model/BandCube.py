@@ -0,0 +1,205 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+
+# -----------------------------------------------------------------------------
+# class BandCube
+#
+# A day's bands in one (bands, rows, cols) block, instead of a dictionary of
+# separate arrays.  It is a read-only mapping of band name to a view of that
+# band's plane, so code written for band dictionaries reads it unchanged.
+#
+# The block is int16.  A band of another 2-byte type, like the uint16 state
+# band, is held bit for bit and viewed as its own type.  The pixels need not
+# be 2-D: a cube of the good pixels of a day is (bands, pixels).
+#
+# getFeatureMatrix() views the block as a (pixels, bands) matrix, the layout
+# models predict from.  The view is transposed, so pixels are strided.
+# -----------------------------------------------------------------------------
+class BandCube(Mapping):
+
+    # -------------------------------------------------------------------------
+    # __init__
+    #
+    # Give the shape of the pixels to allocate a block, or a block of shape
+    # (len(bandNames), ...) to hold the bands in, like one from a BufferPool
+    # frame or a window of another cube's block.
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 bandNames: list,
+                 shape: tuple = None,
+                 block: np.ndarray = None,
+                 dtypes: dict = None):
+
+        self._bandNames: list = list(bandNames)
+
+        self._index: dict = {name: i for i, name in
+                             enumerate(self._bandNames)}
+
+        if len(self._index) != len(self._bandNames):
+
+            raise RuntimeError('Band names must be unique: ' +
+                               str(self._bandNames))
+
+        if block is None:
+
+            if shape is None:
+                raise RuntimeError('A band cube needs a shape or a block.')
+
+            block = np.empty((len(self._bandNames),) + tuple(shape),
+                             dtype=np.int16)
+
+        if block.dtype != np.int16 or \
+           block.ndim < 2 or \
+           block.shape[0] != len(self._bandNames):
+
+            raise RuntimeError('A block for ' + str(len(self._bandNames)) +
+                               ' bands must be int16 of shape (' +
+                               str(len(self._bandNames)) + ', ...).  It ' +
+                               'is ' + str(block.dtype) + ' of shape ' +
+                               str(block.shape))
+
+        self._block: np.ndarray = block
+
+        self._dtypes: dict = {name: np.dtype(np.int16)
+                              for name in self._bandNames}
+
+        for name, dtype in (dtypes or {}).items():
+
+            if name in self._index:
+                self._dtypes[name] = BandCube._validateDtype(name, dtype)
+
+    # -------------------------------------------------------------------------
+    # __getitem__
+    # -------------------------------------------------------------------------
+    def __getitem__(self, name: str) -> np.ndarray:
+
+        return self._block[self._index[name]].view(self._dtypes[name])
+
+    # -------------------------------------------------------------------------
+    # __iter__
+    # -------------------------------------------------------------------------
+    def __iter__(self):
+        return iter(self._bandNames)
+
+    # -------------------------------------------------------------------------
+    # __len__
+    # -------------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._bandNames)
+
+    # -------------------------------------------------------------------------
+    # getBandNames
+    # -------------------------------------------------------------------------
+    def getBandNames(self) -> list:
+        return list(self._bandNames)
+
+    # -------------------------------------------------------------------------
+    # getBlock
+    # -------------------------------------------------------------------------
+    def getBlock(self) -> np.ndarray:
+        return self._block
+
+    # -------------------------------------------------------------------------
+    # getDtypes
+    # -------------------------------------------------------------------------
+    def getDtypes(self) -> dict:
+        return dict(self._dtypes)
+
+    # -------------------------------------------------------------------------
+    # getFeatureMatrix
+    #
+    # Returns the block as a (pixels, bands) matrix, with columns in band
+    # order.  It is a transposed, Fortran-ordered view of the block, unless
+    # the block is a window that cannot be flattened without copying.  The
+    # values are the int16 bits.
+    #
+    # Only consumers that index it as it is, like CompiledForest, avoid a
+    # copy.  scikit-learn's predict() copies it to C-ordered float32.
+    # -------------------------------------------------------------------------
+    def getFeatureMatrix(self) -> np.ndarray:
+
+        return self._block.reshape(len(self._bandNames), -1).T
+
+    # -------------------------------------------------------------------------
+    # getIndex
+    # -------------------------------------------------------------------------
+    def getIndex(self, name: str) -> int:
+        return self._index[name]
+
+    # -------------------------------------------------------------------------
+    # getShape
+    #
+    # Returns the shape of the pixels of each band.
+    # -------------------------------------------------------------------------
+    def getShape(self) -> tuple:
+        return self._block.shape[1:]
+
+    # -------------------------------------------------------------------------
+    # nbytes
+    #
+    # As ndarray.nbytes, so a cube kept in a BufferPool frame is counted.
+    # -------------------------------------------------------------------------
+    @property
+    def nbytes(self) -> int:
+        return self._block.nbytes
+
+    # -------------------------------------------------------------------------
+    # setBand
+    #
+    # Copies an array into a band's plane, which then views the array's type.
+    # With a mask of the cube's 2-D source, the plane is 1-D and receives the
+    # array's pixels where the mask is true, as np.compress() gathers them.
+    # An array that was read into the plane is not copied.
+    # -------------------------------------------------------------------------
+    def setBand(self,
+                name: str,
+                array: np.ndarray,
+                mask: np.ndarray = None) -> None:
+
+        dtype = BandCube._validateDtype(name, array.dtype)
+        plane = self._block[self._index[name]].view(dtype)
+
+        if mask is not None:
+            np.compress(mask.ravel(), array, out=plane)
+
+        elif not np.may_share_memory(plane, array):
+
+            if array.shape != plane.shape:
+
+                raise RuntimeError('Unable to put ' + name + ' of shape ' +
+                                   str(array.shape) + ' in a band cube ' +
+                                   'of shape ' + str(plane.shape))
+
+            np.copyto(plane, array)
+
+        self._dtypes[name] = dtype
+
+    # -------------------------------------------------------------------------
+    # _validateDtype
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _validateDtype(name: str, dtype) -> np.dtype:
+
+        dtype = np.dtype(dtype)
+
+        if dtype.itemsize != np.dtype(np.int16).itemsize:
+
+            raise RuntimeError('A band cube holds 2-byte bands.  ' + name +
+                               ' is ' + str(dtype))
+
+        return dtype
+
+    # -------------------------------------------------------------------------
+    # window
+    #
+    # Returns a cube of the same bands over a window of this block, like
+    # ValidRegion.crop(self.getBlock()).  It shares this cube's block.
+    # -------------------------------------------------------------------------
+    def window(self, block: np.ndarray):
+
+        if not np.may_share_memory(block, self._block):
+            raise RuntimeError('The window must view this cube\'s block.')
+
+        return BandCube(self._bandNames, block=block, dtypes=self._dtypes)
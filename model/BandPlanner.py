@@ -0,0 +1,77 @@
+import logging
+
+from modis_water.model.BandReader import BandReader
+
+
+# -----------------------------------------------------------------------------
+# class BandPlanner
+#
+# Each stage of a run, such as a classifier or the mask generator, declares
+# the bands it consumes.  The planner computes the minimal set of bands to
+# read, the union of the stages' bands, so no band is decoded that no stage
+# uses.
+# -----------------------------------------------------------------------------
+class BandPlanner(object):
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, logger: logging.RootLogger = None):
+
+        self._logger: logging.RootLogger = logger
+        self._stages: dict = {}
+
+    # -------------------------------------------------------------------------
+    # addStage
+    # -------------------------------------------------------------------------
+    def addStage(self, name: str, bands: set) -> None:
+
+        bands = set(bands)
+        invalidBands = bands - BandReader.ALL_BANDS
+
+        if invalidBands:
+
+            raise RuntimeError('Stage ' + name + ' uses invalid bands: ' +
+                               str(invalidBands))
+
+        self._stages[name] = self._stages.get(name, set()) | bands
+
+    # -------------------------------------------------------------------------
+    # getBands
+    # -------------------------------------------------------------------------
+    def getBands(self) -> set:
+
+        bands = set()
+
+        for stageBands in self._stages.values():
+            bands |= stageBands
+
+        return bands
+
+    # -------------------------------------------------------------------------
+    # getSkippedBands
+    # -------------------------------------------------------------------------
+    def getSkippedBands(self) -> set:
+        return BandReader.ALL_BANDS - self.getBands()
+
+    # -------------------------------------------------------------------------
+    # logPlan
+    # -------------------------------------------------------------------------
+    def logPlan(self) -> None:
+
+        if not self._logger:
+            return
+
+        for name in sorted(self._stages.keys()):
+
+            self._logger.info('Stage ' + name + ' uses ' +
+                              ', '.join(sorted(self._stages[name])))
+
+        self._logger.info('Reading ' + ', '.join(sorted(self.getBands())))
+
+        skippedBands = self.getSkippedBands()
+
+        if skippedBands:
+
+            self._logger.info('Not reading ' +
+                              ', '.join(sorted(skippedBands)))
@@ -1,11 +1,18 @@
 
 from abc import ABC
 from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from pathlib import Path
 import re
 
-from osgeo import gdal
+import numpy as np
+
+from modis_water.model.BandCache import BandCache
+from modis_water.model.BufferPool import BufferPool
+from modis_water.model.GdalGranuleReader import GdalGranuleReader
+from modis_water.model.GranuleIndex import GranuleIndex
+from modis_water.model.GranuleReader import GranuleReader
 
 
 # -----------------------------------------------------------------------------
@@ -33,12 +40,34 @@ class BandReader(ABC):
 
     ALL_BANDS = set([SENZ, SOLZ, SR1, SR2, SR3, SR4, SR5, SR6, SR7, STATE])
 
+    # ---
+    # Readers whose grids are stored at several resolutions can decode each
+    # band at its stored size and upsample it in memory, instead of having
+    # GDAL resample it to getCols() x getRows() during the decode.
+    # ---
+    DECODE_AT_NATIVE_RESOLUTION = False
+
+    GRANULE_SUFFIX = '.hdf'
+
+    # ---
+    # When a day has several versions of a granule, the policy chooses the
+    # one to read.
+    # ---
+    LATEST = 'latest'
+    EARLIEST = 'earliest'
+    GRANULE_POLICIES = (LATEST, EARLIEST)
+
     # -------------------------------------------------------------------------
     # __init__
     # -------------------------------------------------------------------------
     def __init__(self, 
                  baseDir: Path, 
-                 logger: logging.RootLogger = None):
+                 logger: logging.RootLogger = None,
+                 numThreads: int = 1,
+                 nativeResolution: bool = False,
+                 indexDir: Path = None,
+                 granulePolicy: str = LATEST,
+                 granuleReader: GranuleReader = None):
 
         if not baseDir or not baseDir.exists() or not baseDir.is_dir():
 
@@ -49,8 +78,99 @@ class BandReader(ABC):
         self._bands: list = None
         self._baseDir: Path = baseDir
         self._logger: logging.RootLogger = logger
+        self._granuleIndex = GranuleIndex(self.GRANULE_SUFFIX,
+                                          indexDir,
+                                          logger)
+
+        self._granuleReader: GranuleReader = \
+            granuleReader or GdalGranuleReader()
+
+        self._bandCache: BandCache = None
+
+        if granulePolicy not in BandReader.GRANULE_POLICIES:
+
+            raise RuntimeError('Invalid granule policy, ' +
+                               str(granulePolicy) + '.  Use one of ' +
+                               str(BandReader.GRANULE_POLICIES))
+
+        self._granulePolicy: str = granulePolicy
+        self._nativeResolution: bool = nativeResolution
         self._xform = None
         self._proj = None
+        self.setNumThreads(numThreads)
+
+    # -------------------------------------------------------------------------
+    # close
+    #
+    # Release the granule handles kept open between reads.
+    # -------------------------------------------------------------------------
+    def close(self) -> None:
+        self._granuleReader.close()
+
+    # -------------------------------------------------------------------------
+    # _decodeBand
+    #
+    # Decode a band from its granule, or load it from the band cache when one
+    # is set.  A decoded band is read into out, if out fits it.  A window is
+    # read by the granule reader; the band cache holds whole bands only.
+    # -------------------------------------------------------------------------
+    def _decodeBand(self,
+                    hdfFile: Path,
+                    subDsPrefix: str,
+                    bandName: str,
+                    cols: int = None,
+                    rows: int = None,
+                    out: np.ndarray = None,
+                    window: tuple = None) -> tuple:
+
+        if window:
+
+            return self._granuleReader.readBand(hdfFile,
+                                                subDsPrefix,
+                                                bandName,
+                                                cols,
+                                                rows,
+                                                out,
+                                                window)
+
+        if self._bandCache:
+
+            cached = self._bandCache.get(hdfFile, bandName, cols, rows)
+
+            if cached:
+                return cached
+
+        array, xform, proj = self._granuleReader.readBand(hdfFile,
+                                                          subDsPrefix,
+                                                          bandName,
+                                                          cols,
+                                                          rows,
+                                                          out)
+
+        if self._bandCache:
+
+            self._bandCache.put(hdfFile,
+                                bandName,
+                                array,
+                                xform,
+                                proj,
+                                cols,
+                                rows)
+
+        return array, xform, proj
+
+    # -------------------------------------------------------------------------
+    # _keep
+    #
+    # Keep a decoded array in the frame, to be read into next time.  Arrays
+    # from the band cache are memory maps of its entries, so they are not
+    # kept.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _keep(frame: BufferPool.Frame, key: str, array: np.ndarray) -> None:
+
+        if frame and not isinstance(array, np.memmap):
+            frame.keep(key, array)
 
     # -------------------------------------------------------------------------
     # getBandMap
@@ -106,46 +226,325 @@ class BandReader(ABC):
 
     # -------------------------------------------------------------------------
     # read
+    #
+    # Reads the bands given to setBands(), or only the given bands.  With a
+    # frame from a BufferPool, the bands are read into the frame's arrays.
+    #
+    # The geotransform and projection of the first read are kept for
+    # getXform() and getProj().  Concurrent readers use readDay(), which
+    # returns them with the bands instead.
+    # -------------------------------------------------------------------------
+    def read(self,
+             sensor: str,
+             year: int,
+             day: int,
+             tile: str,
+             bands: set = None,
+             frame: BufferPool.Frame = None,
+             window: tuple = None) -> dict:
+
+        bandDict, xform, proj = self.readDay(sensor,
+                                             year,
+                                             day,
+                                             tile,
+                                             bands,
+                                             frame,
+                                             window)
+
+        self._recordGeo(xform, proj)
+
+        return bandDict
+
+    # -------------------------------------------------------------------------
+    # readDay
+    #
+    # Returns (bandDict, xform, proj): the bands as read() returns them, with
+    # the geotransform and projection of the day's granules.  It does not
+    # change the reader, so threads can read different days at once, each
+    # into its own frame.  xform and proj are None if nothing was read.
+    #
+    # With a window, (rowStart, rowEnd, colStart, colEnd) of the getRows() x
+    # getCols() grid, each band is only the window, like a valid region's.
+    # xform and proj are still the tile's.  Bands returned at their stored
+    # size, with native resolution, are returned whole.
     # -------------------------------------------------------------------------
     @abstractmethod
-    def read(self, sensor: str, year: int, day: int, tile: str) -> dict:
+    def readDay(self,
+                sensor: str,
+                year: int,
+                day: int,
+                tile: str,
+                bands: set = None,
+                frame: BufferPool.Frame = None,
+                window: tuple = None) -> tuple:
         pass
-        
+
     # -------------------------------------------------------------------------
     # _readBandsFromHdfs
+    #
+    # As _readBandsWithGeo(), returning only the bands.  With setXform, the
+    # geotransform and projection are kept as read() keeps them.
     # -------------------------------------------------------------------------
     def _readBandsFromHdfs(self, 
                            hdfFiles: list, 
                            bands: list, 
                            subDsPrefix: str,
-                           setXform: bool = False) -> dict:
+                           setXform: bool = False,
+                           upsample: bool = True,
+                           frame: BufferPool.Frame = None) -> dict:
+
+        bandDict, xform, proj = self._readBandsWithGeo(hdfFiles,
+                                                       bands,
+                                                       subDsPrefix,
+                                                       upsample,
+                                                       frame)
+
+        if setXform:
+            self._recordGeo(xform, proj)
+
+        return bandDict
+
+    # -------------------------------------------------------------------------
+    # _readBandsWithGeo
+    #
+    # Each (file, band) pair is a separate sub-dataset.  When more than one
+    # thread is configured, the sub-datasets are decoded concurrently.  The
+    # pairs are sorted first, so the contents of bandDict and the sub-dataset
+    # that supplies the geotransform and projection do not depend on set
+    # ordering or thread scheduling.
+    #
+    # Bands are read into the frame's arrays by band name, so a frame is used
+    # only when one granule supplies each band.
+    #
+    # Returns (bandDict, xform, proj).  See readDay() for the window.
+    # -------------------------------------------------------------------------
+    def _readBandsWithGeo(self,
+                          hdfFiles: list,
+                          bands: list,
+                          subDsPrefix: str,
+                          upsample: bool = True,
+                          frame: BufferPool.Frame = None,
+                          window: tuple = None) -> tuple:
+
+        tasks = [(hdfFile, band)
+                 for hdfFile in sorted(hdfFiles)
+                 for band in sorted(bands)]
+
+        if len(hdfFiles) > 1:
+            frame = None
+
+        if self._numThreads > 1 and len(tasks) > 1:
+
+            with ThreadPoolExecutor(max_workers=self._numThreads) as executor:
+
+                results = list(executor.map(
+                    lambda task: self._readOneBand(task[0],
+                                                   task[1],
+                                                   subDsPrefix,
+                                                   upsample,
+                                                   frame,
+                                                   window),
+                    tasks))
+
+        else:
+
+            results = [self._readOneBand(hdfFile,
+                                         band,
+                                         subDsPrefix,
+                                         upsample,
+                                         frame,
+                                         window)
+                       for hdfFile, band in tasks]
 
         bandDict = {}
+        firstXform = None
+        firstProj = None
+
+        for (hdfFile, band), (array, xform, proj) in zip(tasks, results):
+
+            if not firstXform:
+                firstXform = xform
+
+            if not firstProj:
+                firstProj = proj
+
+            bandDict[band] = array
+
+        return bandDict, firstXform, firstProj
+
+    # -------------------------------------------------------------------------
+    # _readOneBand
+    #
+    # When upsample is false, a band decoded at native resolution is returned
+    # at its stored size, whatever the native resolution setting.
+    #
+    # With a frame, the band is read into the frame's array of the band's
+    # name.  A band decoded at native resolution and upsampled is decoded
+    # into another array of the frame, then upsampled into that one.
+    #
+    # With a window, the granule reader decodes only the stored pixels
+    # covering it.  The band cache holds whole bands, so with a cache, the
+    # whole band is decoded, or loaded, and the window is taken from it.  So
+    # is an empty window, which has no pixels to read.  A band returned at
+    # its stored size is returned whole.
+    # -------------------------------------------------------------------------
+    def _readOneBand(self,
+                     hdfFile: Path,
+                     band: str,
+                     subDsPrefix: str,
+                     upsample: bool = True,
+                     frame: BufferPool.Frame = None,
+                     window: tuple = None) -> tuple:
+
+        bandName = self._getFullBandNames()[band]
+        out = frame.find(band) if frame else None
+
+        if self.DECODE_AT_NATIVE_RESOLUTION:
+            upsample = upsample and not self._nativeResolution
+
+        if not upsample:
+            window = None
+
+        # ---
+        # Only the uncached, upsampled read decodes just the window.  The
+        # band cache and native-resolution paths decode the whole band.
+        # ---
+        if window and not self._bandCache and \
+           window[0] < window[1] and window[2] < window[3]:
+
+            array, xform, proj = self._decodeBand(hdfFile,
+                                                  subDsPrefix,
+                                                  bandName,
+                                                  self.getCols(),
+                                                  self.getRows(),
+                                                  out,
+                                                  window)
+
+        elif self.DECODE_AT_NATIVE_RESOLUTION:
+
+            decodeKey = band + '-native' if upsample else band
+
+            array, xform, proj = \
+                self._decodeBand(hdfFile,
+                                 subDsPrefix,
+                                 bandName,
+                                 out=frame.find(decodeKey) if frame else None)
+
+            BandReader._keep(frame, decodeKey, array)
+            xform = self._scaleXform(xform, array.shape)
+
+            if upsample:
+
+                array = BandReader.upsample(array,
+                                            self.getCols(),
+                                            self.getRows(),
+                                            out,
+                                            window)
+
+        else:
+
+            array, xform, proj = \
+                self._decodeBand(hdfFile,
+                                 subDsPrefix,
+                                 bandName,
+                                 self.getCols(),
+                                 self.getRows(),
+                                 None if window else out)
+
+            if window:
+
+                array = BandReader.upsample(array,
+                                            self.getCols(),
+                                            self.getRows(),
+                                            out,
+                                            window)
+
+        BandReader._keep(frame, band, array)
+
+        return array, xform, proj
+
+    # -------------------------------------------------------------------------
+    # _recordGeo
+    #
+    # Keep the first geotransform and projection read, for getXform() and
+    # getProj().
+    # -------------------------------------------------------------------------
+    def _recordGeo(self, xform, proj) -> None:
+
+        if not self._xform:
+            self._xform = xform
+
+        if not self._proj:
+            self._proj = proj
+
+    # -------------------------------------------------------------------------
+    # _scaleXform
+    #
+    # A band decoded at native resolution comes with the geotransform of its
+    # stored grid.  Scale it to the getCols() x getRows() grid, so the
+    # reader's geotransform describes the output whichever band supplies it.
+    # -------------------------------------------------------------------------
+    def _scaleXform(self, xform: tuple, shape: tuple) -> tuple:
+
+        if not xform:
+            return xform
+
+        rows, cols = shape
+
+        return (xform[0],
+                xform[1] * (cols / self.getCols()),
+                xform[2],
+                xform[3],
+                xform[4],
+                xform[5] * (rows / self.getRows()))
+
+    # -------------------------------------------------------------------------
+    # _selectGranule
+    #
+    # Reprocessing leaves several versions of a granule for the same day and
+    # tile.  Choose one of each by production time, ignoring file-system
+    # order, so only it is read.  Ties are broken by name.
+    # -------------------------------------------------------------------------
+    def _selectGranule(self, hdfFiles: list) -> list:
+
+        if len(hdfFiles) < 2:
+            return list(hdfFiles)
+
+        # Group versions by the name up to the collection, e.g.
+        # MOD09GA.A2003161.h09v05.
+        versions = {}
 
         for hdfFile in hdfFiles:
 
-            for band in bands:
+            granule = '.'.join(Path(hdfFile).name.split('.')[:3])
+            versions.setdefault(granule, []).append(hdfFile)
 
-                subDataSet = subDsPrefix + ':"' + \
-                             str(hdfFile) + '":' + \
-                             self._getFullBandNames()[band]
+        selectedFiles = []
 
-                ds = gdal.Open(subDataSet)
-                
-                if not ds:
-                    raise RuntimeError('Unable to open dataset.')
+        for granule in sorted(versions.keys()):
 
-                if setXform and not self._xform:
-                    self._xform = ds.GetGeoTransform()
+            ordered = sorted(versions[granule],
+                             key=lambda f: (GranuleIndex.getProductionTime(f),
+                                            Path(f).name))
 
-                if setXform and not self._proj:
-                    self._proj = ds.GetProjection()
-                    
-                bandDict[band] = ds.ReadAsArray(0, 0, None, None, None,
-                                                self.getCols(),
-                                                self.getRows())
-                
-        return bandDict
+            selected = ordered[-1] \
+                if self._granulePolicy == BandReader.LATEST else ordered[0]
+
+            selectedFiles.append(selected)
+
+            if self._logger:
+
+                for hdfFile in ordered:
+
+                    if hdfFile != selected:
+
+                        self._logger.info('Skipping ' + Path(hdfFile).name +
+                                          ' in favor of the ' +
+                                          self._granulePolicy +
+                                          ' version, ' +
+                                          Path(selected).name)
+
+        return selectedFiles
 
     # -------------------------------------------------------------------------
     # sensors
@@ -155,6 +554,14 @@ class BandReader(ABC):
     def sensors() -> set:
         pass
 
+    # -------------------------------------------------------------------------
+    # setBandCache
+    #
+    # Opt in to caching decoded bands on disk.  None turns caching off.
+    # -------------------------------------------------------------------------
+    def setBandCache(self, bandCache: BandCache) -> None:
+        self._bandCache = bandCache
+
     # -------------------------------------------------------------------------
     # setBands
     # -------------------------------------------------------------------------
@@ -176,12 +583,54 @@ class BandReader(ABC):
         # ---
         self._bands = validatedBands
 
+    # -------------------------------------------------------------------------
+    # setNativeResolution
+    #
+    # When true, readers that decode at native resolution return each band at
+    # its stored size.  Consumers that need full resolution call upsample().
+    # -------------------------------------------------------------------------
+    def setNativeResolution(self, nativeResolution: bool) -> None:
+        self._nativeResolution = nativeResolution
+
+    # -------------------------------------------------------------------------
+    # setNumThreads
+    #
+    # The number of threads used to decode the sub-datasets of a granule.  One
+    # thread reads them sequentially.
+    # -------------------------------------------------------------------------
+    def setNumThreads(self, numThreads: int = 1) -> None:
+
+        if numThreads < 1:
+
+            raise RuntimeError('The number of threads must be at least one.' +
+                               '  It was specified as ' + str(numThreads))
+
+        self._numThreads = numThreads
+
     # -------------------------------------------------------------------------
     # setLogger
     # -------------------------------------------------------------------------
     def setLogger(self, logger: logging.RootLogger) -> None:
+
         self._logger = logger
+        self._granuleIndex.setLogger(logger)
         
+    # -------------------------------------------------------------------------
+    # upsample
+    #
+    # Nearest-neighbour upsampling by an integer factor, matching GDAL's
+    # nearest-neighbour resampling of the coarser grids.  With a window, only
+    # the window of the upsampled array is made.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def upsample(array: np.ndarray,
+                 cols: int,
+                 rows: int,
+                 out: np.ndarray = None,
+                 window: tuple = None) -> np.ndarray:
+
+        return GranuleReader.upsample(array, cols, rows, out, window)
+
     # -------------------------------------------------------------------------
     # validate
     #
@@ -4,6 +4,7 @@ import logging
 from pathlib import Path
 
 from modis_water.model.BandReader import BandReader as br
+from modis_water.model.BufferPool import BufferPool
 
 
 # -----------------------------------------------------------------------------
@@ -35,6 +36,22 @@ class BandReaderModis(br):
     
     GQ_BANDS = set([br.SR1, br.SR2])
 
+    # ---
+    # MODIS_Grid_2D is stored at 4800 x 4800, MODIS_Grid_500m_2D at 2400 x
+    # 2400 and MODIS_Grid_1km_2D at 1200 x 1200.  Decode each at that size.
+    # ---
+    DECODE_AT_NATIVE_RESOLUTION = True
+
+    # ---
+    # Backends
+    #
+    # GDAL reads through its HDF4_EOS driver.  pyhdf reads the scientific data
+    # sets directly and must be installed separately.
+    # ---
+    GDAL = 'gdal'
+    PYHDF = 'pyhdf'
+    BACKENDS = (GDAL, PYHDF)
+
     # Sensors
     MOD = 'MOD'
     MYD = 'MYD'
@@ -45,9 +62,35 @@ class BandReaderModis(br):
     # -------------------------------------------------------------------------
     def __init__(self, 
                  baseDir: Path, 
-                 logger: logging.RootLogger = None):
+                 logger: logging.RootLogger = None,
+                 numThreads: int = 1,
+                 nativeResolution: bool = False,
+                 indexDir: Path = None,
+                 granulePolicy: str = br.LATEST,
+                 backend: str = GDAL):
+
+        if backend not in BandReaderModis.BACKENDS:
+
+            raise RuntimeError('Invalid backend, ' + str(backend) +
+                               '.  Use one of ' +
+                               str(BandReaderModis.BACKENDS))
+
+        granuleReader = None
 
-        super(BandReaderModis, self).__init__(baseDir, logger) 
+        if backend == BandReaderModis.PYHDF:
+
+            from modis_water.model.PyhdfGranuleReader import \
+                PyhdfGranuleReader
+
+            granuleReader = PyhdfGranuleReader()
+
+        super(BandReaderModis, self).__init__(baseDir,
+                                              logger,
+                                              numThreads,
+                                              nativeResolution,
+                                              indexDir,
+                                              granulePolicy,
+                                              granuleReader)
 
     # -------------------------------------------------------------------------
     # getBandMap
@@ -84,50 +127,63 @@ class BandReaderModis(br):
                 br.STATE: ':MODIS_Grid_1km_2D:state_1km_1'}
         
     # -------------------------------------------------------------------------
-    # read
+    # readDay
     # -------------------------------------------------------------------------
-    def read(self, sensor: str, year: int, day: int, tile: str) -> dict:
+    def readDay(self,
+                sensor: str,
+                year: int,
+                day: int,
+                tile: str,
+                bands: set = None,
+                frame: BufferPool.Frame = None,
+                window: tuple = None) -> tuple:
 
         self._validate(sensor, year, day, tile)
-
-        # Define the base glob pattern
-        pattern = str(year)
-
-        if day:
-
-            pattern += str(day).zfill(3)
-
-        else:
-            pattern += '*'
-
-        pattern += '.' + tile + '*.hdf'
+        bands = self._bands if bands is None else set(bands)
 
         # Do we need GA files, GQ files, or both?
-        gaBands = self._bands & BandReaderModis.GA_BANDS
-        gqBands = self._bands & BandReaderModis.GQ_BANDS
+        gaBands = bands & BandReaderModis.GA_BANDS
+        gqBands = bands & BandReaderModis.GQ_BANDS
         subDsPrefix = 'HDF4_EOS:EOS_GRID'
         bandDict = {}
+        xform = None
+        proj = None
         
         if gaBands:
 
-            hdfFiles: list = (self._baseDir / (sensor + '09GA') / str(year)). \
-                glob('*GA.A' + pattern)
-            
-            bandDict.update(self._readBandsFromHdfs(hdfFiles, 
-                                                    gaBands,
-                                                    subDsPrefix=subDsPrefix))
+            hdfFiles: list = self._selectGranule(self._granuleIndex.find(
+                self._baseDir / (sensor + '09GA') / str(year),
+                sensor, '09GA', year, day, tile))
+
+            # ---
+            # GQ supplies the geotransform.  Without GQ bands, take it from
+            # GA, scaled to the 4800 x 4800 grid.
+            # ---
+            gaDict, xform, proj = \
+                self._readBandsWithGeo(hdfFiles, 
+                                       gaBands,
+                                       subDsPrefix=subDsPrefix,
+                                       frame=frame,
+                                       window=window)
+
+            bandDict.update(gaDict)
 
         if gqBands:
 
-            hdfFiles: list = (self._baseDir / (sensor + '09GQ') / str(year)). \
-                glob('*GQ.A' + pattern)
+            hdfFiles: list = self._selectGranule(self._granuleIndex.find(
+                self._baseDir / (sensor + '09GQ') / str(year),
+                sensor, '09GQ', year, day, tile))
+
+            gqDict, xform, proj = \
+                self._readBandsWithGeo(hdfFiles=hdfFiles, 
+                                       bands=gqBands, 
+                                       subDsPrefix=subDsPrefix,
+                                       frame=frame,
+                                       window=window)
 
-            bandDict.update(self._readBandsFromHdfs(hdfFiles=hdfFiles, 
-                                                    bands=gqBands, 
-                                                    setXform=True,
-                                                    subDsPrefix=subDsPrefix))
+            bandDict.update(gqDict)
 
-        return bandDict
+        return bandDict, xform, proj
 
     # -------------------------------------------------------------------------
     # sensors
@@ -6,9 +6,37 @@ from pathlib import Path
 import numpy as np
 
 from modis_water.model.BandReader import BandReader as br
+from modis_water.model.BufferPool import BufferPool
 from modis_water.model.MaskGenerator import MaskGenerator
 
 
+# -----------------------------------------------------------------------------
+# _buildStateLut
+#
+# Map each 16-bit (QF1 << 8) | QF2 to the composite state MaskGenerator reads.
+# -----------------------------------------------------------------------------
+def _buildStateLut(vc: int, vcm: int, vcs: int, vam: int) -> np.ndarray:
+
+    # To shorten long lines of code, use shorter names for class variables.
+    mc = MaskGenerator.CLOUDY
+    mcm = MaskGenerator.CLOUD_MIXED
+    mcs = MaskGenerator.CLOUD_SHADOW
+    mam = MaskGenerator.AERO_MASK
+
+    qf = np.arange(65536, dtype=np.uint16)
+    qf1 = qf >> 8
+    qf2 = qf & 255
+
+    cloudy = np.where(qf1 & vc == vc, mc, 0)
+    cloudMixed = np.where(qf1 & vcm == vcm, mcm, 0)
+    cloudShadow = np.where(qf2 & vcs == vcs, mcs, 0)
+    aeroMask = np.where(qf2 & vam == vam, mam, 0)
+
+    lut = cloudy | cloudMixed | cloudShadow | aeroMask
+
+    return lut.astype(np.uint16)
+
+
 # -----------------------------------------------------------------------------
 # class BandReaderViirs
 # -----------------------------------------------------------------------------
@@ -42,6 +70,12 @@ class BandReaderViirs(br):
     VIIRS_CLOUD_MIXED = int('100', 2)     # 4
     VIIRS_CLOUD_SHADOW = int('100', 2)    # 4
     VIIRS_AERO_MASK = int('1000', 2)      # 8
+
+    # Composite state for each (QF1 << 8) | QF2, see _composeState().
+    STATE_LUT = _buildStateLut(VIIRS_CLOUDY,
+                               VIIRS_CLOUD_MIXED,
+                               VIIRS_CLOUD_SHADOW,
+                               VIIRS_AERO_MASK)
         
     # ---
     # Not all VIIRS bands have the same rows and columns.  Define them here.
@@ -62,21 +96,66 @@ class BandReaderViirs(br):
 
     COLS = 2400
     ROWS = 2400
+
+    # ---
+    # Decode the M bands and QF at 1200 x 1200 and the I bands at 2400 x
+    # 2400, then upsample in memory.
+    # ---
+    DECODE_AT_NATIVE_RESOLUTION = True
+
+    GRANULE_SUFFIX = '.h5'
+
+    # ---
+    # Backends
+    #
+    # GDAL reads through its HDF5 driver.  h5py reads the data sets directly
+    # and must be installed separately.
+    # ---
+    GDAL = 'gdal'
+    H5PY = 'h5py'
+    BACKENDS = (GDAL, H5PY)
     
     # -------------------------------------------------------------------------
     # __init__
     # -------------------------------------------------------------------------
     def __init__(self, 
                  baseDir: Path, 
-                 logger: logging.RootLogger = None):
+                 logger: logging.RootLogger = None,
+                 numThreads: int = 1,
+                 nativeResolution: bool = False,
+                 indexDir: Path = None,
+                 granulePolicy: str = br.LATEST,
+                 backend: str = GDAL):
+
+        if backend not in BandReaderViirs.BACKENDS:
+
+            raise RuntimeError('Invalid backend, ' + str(backend) +
+                               '.  Use one of ' +
+                               str(BandReaderViirs.BACKENDS))
+
+        granuleReader = None
+
+        if backend == BandReaderViirs.H5PY:
 
-        super(BandReaderViirs, self).__init__(baseDir, logger) 
+            from modis_water.model.H5pyGranuleReader import \
+                H5pyGranuleReader
+
+            granuleReader = H5pyGranuleReader()
+
+        super(BandReaderViirs, self).__init__(baseDir,
+                                              logger,
+                                              numThreads,
+                                              nativeResolution,
+                                              indexDir=indexDir,
+                                              granulePolicy=granulePolicy,
+                                              granuleReader=granuleReader)
 
     # -------------------------------------------------------------------------
     # composeState
     #
     # VIIRS state comes from two bands.  Read each band and make a composite
-    # state bit field for each pixel location.
+    # state bit field for each pixel location.  Returns (state, xform, proj),
+    # with the geotransform and projection of the QF bands.
     #
     # - AERO_MASK:      QF2/bit 4: 0 (no heavy aerosol) | 1 (Heavy aerosol)
     # - CLOUDY:         QF1/bits 2-3: 11 (confident cloudy)
@@ -97,38 +176,61 @@ class BandReaderViirs(br):
     #    11000000 : AERO_MASK if QF2 bit 4 == 1
     # 10000000000 : CLOUD_INT == 0
     # -------------------------------------------------------------------------
-    def _composeState(self, hdfFiles: list):
+    def _composeState(self,
+                      hdfFiles: list,
+                      frame: BufferPool.Frame = None,
+                      window: tuple = None):
         
         if not hdfFiles or len(hdfFiles) == 0:
-            return None
+            return None, None, None
             
-        # To shorten long lines of code, use shorter names for class variables.
-        mc = MaskGenerator.CLOUDY
-        mcm = MaskGenerator.CLOUD_MIXED
-        mcs = MaskGenerator.CLOUD_SHADOW
-        mam = MaskGenerator.AERO_MASK
-        vc = BandReaderViirs.VIIRS_CLOUDY
-        vcm = BandReaderViirs.VIIRS_CLOUD_MIXED
-        vcs = BandReaderViirs.VIIRS_CLOUD_SHADOW
-        vam = BandReaderViirs.VIIRS_AERO_MASK
-        
-        qfBands: dict = self._readBandsFromHdfs(hdfFiles=hdfFiles, 
-                                                bands=[BandReaderViirs.QF1,
-                                                       BandReaderViirs.QF2],
-                                                subDsPrefix='HDF5', 
-                                                setXform=True)
+        # ---
+        # Compose state at the stored size of QF1 and QF2, 1200 x 1200, and
+        # upsample the result once.  QF1 and QF2 are read whole, being a
+        # quarter of the size of the other bands, and only the window of
+        # the state is upsampled.
+        # ---
+        qfBands, xform, proj = \
+            self._readBandsWithGeo(hdfFiles=hdfFiles, 
+                                   bands=[BandReaderViirs.QF1,
+                                          BandReaderViirs.QF2],
+                                   subDsPrefix='HDF5', 
+                                   upsample=False,
+                                   frame=frame)
 
         qf1: np.ndarray = qfBands[BandReaderViirs.QF1]
         qf2: np.ndarray = qfBands[BandReaderViirs.QF2]
 
-        cloudy = np.where(qf1 & vc == vc, mc, 0)
-        cloudMixed = np.where(qf1 & vcm == vcm, mcm, 0)
-        cloudShadow = np.where(qf2 & vcs == vcs, mcs, 0)
-        aeroMask = np.where(qf2 & vam == vam, mam, 0)
-        
-        mask = cloudy | cloudMixed | cloudShadow | aeroMask
-        
-        return mask
+        if frame:
+
+            qf = frame.get('qf', qf1.shape, np.uint16)
+            mask = frame.get('qfState', qf1.shape, np.uint16)
+            stateOut = frame.find(br.STATE)
+
+        else:
+
+            qf = np.empty(qf1.shape, dtype=np.uint16)
+            mask = None
+            stateOut = None
+
+        # QF1 and QF2 are 8-bit, so (QF1 << 8) | QF2 indexes the state LUT.
+        np.copyto(qf, qf1)
+        qf <<= 8
+        qf |= qf2
+        mask = np.take(BandReaderViirs.STATE_LUT, qf, out=mask)
+
+        if not self._nativeResolution:
+
+            mask = br.upsample(mask,
+                               self.getCols(),
+                               self.getRows(),
+                               stateOut,
+                               window)
+
+            if frame:
+                frame.keep(br.STATE, mask)
+
+        return mask, xform, proj
 
     # -------------------------------------------------------------------------
     # findHdfFiles
@@ -139,21 +241,11 @@ class BandReaderViirs(br):
         
         self._validate(sensor, year, day, tile)
 
-        # Define the base glob pattern
-        pattern = str(year)
+        hdfFiles = self._granuleIndex.find(self._baseDir / (sensor + '09GA'),
+                                           sensor, '09GA', year, day, tile)
 
-        if day:
+        hdfFiles = self._selectGranule(hdfFiles)
 
-            pattern += str(day).zfill(3)
-
-        else:
-            pattern += '*'
-
-        pattern += '.' + tile + '*.h5'
-
-        hdfFiles = list((self._baseDir / (sensor + '09GA')). \
-                        glob('*GA.A' + pattern))
-                        
         return hdfFiles
 
     # -------------------------------------------------------------------------
@@ -215,34 +307,48 @@ class BandReaderViirs(br):
         return BandReaderViirs.ROWS
         
     # -------------------------------------------------------------------------
-    # read
+    # readDay
     # -------------------------------------------------------------------------
-    def read(self, sensor: str, year: int, day: int, tile: str) -> dict:
+    def readDay(self,
+                sensor: str,
+                year: int,
+                day: int,
+                tile: str,
+                bands: set = None,
+                frame: BufferPool.Frame = None,
+                window: tuple = None) -> tuple:
 
         hdfFiles: list = self._findHdfFiles(sensor, year, day, tile)
+        bands = self._bands if bands is None else set(bands)
         
         # ---
         # VIIRS state requires two bands to be read.  Read all the other
         # bands, then read state separately and add it to bandDict.
         # ---
-        bandsExceptState = self._bands.copy()
+        bandsExceptState = bands.copy()
 
-        if br.STATE in self._bands:
+        if br.STATE in bands:
             bandsExceptState.remove(br.STATE)
 
-        bandDict: dict = self._readBandsFromHdfs(hdfFiles=hdfFiles, 
-                                                 bands=bandsExceptState,
-                                                 subDsPrefix='HDF5', 
-                                                 setXform=True)
+        bandDict, xform, proj = \
+            self._readBandsWithGeo(hdfFiles=hdfFiles, 
+                                   bands=bandsExceptState,
+                                   subDsPrefix='HDF5', 
+                                   frame=frame,
+                                   window=window)
                                 
-        if br.STATE in self._bands:
+        if br.STATE in bands:
 
-            state = self._composeState(hdfFiles)
+            state, stateXform, stateProj = \
+                self._composeState(hdfFiles, frame, window)
             
             if state is not None:
-                bandDict[br.STATE] = self._composeState(hdfFiles)
+                bandDict[br.STATE] = state
+
+            xform = xform or stateXform
+            proj = proj or stateProj
         
-        return bandDict
+        return bandDict, xform, proj
         
     # -------------------------------------------------------------------------
     # sensors
@@ -0,0 +1,129 @@
+import queue
+
+import numpy as np
+
+
+# -----------------------------------------------------------------------------
+# class BufferPool
+#
+# A fixed set of frames, each holding the tile-sized arrays of one day: the
+# bands read and the scratch arrays of the mask, classify and final image
+# steps.  A day acquires a frame, fills and uses its arrays and releases it.
+# The next day to acquire the frame reuses the same arrays, so a run
+# allocates each array once per frame rather than once per day, and its
+# memory stays flat.
+#
+# With read-ahead, each day in flight needs its own frame: the one being
+# read, those waiting in the queue and the one being classified.  acquire()
+# blocks until a frame is free, which also bounds the days in flight.
+# -----------------------------------------------------------------------------
+class BufferPool(object):
+
+    # -------------------------------------------------------------------------
+    # class Frame
+    #
+    # Arrays are kept by key.  get() returns a scratch array of the requested
+    # shape and type, reallocating it only if those change.  Band readers,
+    # which do not know a band's type until it is decoded, use find() to
+    # offer the array of the last read as the output of the next and keep()
+    # to hold a new array for reuse.
+    # -------------------------------------------------------------------------
+    class Frame(object):
+
+        def __init__(self):
+            self._arrays: dict = {}
+
+        # ---------------------------------------------------------------------
+        # find
+        # ---------------------------------------------------------------------
+        def find(self, key: str) -> np.ndarray:
+            return self._arrays.get(key)
+
+        # ---------------------------------------------------------------------
+        # get
+        # ---------------------------------------------------------------------
+        def get(self, key: str, shape: tuple, dtype) -> np.ndarray:
+
+            array = self._arrays.get(key)
+
+            if array is None or \
+               array.shape != tuple(shape) or \
+               array.dtype != np.dtype(dtype):
+
+                array = np.empty(shape, dtype=dtype)
+                self._arrays[key] = array
+
+            return array
+
+        # ---------------------------------------------------------------------
+        # getBytes
+        # ---------------------------------------------------------------------
+        def getBytes(self) -> int:
+
+            return sum([array.nbytes for array in self._arrays.values()])
+
+        # ---------------------------------------------------------------------
+        # keep
+        # ---------------------------------------------------------------------
+        def keep(self, key: str, array: np.ndarray) -> None:
+            self._arrays[key] = array
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, numFrames: int = 1):
+
+        if numFrames < 1:
+
+            raise RuntimeError('A buffer pool needs at least one frame.  ' +
+                               'It was specified with ' + str(numFrames))
+
+        self._numFrames: int = numFrames
+        self._frames: queue.Queue = queue.Queue()
+
+        for i in range(numFrames):
+            self._frames.put(BufferPool.Frame())
+
+    # -------------------------------------------------------------------------
+    # __getstate__
+    #
+    # A copy, like one sent to a worker process, has the same number of
+    # frames, with no arrays yet.
+    # -------------------------------------------------------------------------
+    def __getstate__(self) -> dict:
+        return {'_numFrames': self._numFrames}
+
+    # -------------------------------------------------------------------------
+    # __setstate__
+    # -------------------------------------------------------------------------
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state['_numFrames'])
+
+    # -------------------------------------------------------------------------
+    # acquire
+    #
+    # Returns a free frame, or None if none is freed within the timeout.
+    # Without a timeout, it waits until a frame is free.
+    # -------------------------------------------------------------------------
+    def acquire(self, timeout: float = None) -> Frame:
+
+        try:
+            return self._frames.get(timeout=timeout)
+
+        except queue.Empty:
+            return None
+
+    # -------------------------------------------------------------------------
+    # getNumFrames
+    # -------------------------------------------------------------------------
+    def getNumFrames(self) -> int:
+        return self._numFrames
+
+    # -------------------------------------------------------------------------
+    # release
+    #
+    # Arrays of the frame, like those in a band dictionary read into it, must
+    # not be used after it is released.
+    # -------------------------------------------------------------------------
+    def release(self, frame: Frame) -> None:
+        self._frames.put(frame)
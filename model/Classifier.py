@@ -1,6 +1,15 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+import multiprocessing
 import os
 from pathlib import Path
+import queue
 import re
+import threading
+import traceback
 
 import numpy as np
 
@@ -8,9 +17,51 @@ from osgeo import gdal
 from osgeo import gdal_array
 from osgeo.osr import SpatialReference
 
+from modis_water.model.BandCube import BandCube
+from modis_water.model.BandPlanner import BandPlanner
 from modis_water.model.BandReader import BandReader
+from modis_water.model.BufferPool import BufferPool
 from modis_water.model.MaskGenerator import MaskGenerator
+from modis_water.model.NormalizedDifference import NormalizedDifference
 from modis_water.model.Utils import Utils
+from modis_water.model.ValidRegion import ValidRegion
+
+
+# ---
+# The classifier a worker process runs days for, set once per process by
+# _initWorker(), so it is not sent with each day.
+# ---
+_workerClassifier = None
+
+
+# -----------------------------------------------------------------------------
+# _initWorker
+#
+# A spawned process's logger has no handlers.  With a log queue, the
+# classifier's logger puts its records on the queue, at the level of the
+# parent's logger, for the parent to handle.
+# -----------------------------------------------------------------------------
+def _initWorker(classifier,
+                logQueue: multiprocessing.Queue = None,
+                logLevel: int = logging.NOTSET) -> None:
+
+    global _workerClassifier
+    _workerClassifier = classifier
+
+    logger = classifier._logger
+
+    if logger and logQueue is not None:
+
+        logger.handlers = [QueueHandler(logQueue)]
+        logger.setLevel(logLevel)
+        logger.propagate = False
+
+
+# -----------------------------------------------------------------------------
+# _runWorkerDay
+# -----------------------------------------------------------------------------
+def _runWorkerDay(sensor: str, day: int) -> str:
+    return _workerClassifier._runDay(sensor, day)
 
 
 # -----------------------------------------------------------------------------
@@ -51,7 +102,12 @@ class Classifier(object):
                  generateMasks=True,
                  dataType: int = np.int16,
                  noData: int = None,
-                 badData: int = None):
+                 badData: int = None,
+                 prefetch: int = 0,
+                 minUsableFraction: float = None,
+                 validRegion: ValidRegion = None,
+                 numWorkers: int = 1,
+                 useProcesses: bool = False):
 
         # ---
         # Validate output directory.
@@ -102,13 +158,21 @@ class Classifier(object):
         self._year = year
 
         # ---
-        # Set the bands.  MaskGenerator needs a certain set of bands.  Ensure
-        # those are read, too.
+        # Set the bands.  inBands are the bands the classifier consumes, and
+        # MaskGenerator needs a certain set of bands.  Read only those.
         # ---
-        bands = BandReader.ALL_BANDS if inBands is None else set(inBands)
-        bands = bands.union(MaskGenerator.REQUIRED_BANDS)
+        self._inBands: set = \
+            BandReader.ALL_BANDS if inBands is None else set(inBands)
+
+        planner = BandPlanner(logger)
+        self._addStages(planner)
+
+        planner.addStage('MaskGenerator', MaskGenerator.REQUIRED_BANDS)
+        planner.logPlan()
+
+        self._bands: set = planner.getBands()
         self._bandReader = br
-        self._bandReader.setBands(bands)
+        self._bandReader.setBands(self._bands)
 
         # ---
         # Set the days.
@@ -126,21 +190,156 @@ class Classifier(object):
         self._noData: int = noData or Classifier.NO_DATA
         self._badData: int = badData or Classifier.BAD_DATA
 
+        # ---
+        # The number of days to read ahead on a background thread while the
+        # current day is classified and written.  Zero reads serially.
+        # ---
+        if prefetch < 0:
+            raise ValueError('Prefetch must be zero or more days.')
+
+        self._prefetch: int = prefetch
+
+        # ---
+        # The number of days to read, classify and write at once, on a pool
+        # of threads or, with useProcesses, of processes.  Each worker runs
+        # whole days, so it replaces read-ahead.
+        # ---
+        if numWorkers < 1:
+
+            raise RuntimeError('The number of workers must be at least ' +
+                               'one.  It was specified as ' +
+                               str(numWorkers))
+
+        if numWorkers > 1 and prefetch:
+
+            raise RuntimeError('Read-ahead and parallel workers cannot be ' +
+                               'combined.  Each worker reads its own days.')
+
+        self._numWorkers: int = numWorkers
+        self._useProcesses: bool = useProcesses
+
+        # ---
+        # Each day is read into, and processed in, a frame of tile-sized
+        # arrays reused from day to day.  With read-ahead, a frame is needed
+        # for the day being read, each day in the queue and the day being
+        # classified.  Worker threads need one each.  Worker processes have
+        # their own copies of the pool.
+        # ---
+        if prefetch:
+            numFrames = prefetch + 2
+
+        elif useProcesses:
+            numFrames = 1
+
+        else:
+            numFrames = numWorkers
+
+        self._bufferPool = BufferPool(numFrames)
+
+        # ---
+        # With a minimum usable fraction, each day is read in two phases.
+        # State and solar zenith come first.  The other bands are read only
+        # if more than this fraction of pixels passes their mask rules;
+        # otherwise the day is written as all bad data.  Zero skips only days
+        # with no usable pixels, which are all bad data anyway.
+        # ---
+        if minUsableFraction is not None and \
+           not 0 <= minUsableFraction <= 1:
+
+            raise ValueError('Minimum usable fraction must be from 0 to 1.')
+
+        self._minUsableFraction: float = minUsableFraction
+
+        # ---
+        # With a valid region, pixels outside its window are neither read nor
+        # classified, and are written as no data.  Debug runs process the
+        # whole tile, so the intermediate images are written as before.
+        # ---
+        self._validRegion: ValidRegion = None if debug else validRegion
+
+        if self._validRegion and logger:
+            logger.info('Valid region: ' + str(self._validRegion))
+
+    # -------------------------------------------------------------------------
+    # _addStages
+    #
+    # Declare the bands this classifier consumes to the band planner.
+    # -------------------------------------------------------------------------
+    def _addStages(self, planner: BandPlanner) -> None:
+        planner.addStage('classifier', self._inBands)
+
     # -------------------------------------------------------------------------
     # computeNdvi
+    #
+    # ((sr2 - sr1) / (sr2 + sr1)) * 10000, truncated, and 0 where sr1 + sr2
+    # is 0.
     # -------------------------------------------------------------------------
     def computeNdvi(self, sr1, sr2):
 
-        ndvi_unfiltered = \
-            (((sr2 - sr1) / (sr2 + sr1)) * 10000).astype(self._npDt)
+        ndvi = np.empty(sr1.shape, dtype=self._npDt)
+
+        return NormalizedDifference.compute(sr2, sr1, ndvi)
+
+    # -------------------------------------------------------------------------
+    # _classifyGoodPixels
+    #
+    # Pixels the general mask marks bad become Classifier.BAD_DATA whatever
+    # their class, so only the good pixels are classified.  They are gathered
+    # from the classifier's bands into a BandCube of 1-D bands, passed to
+    # _runOneSensorOneDay() and the predictions are scattered back.  Bad
+    # pixels are returned as Classifier.BAD_DATA.
+    # -------------------------------------------------------------------------
+    def _classifyGoodPixels(self, bandDict, generalMask, outName, frame):
+
+        good = frame.get('good', generalMask.shape, bool)
+        np.equal(generalMask, MaskGenerator.GOOD_DATA, out=good)
+        numGood = int(np.count_nonzero(good))
+
+        if self._logger:
+
+            self._logger.info('Classifiying ' + str(numGood) + ' of ' +
+                              str(good.size) + ' pixels')
+
+        predictedImage = frame.get('predictions', good.shape, self._npDt)
+        predictedImage.fill(Classifier.BAD_DATA)
+
+        if numGood == 0:
+            return predictedImage
 
-        ndvi = np.where(sr1 + sr2 != 0, ndvi_unfiltered, 0)
-        return ndvi
+        # ---
+        # The compact cube is the leading numGood columns of a tile-sized
+        # block of the frame, one for each classifier sharing the frame.
+        # Feature bands that are not read, like derived indices, are left for
+        # _runOneSensorOneDay() to fill.
+        # ---
+        featureBands = self._getFeatureBands()
+
+        block = frame.get('compact-' + self.getClassifierName(),
+                          (len(featureBands), good.size),
+                          np.int16)[:, :numGood]
+
+        compactCube = BandCube(featureBands, block=block)
+
+        for band in featureBands:
+
+            if band in bandDict:
+                compactCube.setBand(band, bandDict[band], good)
+
+        predictedImage[good] = self._runOneSensorOneDay(compactCube, outName)
+
+        return predictedImage
 
     # -------------------------------------------------------------------------
     # createOutputImage
+    #
+    # geo is the (geotransform, projection) read with the day.  What it
+    # lacks is taken from the band reader.
     # -------------------------------------------------------------------------
-    def _createOutputImage(self, name, predictions):
+    def _createOutputImage(self, name, predictions, geo=None):
+
+        xform, proj = geo or (None, None)
+        xform = xform or self._bandReader.getXform()
+        proj = proj or self._bandReader.getProj()
 
         driver = gdal.GetDriverByName('GTiff')
 
@@ -152,15 +351,17 @@ class Classifier(object):
                            options=['COMPRESS=LZW'])
 
         ds.SetSpatialRef(Classifier.MODIS_SINUSOIDAL_6842)
-        ds.SetGeoTransform(self._bandReader.getXform())
-        ds.SetProjection(self._bandReader.getProj())
+        ds.SetGeoTransform(xform)
+        ds.SetProjection(proj)
         ds.GetRasterBand(1).SetNoDataValue(self._noData)
+
+        metadata = self._getOutputMetadata()
+
+        if metadata:
+            ds.SetMetadata(metadata)
         
-        ds.WriteRaster(0, 
-                       0, 
-                       self._bandReader.getCols(), 
-                       self._bandReader.getRows(), 
-                       predictions.tobytes())
+        # WriteArray writes from the array, without copying it to bytes.
+        ds.GetRasterBand(1).WriteArray(predictions)
 
         if self._debug and self._logger:
 
@@ -182,6 +383,33 @@ class Classifier(object):
 
         return outName
 
+    # -------------------------------------------------------------------------
+    # _getBandCube
+    #
+    # Returns the frame's cube of the bands to read, and offers its planes to
+    # the band reader as the arrays to read into.  The cube is kept in the
+    # frame, so each band's type carries over from day to day.
+    # -------------------------------------------------------------------------
+    def _getBandCube(self, frame: BufferPool.Frame) -> BandCube:
+
+        cube = frame.find('bandCube')
+
+        if cube is None:
+
+            shape = (self._bandReader.getRows(), self._bandReader.getCols())
+
+            if self._validRegion:
+                shape = self._validRegion.getShape()
+
+            cube = BandCube(sorted(self._bands), shape)
+
+            frame.keep('bandCube', cube)
+
+        for band in cube:
+            frame.keep(band, cube[band])
+
+        return cube
+
     # -------------------------------------------------------------------------
     # getClassifierName
     # -------------------------------------------------------------------------
@@ -190,38 +418,139 @@ class Classifier(object):
         raise NotImplementedError()
 
     # -------------------------------------------------------------------------
-    # maskClassifyWrite
+    # getValidRegion
     # -------------------------------------------------------------------------
-    def _maskClassifyWrite(self, bandDict, outName):
+    def getValidRegion(self) -> ValidRegion:
+        return self._validRegion
+
+    # -------------------------------------------------------------------------
+    # _getOutputMetadata
+    #
+    # Returns GeoTIFF metadata items written with each daily image, like
+    # those identifying a model.
+    # -------------------------------------------------------------------------
+    def _getOutputMetadata(self) -> dict:
+        return {}
+
+    # -------------------------------------------------------------------------
+    # _getFeatureBands
+    #
+    # Returns the bands of the cube passed to _runOneSensorOneDay(), in the
+    # order of its planes.  Subclasses may add bands they derive.
+    # -------------------------------------------------------------------------
+    def _getFeatureBands(self) -> list:
+
+        return sorted(self._inBands & self._bands)
+
+    # -------------------------------------------------------------------------
+    # _finalizeImage
+    #
+    # Returns the final image from the predictions and masks: pixels the
+    # general mask marks bad are Classifier.BAD_DATA, and land where the land
+    # mask is bad is self._badData.  It is an array of the frame.
+    # -------------------------------------------------------------------------
+    def _finalizeImage(self,
+                       predictedImage: np.ndarray,
+                       generalMask: np.ndarray,
+                       landMask: np.ndarray,
+                       frame: BufferPool.Frame) -> np.ndarray:
+
+        if self._logger:
+            self._logger.info('Masking')
+
+        shape = generalMask.shape
+        scratch = frame.get('scratch', shape, bool)
+        finalImage = frame.get('finalImage', shape, self._npDt)
+        np.copyto(finalImage, predictedImage, casting='unsafe')
+
+        # Pixels the general mask marks bad are BAD_DATA.
+        np.not_equal(generalMask, MaskGenerator.GOOD_DATA, out=scratch)
+        np.copyto(finalImage, Classifier.BAD_DATA, where=scratch)
+
+        # Land where the land mask is bad is self._badData.
+        landBad = frame.get('landBad', shape, bool)
+        np.equal(landMask, MaskGenerator.BAD_DATA, out=landBad)
+        np.equal(finalImage, Classifier.LAND, out=scratch)
+        scratch &= landBad
+        np.copyto(finalImage, self._badData, where=scratch)
+
+        if self._debug:
+            if self._logger:
+                self._logger.info('Final image type: ' +
+                                  str(finalImage.dtype))
+
+        return finalImage
+
+    # -------------------------------------------------------------------------
+    # _createMasks
+    #
+    # Returns (general mask, land mask), arrays of the frame.
+    # -------------------------------------------------------------------------
+    def _createMasks(self,
+                     bandDict: dict,
+                     frame: BufferPool.Frame) -> tuple:
+
+        shape = bandDict[BandReader.STATE].shape
 
-        # ---
-        # Create mask
-        # ---
         if self._logger:
             self._logger.info('Generating mask')
 
         maskGen = MaskGenerator(bandDict)
         
-        # int64, bandDict int16
-        generalMask: np.ndarray = maskGen.generateGeneralMask(self._debug)
-        landMask: np.ndarray = maskGen.generateLandMask(self._debug)
+        # uint8, bandDict int16
+        generalMask: np.ndarray = maskGen.generateGeneralMask(
+            self._debug,
+            out=frame.get('generalMask', shape, np.uint8),
+            scratch=frame.get('scratch', shape, bool))
+
+        landMask: np.ndarray = maskGen.generateLandMask(
+            self._debug,
+            out=frame.get('landMask', shape, np.uint8))
 
         if self._debug:
 
             if self._logger:
                 self._logger.info('Mask type: ' + str(generalMask.dtype))
 
-            Utils.writeRaster(self._outDir, generalMask, 'GeneralMask')
-            Utils.writeRaster(self._outDir, landMask, 'LandMask')
+            # writeRaster writes Int16.
+            Utils.writeRaster(self._outDir,
+                              generalMask.astype(np.int16),
+                              'GeneralMask')
+
+            Utils.writeRaster(self._outDir,
+                              landMask.astype(np.int16),
+                              'LandMask')
+
+        return generalMask, landMask
+
+    # -------------------------------------------------------------------------
+    # maskClassify
+    #
+    # Returns the final image, of the bands' shape, which is an array of the
+    # frame.  The masks and intermediate images are arrays of the frame, too.
+    # Without a frame, they are new arrays.
+    # -------------------------------------------------------------------------
+    def _maskClassify(self, bandDict, outName, frame=None):
+
+        frame = frame or BufferPool.Frame()
+        generalMask, landMask = self._createMasks(bandDict, frame)
 
         # ---
         # Classify
         # ---
-        if self._logger:
-            self._logger.info('Classifiying')
+        if self._debug:
 
-        predictedImage = \
-            self._runOneSensorOneDay(bandDict, outName)
+            if self._logger:
+                self._logger.info('Classifiying')
+
+            predictedImage = \
+                self._runOneSensorOneDay(bandDict, outName)
+
+        else:
+            predictedImage = self._classifyGoodPixels(bandDict,
+                                                      generalMask,
+                                                      outName,
+                                                      frame)
 
         if self._debug:
 
@@ -237,92 +566,595 @@ class Classifier(object):
                               predictedImage,
                               'predBeforeMask')
 
-        # ---
-        # Final image
-        # ---
+        return self._finalizeImage(predictedImage,
+                                   generalMask,
+                                   landMask,
+                                   frame)
+
+    # -------------------------------------------------------------------------
+    # maskClassifyWrite
+    #
+    # With a valid region, bandDict is its window, as _readDay() reads it.
+    # -------------------------------------------------------------------------
+    def _maskClassifyWrite(self, bandDict, outName, frame=None, geo=None):
+
+        frame = frame or BufferPool.Frame()
+        finalImage = self._maskClassify(bandDict, outName, frame)
+        self._writeFinalImage(finalImage, outName, frame, geo)
+
+    # -------------------------------------------------------------------------
+    # _drainPrefetchQueue
+    #
+    # Release the frames of days read ahead but not classified, like those
+    # left when a run stops early.  Call this after the producer stops.
+    # -------------------------------------------------------------------------
+    def _drainPrefetchQueue(self, dayQueue: queue.Queue) -> None:
+
+        while True:
+
+            try:
+                queuedDay, readResult, error, frame = dayQueue.get_nowait()
+
+            except queue.Empty:
+                return
+
+            if frame:
+                self._bufferPool.release(frame)
+
+    # -------------------------------------------------------------------------
+    # _getPrefetchedDay
+    #
+    # Returns (what _readDay() returned for the day, the day's frame).  The
+    # caller releases the frame.
+    # -------------------------------------------------------------------------
+    def _getPrefetchedDay(self, dayQueue: queue.Queue, day: int) -> tuple:
+
+        queuedDay, readResult, error, frame = dayQueue.get()
+
+        if queuedDay != day:
+
+            if frame:
+                self._bufferPool.release(frame)
+
+            raise RuntimeError('Expected day ' + str(day) +
+                               ' from the read-ahead queue, but got ' +
+                               str(queuedDay))
+
+        if error:
+            raise error
+
+        return readResult, frame
+
+    # -------------------------------------------------------------------------
+    # _isDayDone
+    #
+    # Whether the output of a day exists.  Those days are not read.
+    # -------------------------------------------------------------------------
+    def _isDayDone(self, sensor: str, day: int) -> bool:
+
+        return os.path.exists(self._createOutputImageName(sensor, day))
+
+    # -------------------------------------------------------------------------
+    # _logSkippedDay
+    # -------------------------------------------------------------------------
+    def _logSkippedDay(self, sensor: str, day: int) -> None:
+
         if self._logger:
-            self._logger.info('Masking')
 
-        generalMaskedImage = \
-            np.where(generalMask == MaskGenerator.GOOD_DATA,
-                     predictedImage,
-                     Classifier.BAD_DATA).astype(self._npDt)
-                                      
-        predictedLandAndMasked = ((generalMaskedImage == Classifier.LAND) &
-                                  (landMask == MaskGenerator.BAD_DATA))
+            self._logger.info('Sensor ' + str(sensor) +
+                              ', day ' + str(day) +
+                              ' skipped due to a run-time error.')
 
-        finalImage = np.where(predictedLandAndMasked,
-                              self._badData,
-                              generalMaskedImage).astype(self._npDt)
+    # -------------------------------------------------------------------------
+    # _prefetchDays
+    #
+    # The producer half of the read-ahead pipeline.  It reads the days in
+    # order, each into a frame from the buffer pool, and queues (day,
+    # _readDay() result, error, frame).  A read error is queued, so the
+    # consumer handles it for that day like any other.  The queue holds at
+    # most prefetch days, and the buffer pool prefetch + 2 frames: those
+    # days, the day being read and the day being classified.
+    # -------------------------------------------------------------------------
+    def _prefetchDays(self,
+                      sensor: str,
+                      days: list,
+                      dayQueue: queue.Queue,
+                      stop: threading.Event) -> None:
 
-        self._createOutputImage(outName, finalImage)
+        for day in days:
+
+            frame = None
+
+            while not frame:
+
+                if stop.is_set():
+                    return
+
+                frame = self._bufferPool.acquire(timeout=1)
+
+            try:
+                item = (day, self._readDay(sensor, day, frame), None, frame)
+
+            except Exception as e:
+
+                self._bufferPool.release(frame)
+                item = (day, None, e, None)
+
+            while True:
+
+                if stop.is_set():
+
+                    if item[3]:
+                        self._bufferPool.release(item[3])
+
+                    return
+
+                try:
+                    dayQueue.put(item, timeout=1)
+                    break
+
+                except queue.Full:
+                    continue
+
+    # -------------------------------------------------------------------------
+    # _readDay
+    #
+    # Returns (bandDict, usable, geo).  When usable is false, bandDict holds
+    # only the first-phase bands and the day is to be written as all bad
+    # data.  With a frame, the bands are read into its arrays, and a day read
+    # in full is returned as the frame's BandCube.  geo is the day's
+    # (geotransform, projection), from the first read that has them.
+    #
+    # With a valid region, only its window of each band is read.
+    # -------------------------------------------------------------------------
+    def _readDay(self,
+                 sensor: str,
+                 day: int,
+                 frame: BufferPool.Frame = None) -> tuple:
+
+        cube = self._getBandCube(frame) if frame else None
+        window = self._validRegion.getWindow() if self._validRegion else None
+
+        if self._minUsableFraction is None:
+
+            bandDict, xform, proj = \
+                self._bandReader.readDay(sensor=sensor,
+                                         year=self._year,
+                                         day=day,
+                                         tile=self._tile,
+                                         frame=frame,
+                                         window=window)
+
+            return self._toBandCube(bandDict, cube), True, (xform, proj)
+
+        bandDict, xform, proj = \
+            self._bandReader.readDay(sensor=sensor,
+                                     year=self._year,
+                                     day=day,
+                                     tile=self._tile,
+                                     bands=MaskGenerator.USABLE_BANDS,
+                                     frame=frame,
+                                     window=window)
+
+        if len(bandDict) == 0:
+            return bandDict, True, (xform, proj)
+
+        numPixels = bandDict[BandReader.STATE].size
+        fraction = MaskGenerator.countUsable(bandDict) / numPixels \
+            if numPixels else 0.0
+
+        if fraction <= self._minUsableFraction:
 
-        if self._debug:
             if self._logger:
-                self._logger.info('Final image type: ' +
-                                  str(finalImage.dtype))
+
+                skippedBands = self._bands - set(bandDict.keys())
+
+                skippedBytes = len(skippedBands) * numPixels * \
+                    np.dtype(np.int16).itemsize
+
+                self._logger.info('Day ' + str(day) + ' is ' +
+                                  '{:.2%}'.format(fraction) + ' usable.  ' +
+                                  'Skipped reading ' +
+                                  str(len(skippedBands)) + ' bands, ' +
+                                  str(skippedBytes) + ' bytes.')
+
+            return bandDict, False, (xform, proj)
+
+        restDict, restXform, restProj = self._bandReader.readDay(
+            sensor=sensor,
+            year=self._year,
+            day=day,
+            tile=self._tile,
+            bands=self._bands - set(bandDict.keys()),
+            frame=frame,
+            window=window)
+
+        bandDict.update(restDict)
+        geo = (xform or restXform, proj or restProj)
+
+        return self._toBandCube(bandDict, cube), True, geo
 
     # -------------------------------------------------------------------------
     # run
     # -------------------------------------------------------------------------
     def run(self):
 
+        if self._numWorkers > 1:
+
+            self._runParallel()
+            return
+
+        for sensor in self._sensors:
+
+            # ---
+            # With read-ahead, a background thread reads the days that have
+            # no output yet, in order, while this thread classifies and
+            # writes.
+            # ---
+            dayQueue = None
+            daysToRead = None
+            stop = threading.Event()
+
+            if self._prefetch:
+
+                daysToRead = [day for day in self._days
+                              if not self._isDayDone(sensor, day)]
+
+                dayQueue = queue.Queue(maxsize=self._prefetch)
+
+                producer = threading.Thread(target=self._prefetchDays,
+                                            args=(sensor,
+                                                  daysToRead,
+                                                  dayQueue,
+                                                  stop),
+                                            daemon=True)
+                producer.start()
+
+            try:
+                self._runSensor(sensor, dayQueue, daysToRead)
+
+            finally:
+
+                if dayQueue:
+
+                    stop.set()
+                    producer.join()
+                    self._drainPrefetchQueue(dayQueue)
+
+    # -------------------------------------------------------------------------
+    # _runParallel
+    #
+    # Distribute the (sensor, day) units without output over the workers.
+    # Each worker reads, classifies and writes whole days, reading through
+    # BandReader.readDay(), which does not change the reader.  Days finish
+    # out of order.  A day that fails is logged here with its traceback and
+    # skipped, as a serial run skips it.
+    #
+    # Worker processes are spawned, rather than forked from a process that
+    # may hold GDAL, HDF or Numba threads and locks.  Each receives one copy
+    # of this classifier, which opens its own granules.  A random forest
+    # loaded from a compiled model directory is copied as the directory, so
+    # the processes share it.  The workers' log records are sent back on a
+    # queue and logged here.
+    # -------------------------------------------------------------------------
+    def _runParallel(self) -> None:
+
+        units = []
+
         for sensor in self._sensors:
 
             for day in self._days:
 
-                if self._logger:
+                if not self._isDayDone(sensor, day):
+                    units.append((sensor, day))
 
-                    self._logger.info('Reading ' + str(sensor) +
-                                      ' tile ' + str(self._tile) +
-                                      ' for day ' + str(day))
+                elif self._logger:
 
-                try:
-                    outName = self._createOutputImageName(sensor, day)
+                    self._logger.info('Output for sensor ' + str(sensor) +
+                                      ', day ' + str(day) +
+                                      ' already exists.')
 
-                    if not os.path.exists(outName):
+        if not units:
+            return
 
-                        if self._logger:
-                            self._logger.info('Creating ' + outName)
+        numWorkers = min(self._numWorkers, len(units))
+
+        listener = None
+
+        if self._useProcesses:
+
+            context = multiprocessing.get_context('spawn')
+            logQueue = None
+            logLevel = logging.NOTSET
+
+            # ---
+            # The workers' records are handled by this process's logger,
+            # as if it had logged them.  QueueListener calls handle() on
+            # each of its handlers, which a logger has.
+            # ---
+            if self._logger:
+
+                logQueue = context.Queue()
+                logLevel = self._logger.getEffectiveLevel()
+                listener = QueueListener(logQueue, self._logger)
+                listener.start()
+
+            executor = ProcessPoolExecutor(
+                max_workers=numWorkers,
+                mp_context=context,
+                initializer=_initWorker,
+                initargs=(self, logQueue, logLevel))
+
+            runDay = _runWorkerDay
+
+        else:
+
+            executor = ThreadPoolExecutor(max_workers=numWorkers)
+            runDay = self._runDay
+
+        if self._logger:
+
+            self._logger.info('Running ' + str(len(units)) + ' days on ' +
+                              str(numWorkers) + ' worker ' +
+                              ('processes.' if self._useProcesses
+                               else 'threads.'))
+
+        numSkipped = 0
+
+        try:
+
+            with executor:
 
-                        bandDict = self._bandReader.read(sensor=sensor,
-                                                         year=self._year,
-                                                         day=day,
-                                                         tile=self._tile)
+                futures = [executor.submit(runDay, sensor, day)
+                           for sensor, day in units]
 
-                        if len(bandDict) > 0:
+                for (sensor, day), future in zip(units, futures):
 
-                            self._maskClassifyWrite(bandDict, outName)
+                    try:
+                        error = future.result()
 
-                        elif self._logger:
+                    except Exception:
 
-                            self._logger.info('No matching HDFs found.')
+                        # Like a worker process that died.
+                        error = traceback.format_exc()
 
-                    else:
+                    if error:
+
+                        numSkipped += 1
 
                         if self._logger:
+                            self._logger.info(error)
 
-                            self._logger.info('Output file, ' + outName +
-                                              ', already exists.')
+                        self._logSkippedDay(sensor, day)
 
-                except Exception:
+        finally:
 
-                    if self._logger:
+            # The workers have exited, so their records are all queued.
+            if listener:
+                listener.stop()
 
-                        self._logger.info(None, exc_info=True)
+        if numSkipped and self._logger:
 
-                        msg = 'Sensor ' + str(sensor) + \
-                              ', day ' + str(day) + \
-                              ' skipped due to a run-time error.'
+            self._logger.info(str(numSkipped) + ' of ' + str(len(units)) +
+                              ' days were skipped due to run-time errors.')
 
-                        self._logger.info(msg)
+    # -------------------------------------------------------------------------
+    # _runSensor
+    #
+    # With read-ahead, every day in daysToRead is taken from the queue, even
+    # if its output appeared in the meantime, so the queue stays in step.
+    # -------------------------------------------------------------------------
+    def _runSensor(self,
+                   sensor: str,
+                   dayQueue: queue.Queue = None,
+                   daysToRead: list = None) -> None:
 
-                    # raise e
-                    continue
+        prefetched = set(daysToRead or [])
+
+        for day in self._days:
+
+            if self._logger:
+
+                self._logger.info('Reading ' + str(sensor) +
+                                  ' tile ' + str(self._tile) +
+                                  ' for day ' + str(day))
+
+            frame = None
+
+            try:
+                readResult = None
+
+                if day in prefetched:
+
+                    readResult, frame = \
+                        self._getPrefetchedDay(dayQueue, day)
+
+                if not self._isDayDone(sensor, day):
+
+                    if readResult is None:
+
+                        frame = self._bufferPool.acquire()
+                        readResult = self._readDay(sensor, day, frame)
+
+                    bandDict, usable, geo = readResult
+
+                    if len(bandDict) > 0:
+
+                        self._writeDay(sensor,
+                                       day,
+                                       bandDict,
+                                       usable,
+                                       frame,
+                                       geo)
+
+                    elif self._logger:
+
+                        self._logger.info('No matching HDFs found.')
+
+                elif self._logger:
+
+                    self._logger.info('Output for sensor ' + str(sensor) +
+                                      ', day ' + str(day) +
+                                      ' already exists.')
+
+            except Exception:
+
+                if self._logger:
+                    self._logger.info(None, exc_info=True)
+
+                self._logSkippedDay(sensor, day)
+
+                # raise e
+                continue
+
+            finally:
+
+                # The day's arrays are not used past here.
+                if frame:
+                    self._bufferPool.release(frame)
+
+    # -------------------------------------------------------------------------
+    # _runDay
+    #
+    # Read, classify and write one day in a frame of its own.  Returns the
+    # traceback of an error, or None, so a worker process reports a failed
+    # day to the process that logs it.
+    # -------------------------------------------------------------------------
+    def _runDay(self, sensor: str, day: int) -> str:
+
+        if self._logger:
+
+            self._logger.info('Reading ' + str(sensor) +
+                              ' tile ' + str(self._tile) +
+                              ' for day ' + str(day))
+
+        frame = self._bufferPool.acquire()
+
+        try:
+            bandDict, usable, geo = self._readDay(sensor, day, frame)
+
+            if len(bandDict) > 0:
+                self._writeDay(sensor, day, bandDict, usable, frame, geo)
+
+            elif self._logger:
+                self._logger.info('No matching HDFs found.')
+
+        except Exception:
+            return traceback.format_exc()
+
+        finally:
+            self._bufferPool.release(frame)
+
+        return None
 
     # -------------------------------------------------------------------------
     # _runOneSensorOneDay
+    #
+    # Returns the predictions, of the bands' shape.  Except when debugging,
+    # the bands are 1-D arrays of the good pixels only.
     # -------------------------------------------------------------------------
     def _runOneSensorOneDay(self, bandDict, outName):
 
         raise NotImplementedError()
+
+    # -------------------------------------------------------------------------
+    # _toBandCube
+    #
+    # Returns the bands in the cube.  Bands read into its planes are not
+    # copied; the others, like those loaded from the band cache, are.  Bands
+    # that do not fill the cube, like an incomplete day, are returned as
+    # they are.
+    # -------------------------------------------------------------------------
+    def _toBandCube(self, bandDict: dict, cube: BandCube) -> dict:
+
+        if cube is None or \
+           set(bandDict.keys()) != set(cube.keys()) or \
+           any([array.shape != cube.getShape() or
+                array.dtype.itemsize != cube.getBlock().itemsize
+                for array in bandDict.values()]):
+
+            return bandDict
+
+        for band, array in bandDict.items():
+            cube.setBand(band, array)
+
+        return cube
+
+    # -------------------------------------------------------------------------
+    # _writeDay
+    #
+    # Classify and write a day read by _readDay(), or write it as all bad
+    # data if it is not usable.
+    # -------------------------------------------------------------------------
+    def _writeDay(self,
+                  sensor: str,
+                  day: int,
+                  bandDict: dict,
+                  usable: bool,
+                  frame: BufferPool.Frame = None,
+                  geo: tuple = None) -> None:
+
+        outName = self._createOutputImageName(sensor, day)
+
+        if self._logger:
+            self._logger.info('Creating ' + outName)
+
+        if usable:
+            self._maskClassifyWrite(bandDict, outName, frame, geo)
+
+        else:
+            self._writeBadData(outName, frame, geo)
+
+    # -------------------------------------------------------------------------
+    # _writeBadData
+    #
+    # Write a day with no usable pixels without classifying it.  Classifying
+    # it would mark every pixel Classifier.BAD_DATA.
+    # -------------------------------------------------------------------------
+    def _writeBadData(self, outName, frame=None, geo=None):
+
+        if self._logger:
+            self._logger.info('Writing all bad data')
+
+        frame = frame or BufferPool.Frame()
+
+        finalImage = frame.get('expandedImage',
+                               (self._bandReader.getRows(),
+                                self._bandReader.getCols()),
+                               self._npDt)
+
+        if self._validRegion:
+
+            finalImage.fill(self._noData)
+            self._validRegion.crop(finalImage).fill(Classifier.BAD_DATA)
+
+        else:
+            finalImage.fill(Classifier.BAD_DATA)
+
+        self._createOutputImage(outName, finalImage, geo)
+
+    # -------------------------------------------------------------------------
+    # _writeFinalImage
+    #
+    # Write a final image.  With a valid region, it is the window's image,
+    # and is expanded to the tile with self._noData.
+    # -------------------------------------------------------------------------
+    def _writeFinalImage(self,
+                         finalImage: np.ndarray,
+                         outName: str,
+                         frame: BufferPool.Frame = None,
+                         geo: tuple = None) -> None:
+
+        if self._validRegion:
+
+            frame = frame or BufferPool.Frame()
+
+            finalImage = self._validRegion.expand(
+                finalImage,
+                self._noData,
+                out=frame.get('expandedImage',
+                              (self._bandReader.getRows(),
+                               self._bandReader.getCols()),
+                              self._npDt))
+
+        self._createOutputImage(outName, finalImage, geo)
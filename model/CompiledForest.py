@@ -0,0 +1,350 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+# -----------------------------------------------------------------------------
+# _sumLeafValues
+#
+# For each pixel, walk every tree from its root to a leaf and add the leaf's
+# class probabilities to out, tree by tree.  Leaves are their own children.
+# -----------------------------------------------------------------------------
+def _sumLeafValues(features, feature, threshold, left, right, value, roots,
+                   out):
+
+    numClasses = value.shape[1]
+
+    for i in range(features.shape[0]):
+
+        for tree in range(roots.shape[0]):
+
+            node = roots[tree]
+
+            while left[node] != node:
+
+                if features[i, feature[node]] <= threshold[node]:
+                    node = left[node]
+
+                else:
+                    node = right[node]
+
+            for c in range(numClasses):
+                out[i, c] += value[node, c]
+
+
+if NUMBA_AVAILABLE:
+
+    # Callers parallelize over chunks of pixels, so it releases the GIL.
+    _sumLeafValues = njit(nogil=True, cache=True)(_sumLeafValues)
+
+
+# -----------------------------------------------------------------------------
+# class CompiledForest
+#
+# A scikit-learn random forest classifier compiled into flat node arrays:
+# each node's feature index, threshold and children, and each leaf's class
+# probabilities, with the trees concatenated.  predict() traverses them
+# directly on integer features, with Numba if it is installed, or level by
+# level in NumPy otherwise.
+#
+# Its predictions are identical to the forest's predict():
+#
+# - The forest compares float32 features to float64 thresholds.  Integer
+#   features are exact in float32, and x <= t exactly when x <= floor(t), so
+#   the thresholds are stored as integers.
+# - Leaf probabilities are normalized as DecisionTreeClassifier does, summed
+#   tree by tree in float64, divided by the number of trees and resolved to
+#   the first class of greatest probability, as the forest does.
+#
+# save() writes the arrays to a directory of .npy files, and a compiled
+# forest loaded from that directory memory-maps them read-only.  Processes
+# that load the same directory share one copy of the forest in the page
+# cache, and loading reads only the small JSON description.
+# -----------------------------------------------------------------------------
+class CompiledForest(object):
+
+    ARRAYS = ['feature', 'threshold', 'left', 'right', 'value', 'roots',
+              'depths']
+
+    DESCRIPTION_FILE = 'forest.json'
+
+    # -------------------------------------------------------------------------
+    # __init__
+    #
+    # Give a fitted forest to compile it, or the directory of a saved
+    # compiled forest to load it.
+    # -------------------------------------------------------------------------
+    def __init__(self, forest=None, directory: Path = None):
+
+        if (forest is None) == (directory is None):
+
+            raise RuntimeError('A compiled forest needs a forest or a ' +
+                               'directory, but not both.')
+
+        self._directory: Path = None
+
+        if directory is not None:
+
+            self._load(Path(directory))
+            return
+
+        estimators = getattr(forest, 'estimators_', None)
+
+        if not estimators:
+
+            raise RuntimeError('Unable to compile ' + str(type(forest)) +
+                               '.  It must be a fitted random forest ' +
+                               'classifier.')
+
+        if getattr(forest, 'n_outputs_', 1) != 1:
+            raise RuntimeError('Only single-output forests are supported.')
+
+        self._classes: np.ndarray = np.asarray(forest.classes_)
+        numClasses = self._classes.shape[0]
+
+        features = []
+        thresholds = []
+        lefts = []
+        rights = []
+        values = []
+        roots = []
+        depths = []
+        offset = 0
+
+        for estimator in estimators:
+
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            isLeaf = tree.children_left < 0
+
+            # Leaves point to themselves, with a feature that exists.
+            feature = np.where(isLeaf, 0, tree.feature)
+            left = np.where(isLeaf, nodes, tree.children_left) + offset
+            right = np.where(isLeaf, nodes, tree.children_right) + offset
+
+            threshold = np.clip(np.floor(np.where(isLeaf, 0, tree.threshold)),
+                                np.iinfo(np.int32).min,
+                                np.iinfo(np.int32).max)
+
+            # As DecisionTreeClassifier.predict_proba() normalizes.
+            value = tree.value[:, 0, :numClasses].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value /= normalizer
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            values.append(value)
+            roots.append(offset)
+            depths.append(tree.max_depth)
+            offset += tree.node_count
+
+        self._feature: np.ndarray = np.concatenate(features).astype(np.int32)
+        self._threshold: np.ndarray = \
+            np.concatenate(thresholds).astype(np.int32)
+        self._left: np.ndarray = np.concatenate(lefts).astype(np.int32)
+        self._right: np.ndarray = np.concatenate(rights).astype(np.int32)
+        self._value: np.ndarray = np.concatenate(values)
+        self._roots: np.ndarray = np.array(roots, dtype=np.int32)
+        self._depths: np.ndarray = np.array(depths, dtype=np.int32)
+        self._numFeatures: int = int(getattr(forest, 'n_features_in_', 0))
+        self._info: dict = {}
+
+    # -------------------------------------------------------------------------
+    # __getstate__
+    #
+    # A forest loaded from a directory is copied, like to a worker process,
+    # as its directory, and the copy maps the same files.
+    # -------------------------------------------------------------------------
+    def __getstate__(self) -> dict:
+
+        if self._directory is not None:
+            return {'_directory': self._directory}
+
+        return self.__dict__
+
+    # -------------------------------------------------------------------------
+    # __setstate__
+    # -------------------------------------------------------------------------
+    def __setstate__(self, state: dict) -> None:
+
+        if list(state.keys()) == ['_directory']:
+            self._load(state['_directory'])
+
+        else:
+            self.__dict__.update(state)
+
+    # -------------------------------------------------------------------------
+    # getClasses
+    # -------------------------------------------------------------------------
+    def getClasses(self) -> np.ndarray:
+        return self._classes
+
+    # -------------------------------------------------------------------------
+    # getInfo
+    #
+    # Returns the items saved with the forest, like the source model's hash.
+    # -------------------------------------------------------------------------
+    def getInfo(self) -> dict:
+        return dict(self._info)
+
+    # -------------------------------------------------------------------------
+    # getNumNodes
+    # -------------------------------------------------------------------------
+    def getNumNodes(self) -> int:
+        return self._feature.shape[0]
+
+    # -------------------------------------------------------------------------
+    # getNumTrees
+    # -------------------------------------------------------------------------
+    def getNumTrees(self) -> int:
+        return self._roots.shape[0]
+
+    # -------------------------------------------------------------------------
+    # isJitAvailable
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def isJitAvailable() -> bool:
+        return NUMBA_AVAILABLE
+
+    # -------------------------------------------------------------------------
+    # _load
+    # -------------------------------------------------------------------------
+    def _load(self, directory: Path) -> None:
+
+        descriptionFile = directory / CompiledForest.DESCRIPTION_FILE
+
+        if not descriptionFile.exists():
+
+            raise RuntimeError('No compiled forest in ' + str(directory) +
+                               '.  It has no ' +
+                               CompiledForest.DESCRIPTION_FILE)
+
+        with open(descriptionFile) as f:
+            description = json.load(f)
+
+        for name in CompiledForest.ARRAYS:
+
+            setattr(self,
+                    '_' + name,
+                    np.load(directory / (name + '.npy'), mmap_mode='r'))
+
+        self._classes = np.asarray(description['classes'])
+        self._numFeatures = description['numFeatures']
+        self._info = description['info']
+        self._directory = directory
+
+    # -------------------------------------------------------------------------
+    # predict
+    #
+    # Returns the class of each row of a (pixels, features) integer matrix.
+    # -------------------------------------------------------------------------
+    def predict(self, features: np.ndarray) -> np.ndarray:
+
+        proba = self.predictProba(features)
+
+        return self._classes.take(np.argmax(proba, axis=1), axis=0)
+
+    # -------------------------------------------------------------------------
+    # predictProba
+    #
+    # Returns the mean class probabilities of each row of a (pixels,
+    # features) integer matrix.
+    # -------------------------------------------------------------------------
+    def predictProba(self, features: np.ndarray) -> np.ndarray:
+
+        if not np.issubdtype(features.dtype, np.integer) or \
+           features.dtype.itemsize > 4:
+
+            raise RuntimeError('Features must be integers of up to 32 ' +
+                               'bits.  They are ' + str(features.dtype))
+
+        if features.ndim != 2 or \
+           (self._numFeatures and features.shape[1] != self._numFeatures):
+
+            raise RuntimeError('Expected a (pixels, ' +
+                               str(self._numFeatures) + ') matrix of ' +
+                               'features, but got ' + str(features.shape))
+
+        proba = np.zeros((features.shape[0], self._value.shape[1]),
+                         dtype=np.float64)
+
+        if NUMBA_AVAILABLE:
+
+            _sumLeafValues(features,
+                           self._feature,
+                           self._threshold,
+                           self._left,
+                           self._right,
+                           self._value,
+                           self._roots,
+                           proba)
+
+        else:
+
+            rows = np.arange(features.shape[0])
+
+            for root, depth in zip(self._roots, self._depths):
+
+                node = np.full(features.shape[0], root, dtype=np.int32)
+
+                for level in range(depth):
+
+                    goLeft = features[rows, self._feature[node]] <= \
+                        self._threshold[node]
+
+                    node = np.where(goLeft,
+                                    self._left[node],
+                                    self._right[node])
+
+                proba += self._value[node]
+
+        proba /= self.getNumTrees()
+
+        return proba
+
+    # -------------------------------------------------------------------------
+    # save
+    #
+    # Writes the arrays to .npy files in the directory, with a JSON
+    # description of the forest and the info items.  Each file is written
+    # under a temporary name and renamed, and the description, which marks a
+    # complete forest, is written last.
+    # -------------------------------------------------------------------------
+    def save(self, directory: Path, info: dict = None) -> None:
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        suffix = '.tmp' + str(os.getpid())
+
+        for name in CompiledForest.ARRAYS:
+
+            arrayTmp = directory / (name + '.npy' + suffix)
+
+            with open(arrayTmp, 'wb') as f:
+                np.save(f, np.ascontiguousarray(getattr(self, '_' + name)))
+
+            os.replace(arrayTmp, directory / (name + '.npy'))
+
+        description = {'classes': self._classes.tolist(),
+                       'numFeatures': self._numFeatures,
+                       'info': info or {}}
+
+        descriptionTmp = directory / (CompiledForest.DESCRIPTION_FILE + suffix)
+
+        with open(descriptionTmp, 'w') as f:
+            json.dump(description, f)
+
+        os.replace(descriptionTmp, directory / CompiledForest.DESCRIPTION_FILE)
+        self._info = dict(info or {})
@@ -0,0 +1,256 @@
+import threading
+
+import numpy as np
+
+try:
+    import numba
+    from numba import njit
+    from numba import prange
+    NUMBA_AVAILABLE = True
+
+except ImportError:
+    prange = range
+    NUMBA_AVAILABLE = False
+
+
+# -----------------------------------------------------------------------------
+# _wrap16
+#
+# Wrap an integer around to int16, as int16 arithmetic does.
+# -----------------------------------------------------------------------------
+def _wrap16(value):
+    return ((value + 32768) & 65535) - 32768
+
+
+# -----------------------------------------------------------------------------
+# _compare
+#
+# The operators in RuleTable.OPERATORS order.
+# -----------------------------------------------------------------------------
+def _compare(value, operator, threshold):
+
+    if operator == 0:
+        return value < threshold
+
+    if operator == 1:
+        return value <= threshold
+
+    if operator == 2:
+        return value > threshold
+
+    if operator == 3:
+        return value >= threshold
+
+    if operator == 4:
+        return value == threshold
+
+    return value != threshold
+
+
+# -----------------------------------------------------------------------------
+# _simpleDay
+#
+# One pass over the pixels of a day.  For each pixel, apply the general mask,
+# compute NDVI, apply the rule table, apply the land mask and write the final
+# value.  Every step reproduces the NumPy path exactly:
+#
+# - MaskGenerator's state lookup tables and SR1, SR2 and SOLZ rules
+# - NormalizedDifference's NDVI, including the float64 expression for exact
+#   quotients
+# - RuleTable's first-match rules, from RuleTable.encode(), with inputs in
+#   FusedDailyKernel.SIMPLE_INPUTS order
+# - Classifier's final masking
+# -----------------------------------------------------------------------------
+def _simpleDay(sr1, sr2, sr3, sr5, sr7, solz, state,
+               generalLut, landLut,
+               inputs, operators, thresholds, values, terms,
+               default, land, badData, landBadData, out):
+
+    numPredicates = inputs.shape[0]
+    numRules = values.shape[0]
+    numTerms = terms.shape[1]
+
+    for i in prange(out.shape[0]):
+
+        s = state[i]
+
+        if generalLut[s] == 0 or sr1[i] < -100 or sr2[i] < -100 or \
+           solz[i] > 6500:
+
+            out[i] = badData
+            continue
+
+        red = np.int64(sr1[i])
+        nir = np.int64(sr2[i])
+        numerator = _wrap16(nir - red)
+        denominator = _wrap16(nir + red)
+        ndvi = np.int64(0)
+
+        if denominator != 0:
+
+            scaled = abs(numerator * 10000)
+            quotient = scaled // abs(denominator)
+
+            if (numerator < 0) != (denominator < 0):
+                quotient = -quotient
+
+            if numerator != 0 and scaled % abs(denominator) == 0:
+
+                quotient = np.int64((np.float64(numerator) /
+                                     np.float64(denominator)) * 10000.0)
+
+            ndvi = _wrap16(quotient)
+
+        # ---
+        # Evaluate each predicate once, into a bit field.  The inputs are
+        # nir, blue, swir5, swir7, ndvi and redPlusNir.
+        # ---
+        bits = np.int64(0)
+
+        for p in range(numPredicates):
+
+            k = inputs[p]
+
+            if k == 0:
+                value = nir
+            elif k == 1:
+                value = np.int64(sr3[i])
+            elif k == 2:
+                value = np.int64(sr5[i])
+            elif k == 3:
+                value = np.int64(sr7[i])
+            elif k == 4:
+                value = ndvi
+            else:
+                value = denominator
+
+            if _compare(np.float64(value), operators[p], thresholds[p]):
+                bits |= np.int64(1) << p
+
+        prediction = default
+
+        for r in range(numRules):
+
+            matched = True
+
+            for t in range(numTerms):
+
+                term = terms[r, t]
+
+                if term == 0:
+                    break
+
+                isSet = (bits >> (abs(term) - 1)) & 1 == 1
+
+                if isSet != (term > 0):
+
+                    matched = False
+                    break
+
+            if matched:
+
+                prediction = values[r]
+                break
+
+        if prediction == land and landLut[s] == 0:
+            out[i] = landBadData
+
+        else:
+            out[i] = prediction
+
+
+if NUMBA_AVAILABLE:
+
+    _wrap16 = njit(cache=True)(_wrap16)
+    _compare = njit(cache=True)(_compare)
+    _simpleDay = njit(parallel=True, cache=True)(_simpleDay)
+
+
+# -----------------------------------------------------------------------------
+# class FusedDailyKernel
+#
+# An optional Numba-compiled replacement for the mask, classify and final
+# mask passes of a SimpleClassifier day.  It runs one parallel loop over the
+# pixels instead of a series of full-array NumPy operations, and its output
+# is identical.  Without Numba, isAvailable() is false and callers use the
+# NumPy path.
+# -----------------------------------------------------------------------------
+class FusedDailyKernel(object):
+
+    SIMPLE_INPUTS = ['nir', 'blue', 'swir5', 'swir7', 'ndvi', 'redPlusNir']
+
+    THREADSAFE_LAYERS = ['tbb', 'omp']
+
+    _lock = threading.Lock()
+    _threadSafe: bool = False
+
+    # -------------------------------------------------------------------------
+    # isAvailable
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def isAvailable() -> bool:
+        return NUMBA_AVAILABLE
+
+    # -------------------------------------------------------------------------
+    # runSimple
+    #
+    # Bands must be int16.  Returns the final image, of out's type.
+    #
+    # Numba's workqueue threading layer aborts the process when parallel
+    # functions are called from several threads at once, as classifier
+    # worker threads do.  The TBB and OpenMP layers allow it.  Until a call
+    # shows which layer Numba loaded, and always under workqueue, calls take
+    # turns.  Each call still runs on every core.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def runSimple(sr1: np.ndarray,
+                  sr2: np.ndarray,
+                  sr3: np.ndarray,
+                  sr5: np.ndarray,
+                  sr7: np.ndarray,
+                  solz: np.ndarray,
+                  state: np.ndarray,
+                  generalLut: np.ndarray,
+                  landLut: np.ndarray,
+                  encodedRules: tuple,
+                  default: int,
+                  land: int,
+                  badData: int,
+                  landBadData: int,
+                  out: np.ndarray) -> np.ndarray:
+
+        inputs, operators, thresholds, values, terms = encodedRules
+
+        args = (sr1.reshape(-1),
+                sr2.reshape(-1),
+                sr3.reshape(-1),
+                sr5.reshape(-1),
+                sr7.reshape(-1),
+                solz.reshape(-1),
+                state.astype(np.uint16, copy=False).reshape(-1),
+                generalLut,
+                landLut,
+                inputs,
+                operators,
+                thresholds,
+                values,
+                terms,
+                default,
+                land,
+                badData,
+                landBadData,
+                out.reshape(-1))
+
+        if FusedDailyKernel._threadSafe:
+
+            _simpleDay(*args)
+            return out
+
+        with FusedDailyKernel._lock:
+
+            _simpleDay(*args)
+
+            FusedDailyKernel._threadSafe = numba.threading_layer() in \
+                FusedDailyKernel.THREADSAFE_LAYERS
+
+        return out
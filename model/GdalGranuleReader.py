@@ -0,0 +1,164 @@
+from pathlib import Path
+import threading
+
+import numpy as np
+
+from osgeo import gdal
+from osgeo import gdal_array
+
+from modis_water.model.GranuleReader import GranuleReader
+
+
+# -----------------------------------------------------------------------------
+# class GdalGranuleReader
+#
+# The granule's handle is its open container.  Each band's sub-dataset, like
+# HDF4_EOS:EOS_GRID:"<path>":MODIS_Grid_2D:sur_refl_b01_1, is opened by that
+# name on first use, and its handle is kept with the granule.  Later reads of
+# the band, like the second phase of a two-phase read, the masks, the
+# classifier and debugging, skip GDAL's open and HDF-EOS metadata parsing
+# until the granule is evicted.
+#
+# A GDAL dataset handle must not be read by two threads at once, so each
+# sub-dataset has its own lock.  Different bands of a granule are read
+# concurrently.
+# -----------------------------------------------------------------------------
+class GdalGranuleReader(GranuleReader):
+
+    # -------------------------------------------------------------------------
+    # class _Granule
+    # -------------------------------------------------------------------------
+    class _Granule(object):
+
+        def __init__(self, container):
+
+            self.container = container
+            self.datasets: dict = {}
+            self.lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # _close
+    #
+    # GDAL closes a dataset when its last reference is released.
+    # -------------------------------------------------------------------------
+    def _close(self, handle: _Granule) -> None:
+
+        with handle.lock:
+
+            handle.datasets.clear()
+            handle.container = None
+
+    # -------------------------------------------------------------------------
+    # _getDataset
+    #
+    # Returns (sub-dataset, its lock), opening it on first use.  Hold its lock
+    # while reading it.
+    # -------------------------------------------------------------------------
+    def _getDataset(self,
+                    granule: _Granule,
+                    path: Path,
+                    subDsPrefix: str,
+                    bandName: str) -> tuple:
+
+        with granule.lock:
+
+            entry = granule.datasets.get(bandName)
+
+            if not entry:
+
+                subDataSet = subDsPrefix + ':"' + str(path) + '":' + bandName
+                ds = gdal.Open(subDataSet)
+
+                if not ds:
+                    raise RuntimeError('Unable to open dataset, ' + subDataSet)
+
+                entry = (ds, threading.Lock())
+                granule.datasets[bandName] = entry
+
+        return entry
+
+    # -------------------------------------------------------------------------
+    # _open
+    # -------------------------------------------------------------------------
+    def _open(self, path: str) -> _Granule:
+
+        container = gdal.Open(path)
+
+        if not container:
+            raise RuntimeError('Unable to open granule, ' + path)
+
+        return GdalGranuleReader._Granule(container)
+
+    # -------------------------------------------------------------------------
+    # readBand
+    #
+    # A window is read with ReadAsArray(xoff, yoff, xsize, ysize) from the
+    # stored pixels covering it, which are upsampled in memory.
+    # -------------------------------------------------------------------------
+    def readBand(self,
+                 path: Path,
+                 subDsPrefix: str,
+                 bandName: str,
+                 cols: int = None,
+                 rows: int = None,
+                 out: np.ndarray = None,
+                 window: tuple = None) -> tuple:
+
+        with self._granule(path) as granule:
+
+            ds, dsLock = \
+                self._getDataset(granule, path, subDsPrefix, bandName)
+
+            with dsLock:
+
+                storedShape = (ds.RasterYSize, ds.RasterXSize)
+                shape = (rows, cols) if cols and rows else storedShape
+
+                dtype = gdal_array.GDALTypeCodeToNumericTypeCode(
+                    ds.GetRasterBand(1).DataType)
+
+                # ---
+                # GDAL converts to the type of buf_obj, so only a buffer of
+                # the band's own type is used.
+                # ---
+                def readStored(rowStart, rowEnd, colStart, colEnd, buf):
+
+                    storedWindow = (rowEnd - rowStart, colEnd - colStart)
+
+                    if not GranuleReader.fits(buf, storedWindow, dtype):
+                        buf = None
+
+                    return ds.ReadAsArray(colStart,
+                                          rowStart,
+                                          colEnd - colStart,
+                                          rowEnd - rowStart,
+                                          buf)
+
+                if window:
+
+                    array = GranuleReader.upsampleWindow(readStored,
+                                                         storedShape,
+                                                         window,
+                                                         shape[1],
+                                                         shape[0],
+                                                         out)
+
+                else:
+
+                    if not GranuleReader.fits(out, shape, dtype):
+                        out = None
+
+                    if cols and rows:
+
+                        array = ds.ReadAsArray(0, 0, None, None, out,
+                                               cols, rows)
+
+                    else:
+                        array = ds.ReadAsArray(0, 0, None, None, out)
+
+                xform = GranuleReader.scaleXform(ds.GetGeoTransform(),
+                                                 storedShape,
+                                                 shape[1],
+                                                 shape[0])
+
+                return array, xform, ds.GetProjection()
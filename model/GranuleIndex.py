@@ -0,0 +1,236 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import threading
+
+
+# -----------------------------------------------------------------------------
+# class GranuleIndex
+#
+# Maps (sensor, product, year, day, tile) to granule paths.  Each directory is
+# listed with a single os.scandir pass the first time it is searched, so
+# finding a day's granules is a dictionary lookup rather than a glob over the
+# directory.
+#
+# MODIS directories hold one year, base-directory/MOD09GA/2003.  VIIRS
+# directories hold every year, base-directory/VNP09GA.  Either works, because
+# the year is taken from the granule name.
+#
+# If sidecarDir is given, each directory's listing is saved there as JSON and
+# reused by later runs until the directory's modification time changes.
+# -----------------------------------------------------------------------------
+class GranuleIndex(object):
+
+    # MOD09GA.A2003161.h09v05.061.2020094170809.hdf
+    # VNP09GA.A2020161.h09v05.001.2020163082838.h5
+    NAME_REX = re.compile(r'^(?P<sensor>[A-Z0-9]+?)(?P<product>09G[AQ])' +
+                          r'\.A(?P<year>[0-9]{4})(?P<day>[0-9]{3})' +
+                          r'\.(?P<tile>h[0-9]{2}v[0-9]{2})\..*$')
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 suffix: str,
+                 sidecarDir: Path = None,
+                 logger: logging.RootLogger = None):
+
+        if sidecarDir and not sidecarDir.is_dir():
+
+            raise RuntimeError('Index dir., ' +
+                               str(sidecarDir) +
+                               ', does not exist.')
+
+        self._suffix: str = suffix
+        self._sidecarDir: Path = sidecarDir
+        self._logger: logging.RootLogger = logger
+        self._index: dict = {}
+        self._indexedDirs: set = set()
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # __getstate__
+    #
+    # A copy keeps the directories indexed so far, with a lock of its own.
+    # -------------------------------------------------------------------------
+    def __getstate__(self) -> dict:
+
+        with self._lock:
+
+            state = self.__dict__.copy()
+            state['_index'] = dict(self._index)
+            state['_indexedDirs'] = set(self._indexedDirs)
+
+        del state['_lock']
+
+        return state
+
+    # -------------------------------------------------------------------------
+    # __setstate__
+    # -------------------------------------------------------------------------
+    def __setstate__(self, state: dict) -> None:
+
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # find
+    #
+    # Without a day, every day of the year is returned.
+    # -------------------------------------------------------------------------
+    def find(self,
+             directory: Path,
+             sensor: str,
+             product: str,
+             year: int,
+             day: int,
+             tile: str) -> list:
+
+        self._indexDirectory(directory)
+
+        with self._lock:
+
+            if day:
+
+                return list(self._index.get(
+                    (sensor, product, year, day, tile), []))
+
+            granules = []
+
+            for key in sorted(self._index.keys()):
+
+                if key[:3] == (sensor, product, year) and key[4] == tile:
+                    granules.extend(self._index[key])
+
+            return granules
+
+    # -------------------------------------------------------------------------
+    # getProductionTime
+    #
+    # The production time-stamp, YYYYDDDHHMMSS, is the fifth field of the
+    # granule name.  Reprocessed granules differ only in this field.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def getProductionTime(granule: Path) -> str:
+
+        fields = Path(granule).name.split('.')
+
+        return fields[4] if len(fields) > 5 else ''
+
+    # -------------------------------------------------------------------------
+    # _getSidecarPath
+    # -------------------------------------------------------------------------
+    def _getSidecarPath(self, directory: Path) -> Path:
+
+        digest = hashlib.md5(str(directory.resolve()).encode()).hexdigest()
+
+        name = directory.parent.name + '-' + directory.name + '-' + \
+            digest[:8] + '.json'
+
+        return self._sidecarDir / name
+
+    # -------------------------------------------------------------------------
+    # _indexDirectory
+    # -------------------------------------------------------------------------
+    def _indexDirectory(self, directory: Path) -> None:
+
+        with self._lock:
+
+            if directory in self._indexedDirs:
+                return
+
+            self._indexedDirs.add(directory)
+
+            if not directory.is_dir():
+
+                if self._logger:
+                    self._logger.warning('Granule dir., ' + str(directory) +
+                                         ', does not exist.')
+
+                return
+
+            names = self._readSidecar(directory)
+
+            if names is None:
+
+                with os.scandir(directory) as entries:
+
+                    names = sorted(entry.name for entry in entries
+                                   if entry.name.endswith(self._suffix))
+
+                self._writeSidecar(directory, names)
+
+            for name in names:
+
+                match = GranuleIndex.NAME_REX.match(name)
+
+                if not match:
+                    continue
+
+                key = (match.group('sensor'),
+                       match.group('product'),
+                       int(match.group('year')),
+                       int(match.group('day')),
+                       match.group('tile'))
+
+                self._index.setdefault(key, []).append(directory / name)
+
+            if self._logger:
+
+                self._logger.info('Indexed ' + str(len(names)) +
+                                  ' granules in ' + str(directory))
+
+    # -------------------------------------------------------------------------
+    # _readSidecar
+    #
+    # Returns None if there is no current sidecar for the directory.
+    # -------------------------------------------------------------------------
+    def _readSidecar(self, directory: Path) -> list:
+
+        if not self._sidecarDir:
+            return None
+
+        sidecarPath = self._getSidecarPath(directory)
+
+        if not sidecarPath.exists():
+            return None
+
+        with open(sidecarPath) as f:
+            sidecar = json.load(f)
+
+        if sidecar.get('mtime') != directory.stat().st_mtime_ns or \
+           sidecar.get('suffix') != self._suffix:
+
+            return None
+
+        return sidecar['names']
+
+    # -------------------------------------------------------------------------
+    # setLogger
+    # -------------------------------------------------------------------------
+    def setLogger(self, logger: logging.RootLogger) -> None:
+        self._logger = logger
+
+    # -------------------------------------------------------------------------
+    # _writeSidecar
+    # -------------------------------------------------------------------------
+    def _writeSidecar(self, directory: Path, names: list) -> None:
+
+        if not self._sidecarDir:
+            return
+
+        sidecarPath = self._getSidecarPath(directory)
+        tmpPath = sidecarPath.with_suffix('.tmp' + str(os.getpid()))
+
+        sidecar = {'directory': str(directory),
+                   'mtime': directory.stat().st_mtime_ns,
+                   'suffix': self._suffix,
+                   'names': names}
+
+        with open(tmpPath, 'w') as f:
+            json.dump(sidecar, f)
+
+        os.replace(tmpPath, sidecarPath)
@@ -0,0 +1,448 @@
+from abc import ABC
+from abc import abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+import re
+import threading
+
+import numpy as np
+
+
+# -----------------------------------------------------------------------------
+# class GranuleReader
+#
+# A granule is one HDF container, like MOD09GA.A2003161.h09v05.061.*.hdf.
+# GranuleReader opens each container once, keeps it in a least-recently-used
+# cache of open handles and serves every band read from that handle.  The
+# cache holds at most maxOpen granules, which bounds the number of open file
+# descriptors.  Granules in use by a read are never closed; if all of them are
+# in use, the cache briefly exceeds maxOpen.
+#
+# Granules are opened and closed outside the cache's lock, so threads reading
+# other granules do not wait for them.  Threads that need a granule being
+# opened wait for that open, so it is opened once.
+#
+# Subclasses implement opening, closing and reading for one library.
+# -----------------------------------------------------------------------------
+class GranuleReader(ABC):
+
+    DEFAULT_MAX_OPEN = 8
+
+    # ---
+    # MODIS and VIIRS grids use this sinusoidal projection.  Readers that do
+    # not go through GDAL report it for every band.
+    # ---
+    SINUSOIDAL_WKT = 'PROJCS["Sinusoidal",GEOGCS["GCS_Undefined",DATUM["Undefined",SPHEROID["User_Defined_Spheroid",6371007.181,0.0]],PRIMEM["Greenwich",0.0],UNIT["Degree",0.0174532925199433]],PROJECTION["Sinusoidal"],PARAMETER["False_Easting",0.0],PARAMETER["False_Northing",0.0],PARAMETER["Central_Meridian",0.0],UNIT["Meter",1.0]]'  # noqa: E501
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, maxOpen: int = DEFAULT_MAX_OPEN):
+
+        if maxOpen < 1:
+
+            raise RuntimeError('The number of open granules must be at ' +
+                               'least one.  It was specified as ' +
+                               str(maxOpen))
+
+        self._maxOpen: int = maxOpen
+        self._handles: OrderedDict = OrderedDict()
+        self._inUse: dict = {}
+        self._opening: dict = {}
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # __getstate__
+    #
+    # Open handles and the lock stay with this process.  A copy, like one
+    # sent to a worker process, opens its own granules.
+    # -------------------------------------------------------------------------
+    def __getstate__(self) -> dict:
+
+        state = self.__dict__.copy()
+        del state['_handles']
+        del state['_inUse']
+        del state['_opening']
+        del state['_lock']
+
+        return state
+
+    # -------------------------------------------------------------------------
+    # __setstate__
+    # -------------------------------------------------------------------------
+    def __setstate__(self, state: dict) -> None:
+
+        self.__dict__.update(state)
+        self._handles = OrderedDict()
+        self._inUse = {}
+        self._opening = {}
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # close
+    # -------------------------------------------------------------------------
+    def close(self) -> None:
+
+        with self._lock:
+
+            while self._handles:
+
+                path, handle = self._handles.popitem(last=False)
+                self._close(handle)
+
+            self._inUse.clear()
+
+    # -------------------------------------------------------------------------
+    # _close
+    # -------------------------------------------------------------------------
+    @abstractmethod
+    def _close(self, handle) -> None:
+        pass
+
+    # -------------------------------------------------------------------------
+    # _evict
+    #
+    # Removes the least recently used granules not in use from the cache, and
+    # returns their handles for the caller to close after releasing the lock.
+    # Call this while holding the lock.
+    # -------------------------------------------------------------------------
+    def _evict(self) -> list:
+
+        evicted = []
+
+        for path in list(self._handles.keys()):
+
+            if len(self._handles) <= self._maxOpen:
+                break
+
+            if not self._inUse.get(path):
+                evicted.append(self._handles.pop(path))
+
+        return evicted
+
+    # -------------------------------------------------------------------------
+    # _granule
+    #
+    # Use this as a context manager around every access to a handle, so the
+    # handle cannot be evicted while it is being read.
+    # -------------------------------------------------------------------------
+    @contextmanager
+    def _granule(self, path: Path):
+
+        key = str(path)
+        handle = None
+
+        while handle is None:
+
+            with self._lock:
+
+                if key in self._handles:
+
+                    self._handles.move_to_end(key)
+                    handle = self._handles[key]
+                    self._inUse[key] = self._inUse.get(key, 0) + 1
+                    evicted = self._evict()
+                    break
+
+                opening = self._opening.get(key)
+
+                if not opening:
+
+                    opening = threading.Event()
+                    self._opening[key] = opening
+                    isOpener = True
+
+                else:
+                    isOpener = False
+
+            # ---
+            # Another thread is opening the granule.  Wait for it, then look
+            # again.  If its open failed, this thread tries in turn.
+            # ---
+            if not isOpener:
+
+                opening.wait()
+                continue
+
+            try:
+                handle = self._open(key)
+
+            finally:
+
+                with self._lock:
+
+                    del self._opening[key]
+
+                    if handle is not None:
+
+                        self._handles[key] = handle
+                        self._inUse[key] = 1
+                        evicted = self._evict()
+
+                opening.set()
+
+        for evictedHandle in evicted:
+            self._close(evictedHandle)
+
+        try:
+            yield handle
+
+        finally:
+
+            with self._lock:
+
+                self._inUse[key] -= 1
+
+                if not self._inUse[key]:
+                    del self._inUse[key]
+
+                evicted = self._evict()
+
+            for evictedHandle in evicted:
+                self._close(evictedHandle)
+
+    # -------------------------------------------------------------------------
+    # _parseGridMetadata
+    #
+    # HDF-EOS files describe their grids in the StructMetadata.0 attribute:
+    #
+    # GROUP=GRID_1
+    #     GridName="MODIS_Grid_1km_2D"
+    #     XDim=1200
+    #     YDim=1200
+    #     UpperLeftPointMtrs=(-8895604.157333,4447802.078667)
+    #     LowerRightMtrs=(-7783653.637667,3335851.559000)
+    #     ...
+    # END_GROUP=GRID_1
+    #
+    # Return {grid name: GDAL-style geotransform}.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _parseGridMetadata(structMetadata: str) -> dict:
+
+        grids = {}
+        number = r'([-+0-9.eE]+)'
+
+        for block in re.findall(r'GROUP=GRID_[0-9]+(.*?)END_GROUP=GRID_[0-9]+',
+                                structMetadata,
+                                re.S):
+
+            name = re.search(r'GridName="([^"]+)"', block)
+            xDim = re.search(r'\bXDim=([0-9]+)', block)
+            yDim = re.search(r'\bYDim=([0-9]+)', block)
+
+            upperLeft = re.search(r'UpperLeftPointMtrs=\(' + number + ',' +
+                                  number + r'\)', block)
+
+            lowerRight = re.search(r'LowerRightMtrs=\(' + number + ',' +
+                                   number + r'\)', block)
+
+            if not (name and xDim and yDim and upperLeft and lowerRight):
+                continue
+
+            ulx, uly = float(upperLeft.group(1)), float(upperLeft.group(2))
+            lrx, lry = float(lowerRight.group(1)), float(lowerRight.group(2))
+
+            grids[name.group(1)] = (ulx,
+                                    (lrx - ulx) / int(xDim.group(1)),
+                                    0.0,
+                                    uly,
+                                    0.0,
+                                    (lry - uly) / int(yDim.group(1)))
+
+        return grids
+
+    # -------------------------------------------------------------------------
+    # fits
+    #
+    # Whether out can receive a result of the given shape and type.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def fits(out: np.ndarray, shape: tuple, dtype) -> bool:
+
+        return out is not None and \
+            out.shape == tuple(shape) and \
+            out.dtype == np.dtype(dtype) and \
+            out.flags.c_contiguous and \
+            out.flags.writeable
+
+    # -------------------------------------------------------------------------
+    # _open
+    # -------------------------------------------------------------------------
+    @abstractmethod
+    def _open(self, path: str):
+        pass
+
+    # -------------------------------------------------------------------------
+    # scaleXform
+    #
+    # Returns the geotransform of a grid of storedShape, read at rows x cols.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def scaleXform(xform: tuple,
+                   storedShape: tuple,
+                   cols: int,
+                   rows: int) -> tuple:
+
+        if not xform:
+            return xform
+
+        storedRows, storedCols = storedShape
+
+        return (xform[0],
+                xform[1] * storedCols / cols,
+                xform[2],
+                xform[3],
+                xform[4],
+                xform[5] * storedRows / rows)
+
+    # -------------------------------------------------------------------------
+    # upsample
+    #
+    # Nearest-neighbour upsampling by an integer factor.  For integer factors
+    # this matches GDAL's nearest-neighbour resampling.  The broadcast is a
+    # zero-copy view; the reshape materialises it in a single pass, or it is
+    # copied into out, if out fits.
+    #
+    # With a window, (rowStart, rowEnd, colStart, colEnd) of the upsampled
+    # array, only the window is made.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def upsample(array: np.ndarray,
+                 cols: int,
+                 rows: int,
+                 out: np.ndarray = None,
+                 window: tuple = None) -> np.ndarray:
+
+        if window:
+
+            return GranuleReader.upsampleWindow(
+                lambda rowStart, rowEnd, colStart, colEnd, buf:
+                    array[rowStart:rowEnd, colStart:colEnd],
+                array.shape,
+                window,
+                cols,
+                rows,
+                out)
+
+        inRows, inCols = array.shape
+
+        if inRows == rows and inCols == cols:
+            return array
+
+        if rows % inRows or cols % inCols:
+
+            raise RuntimeError('Unable to upsample ' + str(array.shape) +
+                               ' to ' + str((rows, cols)) +
+                               ' by an integer factor.')
+
+        rowFactor = rows // inRows
+        colFactor = cols // inCols
+
+        view = np.broadcast_to(array[:, np.newaxis, :, np.newaxis],
+                               (inRows, rowFactor, inCols, colFactor))
+
+        if GranuleReader.fits(out, (rows, cols), array.dtype):
+
+            np.copyto(out.reshape(inRows, rowFactor, inCols, colFactor), view)
+
+            return out
+
+        return view.reshape(rows, cols)
+
+    # -------------------------------------------------------------------------
+    # upsampleWindow
+    #
+    # Returns a window, (rowStart, rowEnd, colStart, colEnd), of a band of
+    # storedShape upsampled to rows x cols by an integer factor, reading only
+    # the stored pixels that cover the window.  readStored(rowStart, rowEnd,
+    # colStart, colEnd, out) returns those stored pixels, read into out if
+    # out fits them.  The window is returned in out, if out fits it.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def upsampleWindow(readStored,
+                       storedShape: tuple,
+                       window: tuple,
+                       cols: int,
+                       rows: int,
+                       out: np.ndarray = None) -> np.ndarray:
+
+        storedRows, storedCols = storedShape
+        rowStart, rowEnd, colStart, colEnd = window
+
+        if rows % storedRows or cols % storedCols:
+
+            raise RuntimeError('Unable to upsample ' + str(storedShape) +
+                               ' to ' + str((rows, cols)) +
+                               ' by an integer factor.')
+
+        if not (0 <= rowStart <= rowEnd <= rows and
+                0 <= colStart <= colEnd <= cols):
+
+            raise RuntimeError('Invalid window, rows ' +
+                               str((rowStart, rowEnd)) + ' and cols ' +
+                               str((colStart, colEnd)) + ', for ' +
+                               str((rows, cols)))
+
+        rowFactor = rows // storedRows
+        colFactor = cols // storedCols
+        shape = (rowEnd - rowStart, colEnd - colStart)
+
+        if rowFactor == 1 and colFactor == 1:
+
+            array = readStored(rowStart, rowEnd, colStart, colEnd, out)
+
+            if array is not out and \
+               GranuleReader.fits(out, shape, array.dtype):
+
+                np.copyto(out, array)
+                array = out
+
+            return array
+
+        # ---
+        # Read the stored pixels covering the window, then take each row and
+        # column of the window from the stored pixel it falls in.
+        # ---
+        storedRowStart = rowStart // rowFactor
+        storedColStart = colStart // colFactor
+
+        block = readStored(storedRowStart,
+                           -(-rowEnd // rowFactor),
+                           storedColStart,
+                           -(-colEnd // colFactor),
+                           None)
+
+        rowIndex = np.arange(rowStart, rowEnd) // rowFactor - storedRowStart
+        colIndex = np.arange(colStart, colEnd) // colFactor - storedColStart
+        blockRows = np.take(block, rowIndex, axis=0)
+
+        if not GranuleReader.fits(out, shape, block.dtype):
+            out = None
+
+        return np.take(blockRows, colIndex, axis=1, out=out)
+
+    # -------------------------------------------------------------------------
+    # readBand
+    #
+    # Returns (array, geotransform, projection).  When cols and rows are not
+    # given, the band is read at its stored size.  When out fits the band, the
+    # band is read into it, and it is the array returned.  The geotransform
+    # is that of the band at the size read.
+    #
+    # With a window, (rowStart, rowEnd, colStart, colEnd) of the band at the
+    # size read, only the window is returned, and only the stored pixels
+    # covering it are decoded.  The geotransform is still the whole band's.
+    # The window must not be empty.
+    # -------------------------------------------------------------------------
+    @abstractmethod
+    def readBand(self,
+                 path: Path,
+                 subDsPrefix: str,
+                 bandName: str,
+                 cols: int = None,
+                 rows: int = None,
+                 out: np.ndarray = None,
+                 window: tuple = None) -> tuple:
+        pass
@@ -0,0 +1,258 @@
+from pathlib import Path
+import threading
+
+import h5py
+import numpy as np
+
+from modis_water.model.GranuleReader import GranuleReader
+
+
+# -----------------------------------------------------------------------------
+# class H5pyGranuleReader
+#
+# Reads VIIRS HDF5 granules directly with h5py, bypassing GDAL's HDF5 driver.
+# Each granule is opened once.  Its datasets are read as stored, in their
+# native data type, and a band read at a larger size is upsampled by nearest
+# neighbour, which is what GDAL does for integer factors.  The geotransform
+# of a band comes from its grid in StructMetadata.0, and the projection is
+# the sinusoidal.
+#
+# Band names use the VIIRS reader's GDAL form,
+# //HDFEOS/GRIDS/<grid>/Data_Fields/<field>.  GDAL replaces the spaces in
+# HDF5 group names with underscores, so the group "Data Fields" is found as
+# Data_Fields.
+#
+# VIIRS datasets are chunked and compressed.  readWindow() slices a window,
+# so h5py decompresses only the chunks the window touches, and later code
+# can read only the rows it needs.
+# -----------------------------------------------------------------------------
+class H5pyGranuleReader(GranuleReader):
+
+    STRUCT_METADATA = 'HDFEOS INFORMATION/StructMetadata.0'
+
+    # -------------------------------------------------------------------------
+    # class _Granule
+    # -------------------------------------------------------------------------
+    class _Granule(object):
+
+        def __init__(self, h5File: h5py.File, grids: dict):
+
+            self.h5File: h5py.File = h5File
+            self.grids: dict = grids
+            self.datasets: dict = {}
+            self.lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # _close
+    # -------------------------------------------------------------------------
+    def _close(self, handle: _Granule) -> None:
+        handle.h5File.close()
+
+    # -------------------------------------------------------------------------
+    # _getDataset
+    #
+    # Call this while holding the granule's lock.
+    # -------------------------------------------------------------------------
+    def _getDataset(self, granule: _Granule, bandName: str) -> h5py.Dataset:
+
+        if bandName in granule.datasets:
+            return granule.datasets[bandName]
+
+        node = granule.h5File
+
+        for component in bandName.strip('/').split('/'):
+
+            if component not in node:
+
+                matches = [key for key in node.keys()
+                           if key.replace(' ', '_') == component]
+
+                if not matches:
+
+                    raise RuntimeError('Unable to find ' + bandName +
+                                       ' in ' + granule.h5File.filename)
+
+                component = matches[0]
+
+            node = node[component]
+
+        if not isinstance(node, h5py.Dataset):
+
+            raise RuntimeError(bandName + ' in ' + granule.h5File.filename +
+                               ' is not a data set.')
+
+        granule.datasets[bandName] = node
+
+        return node
+
+    # -------------------------------------------------------------------------
+    # _getGrid
+    #
+    # //HDFEOS/GRIDS/VIIRS_Grid_1km_2D/Data_Fields/SensorZenith_1 is in
+    # VIIRS_Grid_1km_2D.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _getGrid(bandName: str) -> str:
+
+        components = bandName.strip('/').split('/')
+
+        if 'GRIDS' in components:
+
+            index = components.index('GRIDS') + 1
+
+            if index < len(components):
+                return components[index]
+
+        return None
+
+    # -------------------------------------------------------------------------
+    # _open
+    # -------------------------------------------------------------------------
+    def _open(self, path: str) -> _Granule:
+
+        try:
+            h5File = h5py.File(path, 'r')
+
+        except Exception:
+            raise RuntimeError('Unable to open granule, ' + path)
+
+        grids = {}
+
+        if H5pyGranuleReader.STRUCT_METADATA in h5File:
+
+            structMetadata = h5File[H5pyGranuleReader.STRUCT_METADATA][()]
+
+            if isinstance(structMetadata, np.ndarray):
+                structMetadata = structMetadata.tobytes()
+
+            if isinstance(structMetadata, bytes):
+
+                structMetadata = \
+                    structMetadata.rstrip(b'\x00').decode('ascii', 'replace')
+
+            grids = GranuleReader._parseGridMetadata(structMetadata)
+
+        return H5pyGranuleReader._Granule(h5File, grids)
+
+    # -------------------------------------------------------------------------
+    # readBand
+    #
+    # A window is sliced from the stored pixels covering it, which are
+    # upsampled in memory.
+    # -------------------------------------------------------------------------
+    def readBand(self,
+                 path: Path,
+                 subDsPrefix: str,
+                 bandName: str,
+                 cols: int = None,
+                 rows: int = None,
+                 out: np.ndarray = None,
+                 window: tuple = None) -> tuple:
+
+        with self._granule(path) as granule:
+
+            with granule.lock:
+
+                dataset = self._getDataset(granule, bandName)
+                storedShape = dataset.shape
+                shape = (rows, cols) if cols and rows else storedShape
+
+                if window:
+
+                    array = GranuleReader.upsampleWindow(
+                        lambda rowStart, rowEnd, colStart, colEnd, buf:
+                            H5pyGranuleReader._readStored(dataset,
+                                                          rowStart,
+                                                          rowEnd,
+                                                          colStart,
+                                                          colEnd,
+                                                          buf),
+                        storedShape,
+                        window,
+                        shape[1],
+                        shape[0],
+                        out)
+
+                elif not (cols and rows) and \
+                        GranuleReader.fits(out, storedShape, dataset.dtype):
+
+                    dataset.read_direct(out)
+                    array = out
+
+                else:
+                    array = dataset[()]
+
+            if cols and rows and not window:
+                array = GranuleReader.upsample(array, cols, rows, out)
+
+            xform = GranuleReader.scaleXform(
+                granule.grids.get(self._getGrid(bandName)),
+                storedShape,
+                shape[1],
+                shape[0])
+
+            return array, xform, GranuleReader.SINUSOIDAL_WKT
+
+    # -------------------------------------------------------------------------
+    # _readStored
+    #
+    # Reads rows [rowStart, rowEnd) and cols [colStart, colEnd) of a data set,
+    # into out if out fits them.  Call this while holding the granule's lock.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _readStored(dataset: h5py.Dataset,
+                    rowStart: int,
+                    rowEnd: int,
+                    colStart: int,
+                    colEnd: int,
+                    out: np.ndarray = None) -> np.ndarray:
+
+        window = np.s_[rowStart:rowEnd, colStart:colEnd]
+        shape = (rowEnd - rowStart, colEnd - colStart)
+
+        if GranuleReader.fits(out, shape, dataset.dtype):
+
+            dataset.read_direct(out, window)
+            return out
+
+        return dataset[window]
+
+    # -------------------------------------------------------------------------
+    # readWindow
+    #
+    # Reads rows [rowStart, rowEnd) and cols [colStart, colEnd) of a band at
+    # its stored size.  When out fits the window, the window is read into it,
+    # and it is the array returned.
+    # -------------------------------------------------------------------------
+    def readWindow(self,
+                   path: Path,
+                   bandName: str,
+                   rowStart: int,
+                   rowEnd: int,
+                   colStart: int = 0,
+                   colEnd: int = None,
+                   out: np.ndarray = None) -> np.ndarray:
+
+        with self._granule(path) as granule:
+
+            with granule.lock:
+
+                dataset = self._getDataset(granule, bandName)
+                numRows, numCols = dataset.shape
+                colEnd = numCols if colEnd is None else colEnd
+
+                if not (0 <= rowStart < rowEnd <= numRows and
+                        0 <= colStart < colEnd <= numCols):
+
+                    raise RuntimeError('Invalid window, rows ' +
+                                       str((rowStart, rowEnd)) + ' and cols ' +
+                                       str((colStart, colEnd)) + ', for ' +
+                                       bandName + ' of shape ' +
+                                       str(dataset.shape))
+
+                return H5pyGranuleReader._readStored(dataset,
+                                                     rowStart,
+                                                     rowEnd,
+                                                     colStart,
+                                                     colEnd,
+                                                     out)
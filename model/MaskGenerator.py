@@ -4,8 +4,30 @@ import numpy as np
 from modis_water.model.BandReader import BandReader as br
 
 
+# -----------------------------------------------------------------------------
+# _buildStateLut
+#
+# Map each 16-bit state value to bad if any of the bit patterns is fully set,
+# otherwise to good.
+# -----------------------------------------------------------------------------
+def _buildStateLut(patterns: list, bad: int, good: int) -> np.ndarray:
+
+    state = np.arange(65536, dtype=np.uint16)
+    isBad = np.zeros(state.shape, dtype=bool)
+
+    for pattern in patterns:
+        isBad |= state & pattern == pattern
+
+    return np.where(isBad, bad, good).astype(np.uint8)
+
+
 # -----------------------------------------------------------------------------
 # MaskGenerator
+#
+# The state bits are decoded through 65536-entry lookup tables, one for the
+# general mask and one for the land mask, indexed by the 16-bit state value.
+# A mask is one np.take pass over state instead of a comparison per bit.
+# Masks are uint8.
 # -----------------------------------------------------------------------------
 class MaskGenerator(object):
 
@@ -18,8 +40,26 @@ class MaskGenerator(object):
     BAD_DATA = 0
     GOOD_DATA = 1
 
-    REQUIRED_BANDS = set([br.SR1, br.SR2, br.SR3, br.SR4, br.SR5, br.SR6,
-                          br.SR7, br.SENZ, br.SOLZ, br.STATE])
+    # The bands the mask rules use.
+    REQUIRED_BANDS = set([br.SR1, br.SR2, br.SOLZ, br.STATE])
+
+    # ---
+    # The general mask rules that need no surface reflectance.  Pixels they
+    # mark bad are bad whatever the other bands hold.
+    # ---
+    USABLE_BANDS = set([br.SOLZ, br.STATE])
+
+    # ---
+    # State lookup tables, indexed by the 16-bit state value
+    # ---
+    GENERAL_STATE_LUT = _buildStateLut([AERO_MASK], BAD_DATA, GOOD_DATA)
+
+    LAND_STATE_LUT = _buildStateLut([CLOUDY,
+                                     CLOUD_MIXED,
+                                     CLOUD_SHADOW,
+                                     CLOUD_INT],
+                                    BAD_DATA,
+                                    GOOD_DATA)
 
     # -------------------------------------------------------------------------
     # __init__
@@ -40,20 +80,61 @@ class MaskGenerator(object):
 
         self._bandDict = bandDict
 
+    # -------------------------------------------------------------------------
+    # _decodeState
+    #
+    # Casting to uint16 keeps the low 16 bits, which hold every state flag,
+    # so signed or wider state arrays decode as they did bit by bit.
+    # -------------------------------------------------------------------------
+    def _decodeState(self,
+                     lut: np.ndarray,
+                     out: np.ndarray = None) -> np.ndarray:
+
+        state = self._bandDict[br.STATE].astype(np.uint16, copy=False)
+
+        return np.take(lut, state, out=out)
+
+    # -------------------------------------------------------------------------
+    # countUsable
+    #
+    # Count the pixels not already marked bad by the state and solar zenith
+    # rules of the general mask.  This needs only USABLE_BANDS.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def countUsable(bandDict: dict) -> int:
+
+        state = bandDict[br.STATE].astype(np.uint16, copy=False)
+        usable = np.take(MaskGenerator.GENERAL_STATE_LUT, state)
+
+        np.copyto(usable,
+                  MaskGenerator.BAD_DATA,
+                  where=bandDict[br.SOLZ] > 6500)
+
+        return int(np.count_nonzero(usable))
+
     # -------------------------------------------------------------------------
     # generateGeneralMask
+    #
+    # The mask is written into out, a uint8 array, if given.  scratch, a bool
+    # array of the same shape, holds each rule's result, if given.
     # -------------------------------------------------------------------------
-    def generateGeneralMask(self, debug=False) -> np.ndarray:
+    def generateGeneralMask(self,
+                            debug=False,
+                            out: np.ndarray = None,
+                            scratch: np.ndarray = None) -> np.ndarray:
 
         # Apply the rules.
-        mask = np.where(
-            ((self._bandDict[br.SR1] < -100) |
-             (self._bandDict[br.SR2] < -100) |
-             (self._bandDict[br.SOLZ] > 6500) |
-             (self._bandDict[br.STATE] & MaskGenerator.AERO_MASK ==
-                MaskGenerator.AERO_MASK)),
-            MaskGenerator.BAD_DATA,
-            MaskGenerator.GOOD_DATA).astype(np.int16)
+        mask = self._decodeState(MaskGenerator.GENERAL_STATE_LUT, out)
+
+        if scratch is None:
+            scratch = np.empty(mask.shape, dtype=bool)
+
+        np.less(self._bandDict[br.SR1], -100, out=scratch)
+        np.copyto(mask, MaskGenerator.BAD_DATA, where=scratch)
+        np.less(self._bandDict[br.SR2], -100, out=scratch)
+        np.copyto(mask, MaskGenerator.BAD_DATA, where=scratch)
+        np.greater(self._bandDict[br.SOLZ], 6500, out=scratch)
+        np.copyto(mask, MaskGenerator.BAD_DATA, where=scratch)
 
         if debug:
             self._printGeneralMaskDebugInfo()
@@ -62,21 +143,15 @@ class MaskGenerator(object):
 
     # -------------------------------------------------------------------------
     # generateLandMask
+    #
+    # The mask is written into out, a uint8 array, if given.
     # -------------------------------------------------------------------------
-    def generateLandMask(self, debug=False) -> np.ndarray:
+    def generateLandMask(self,
+                         debug=False,
+                         out: np.ndarray = None) -> np.ndarray:
 
         # Apply the rules.
-        mask = np.where(
-            ((self._bandDict[br.STATE] & MaskGenerator.CLOUDY ==
-                MaskGenerator.CLOUDY) |
-             (self._bandDict[br.STATE] & MaskGenerator.CLOUD_MIXED ==
-                MaskGenerator.CLOUD_MIXED) |
-             (self._bandDict[br.STATE] & MaskGenerator.CLOUD_SHADOW ==
-                MaskGenerator.CLOUD_SHADOW) |
-             (self._bandDict[br.STATE] & MaskGenerator.CLOUD_INT ==
-                MaskGenerator.CLOUD_INT)),
-            MaskGenerator.BAD_DATA,
-            MaskGenerator.GOOD_DATA).astype(np.int16)
+        mask = self._decodeState(MaskGenerator.LAND_STATE_LUT, out)
 
         if debug:
             self._printLandMaskDebugInfo()
@@ -0,0 +1,207 @@
+import numpy as np
+
+from modis_water.model.BandPlanner import BandPlanner
+from modis_water.model.BufferPool import BufferPool
+from modis_water.model.Classifier import Classifier
+from modis_water.model.ValidRegion import ValidRegion
+
+
+# -----------------------------------------------------------------------------
+# class MultiClassifier
+#
+# Runs several classifiers of the same tile, year, sensors and days in one
+# pass over the input.  Each day is read once, with the bands of every
+# classifier, and masked once.  Then each classifier classifies the good
+# pixels with its own _runOneSensorOneDay(), applies the masks with its own
+# bad-data value, and writes its daily image under its own
+# getClassifierName().
+#
+# The classifiers' outputs are the same as when each runs alone.  A
+# SimpleClassifier with jit is classified by its NumPy path, whose results
+# are identical, because the masks are shared.  Days are skipped only when
+# every classifier's output exists; otherwise only the classifiers without
+# an output write one.
+# -----------------------------------------------------------------------------
+class MultiClassifier(Classifier):
+
+    # -------------------------------------------------------------------------
+    # __init__
+    #
+    # Reading ahead, the minimum usable fraction and the workers apply to the
+    # shared read, so they are given here rather than to the classifiers.
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 classifiers: list,
+                 logger=None,
+                 prefetch: int = 0,
+                 minUsableFraction: float = None,
+                 numWorkers: int = 1,
+                 useProcesses: bool = False):
+
+        if not classifiers:
+            raise RuntimeError('A multi-classifier needs classifiers.')
+
+        first = classifiers[0]
+
+        for classifier in classifiers:
+
+            if classifier._bandReader is not first._bandReader or \
+               classifier._year != first._year or \
+               classifier._tile != first._tile or \
+               classifier._sensors != first._sensors or \
+               classifier._days != first._days:
+
+                raise RuntimeError('The classifiers must share a band ' +
+                                   'reader, year, tile, sensors and days.')
+
+            if classifier._debug:
+
+                raise RuntimeError('Debugging writes intermediate images ' +
+                                   'of one classifier.  Run ' +
+                                   classifier.getClassifierName() +
+                                   ' alone.')
+
+            if not MultiClassifier._isSameRegion(classifier.getValidRegion(),
+                                                 first.getValidRegion()):
+
+                raise RuntimeError('The classifiers must share a valid ' +
+                                   'region.')
+
+        names = [classifier.getClassifierName() for classifier in classifiers]
+
+        if len(set(names)) != len(names):
+
+            raise RuntimeError('The classifiers must have distinct names: ' +
+                               str(names))
+
+        # _addStages(), called by Classifier.__init__(), uses these.
+        self._classifiers: list = list(classifiers)
+
+        inBands = set()
+
+        for classifier in classifiers:
+            inBands |= classifier._inBands
+
+        super(MultiClassifier, self).__init__(
+            br=first._bandReader,
+            year=first._year,
+            tile=first._tile,
+            outDir=first._outDir,
+            inBands=inBands,
+            sensors=first._sensors,
+            startDay=first._days[0],
+            endDay=first._days[-1],
+            logger=logger,
+            prefetch=prefetch,
+            minUsableFraction=minUsableFraction,
+            validRegion=first.getValidRegion(),
+            numWorkers=numWorkers,
+            useProcesses=useProcesses)
+
+    # -------------------------------------------------------------------------
+    # _addStages
+    # -------------------------------------------------------------------------
+    def _addStages(self, planner: BandPlanner) -> None:
+
+        for classifier in self._classifiers:
+
+            planner.addStage(classifier.getClassifierName(),
+                             classifier._inBands)
+
+    # -------------------------------------------------------------------------
+    # getClassifierName
+    # -------------------------------------------------------------------------
+    def getClassifierName(self):
+
+        return '+'.join([classifier.getClassifierName()
+                         for classifier in self._classifiers])
+
+    # -------------------------------------------------------------------------
+    # getClassifiers
+    # -------------------------------------------------------------------------
+    def getClassifiers(self) -> list:
+        return list(self._classifiers)
+
+    # -------------------------------------------------------------------------
+    # _getPendingClassifiers
+    #
+    # Returns the classifiers whose output of the day does not exist.
+    # -------------------------------------------------------------------------
+    def _getPendingClassifiers(self, sensor: str, day: int) -> list:
+
+        return [classifier for classifier in self._classifiers
+                if not classifier._isDayDone(sensor, day)]
+
+    # -------------------------------------------------------------------------
+    # _isDayDone
+    # -------------------------------------------------------------------------
+    def _isDayDone(self, sensor: str, day: int) -> bool:
+        return not self._getPendingClassifiers(sensor, day)
+
+    # -------------------------------------------------------------------------
+    # _isSameRegion
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _isSameRegion(region: ValidRegion, other: ValidRegion) -> bool:
+
+        if region is None or other is None:
+            return region is other
+
+        return region.getWindow() == other.getWindow() and \
+            region.getTileShape() == other.getTileShape()
+
+    # -------------------------------------------------------------------------
+    # _writeDay
+    #
+    # With a valid region, bandDict is its window, as _readDay() reads it.
+    # -------------------------------------------------------------------------
+    def _writeDay(self,
+                  sensor: str,
+                  day: int,
+                  bandDict: dict,
+                  usable: bool,
+                  frame: BufferPool.Frame = None,
+                  geo: tuple = None) -> None:
+
+        frame = frame or BufferPool.Frame()
+        classifiers = self._getPendingClassifiers(sensor, day)
+
+        if not usable:
+
+            for classifier in classifiers:
+
+                outName = classifier._createOutputImageName(sensor, day)
+
+                if self._logger:
+                    self._logger.info('Creating ' + outName)
+
+                classifier._writeBadData(outName, frame, geo)
+
+            return
+
+        generalMask, landMask = self._createMasks(bandDict, frame)
+
+        # ---
+        # Each classifier overwrites the frame's classify and final image
+        # arrays, so each image is written before the next is made.  The
+        # masks are in arrays of their own.
+        # ---
+        for classifier in classifiers:
+
+            outName = classifier._createOutputImageName(sensor, day)
+
+            if self._logger:
+                self._logger.info('Creating ' + outName)
+
+            predictedImage = classifier._classifyGoodPixels(bandDict,
+                                                            generalMask,
+                                                            outName,
+                                                            frame)
+
+            finalImage: np.ndarray = \
+                classifier._finalizeImage(predictedImage,
+                                          generalMask,
+                                          landMask,
+                                          frame)
+
+            classifier._writeFinalImage(finalImage, outName, frame, geo)
@@ -0,0 +1,71 @@
+import numpy as np
+
+
+# -----------------------------------------------------------------------------
+# class NormalizedDifference
+#
+# Computes ((x - y) / (x + y)) * scale the way the float64 expression and
+# astype() always have, without float64 arrays or divide-by-zero warnings:
+#
+# - x - y and x + y wrap around in the bands' integer type, as before.
+# - The quotient is truncated toward zero, then cast to the output type.
+# - Where x + y is zero, the result is zero.
+#
+# The work is done in int32 for 16-bit bands, with truncated integer
+# division.  Truncating the exact quotient matches the float64 path except
+# where the quotient is an integer, which the float64 path can land just
+# below.  Those pixels are recomputed with the float64 expression.
+# -----------------------------------------------------------------------------
+class NormalizedDifference(object):
+
+    SCALE = 10000
+
+    # -------------------------------------------------------------------------
+    # compute
+    #
+    # Returns out, a new array of x's type if out is not given.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def compute(x: np.ndarray,
+                y: np.ndarray,
+                out: np.ndarray = None,
+                scale: int = SCALE) -> np.ndarray:
+
+        if out is None:
+            out = np.empty(x.shape, dtype=x.dtype)
+
+        workType = np.int32 if max(x.itemsize, y.itemsize) <= 2 else np.int64
+
+        # Wrap around in the bands' type, as the float64 expression does.
+        numerator = (x - y).astype(workType)
+        denominator = (x + y).astype(workType)
+
+        undefined = denominator == 0
+        np.copyto(denominator, 1, where=undefined)
+        numerator *= scale
+
+        negative = np.not_equal(numerator < 0, denominator < 0)
+        np.abs(numerator, out=numerator)
+        np.abs(denominator, out=denominator)
+        quotient, remainder = np.divmod(numerator, denominator)
+        np.negative(quotient, out=quotient, where=negative)
+
+        # ---
+        # Exact quotients, other than zero, are recomputed as they were.
+        # ---
+        exact = remainder == 0
+        exact &= ~undefined
+        exact &= numerator != 0
+
+        if exact.any():
+
+            xExact = x[exact]
+            yExact = y[exact]
+
+            quotient[exact] = (((xExact - yExact) / (xExact + yExact)) *
+                               scale).astype(out.dtype)
+
+        np.copyto(quotient, 0, where=undefined)
+        np.copyto(out, quotient, casting='unsafe')
+
+        return out
@@ -0,0 +1,141 @@
+from pathlib import Path
+import threading
+
+import numpy as np
+from pyhdf.SD import SD
+from pyhdf.SD import SDC
+
+from modis_water.model.GranuleReader import GranuleReader
+
+
+# -----------------------------------------------------------------------------
+# class PyhdfGranuleReader
+#
+# Reads MODIS HDF4 granules directly with pyhdf's SD interface, bypassing
+# GDAL's HDF4 driver and its per-open metadata work.  Arrays are the stored
+# scientific data sets, exactly as GDAL returns them.  The geotransform of a
+# band comes from its grid in StructMetadata.0, and the projection is the
+# MODIS sinusoidal.
+#
+# Band names use the MODIS reader's ':<grid>:<field>' form.  A band read at a
+# larger size is upsampled by nearest neighbour.
+# -----------------------------------------------------------------------------
+class PyhdfGranuleReader(GranuleReader):
+
+    # -------------------------------------------------------------------------
+    # class _Granule
+    # -------------------------------------------------------------------------
+    class _Granule(object):
+
+        def __init__(self, sd: SD, datasets: dict, grids: dict):
+
+            self.sd: SD = sd
+            self.datasets: dict = datasets
+            self.grids: dict = grids
+            self.lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # _close
+    # -------------------------------------------------------------------------
+    def _close(self, handle: _Granule) -> None:
+        handle.sd.end()
+
+    # -------------------------------------------------------------------------
+    # _open
+    # -------------------------------------------------------------------------
+    def _open(self, path: str) -> _Granule:
+
+        try:
+            sd = SD(path, SDC.READ)
+
+        except Exception:
+            raise RuntimeError('Unable to open granule, ' + path)
+
+        # ---
+        # Long metadata is split across StructMetadata.0, StructMetadata.1,
+        # and so on.
+        # ---
+        attributes = sd.attributes()
+
+        structMetadata = ''.join(attributes[name]
+                                 for name in sorted(attributes.keys())
+                                 if name.startswith('StructMetadata.'))
+
+        grids = GranuleReader._parseGridMetadata(structMetadata)
+
+        # ---
+        # Key the data sets by (grid, field).  Their dimension names, like
+        # YDim:MODIS_Grid_500m_2D, give the grid.
+        # ---
+        datasets = {}
+
+        for field, info in sd.datasets().items():
+
+            dimNames, shape, dataType, index = info
+            grid = dimNames[0].split(':')[-1]
+            datasets[(grid, field)] = index
+
+        return PyhdfGranuleReader._Granule(sd, datasets, grids)
+
+    # -------------------------------------------------------------------------
+    # readBand
+    #
+    # A window is read with SDS.get(start, count) from the stored pixels
+    # covering it, which are upsampled in memory.
+    # -------------------------------------------------------------------------
+    def readBand(self,
+                 path: Path,
+                 subDsPrefix: str,
+                 bandName: str,
+                 cols: int = None,
+                 rows: int = None,
+                 out: np.ndarray = None,
+                 window: tuple = None) -> tuple:
+
+        grid, field = bandName.lstrip(':').split(':')
+
+        with self._granule(path) as granule:
+
+            if (grid, field) not in granule.datasets:
+
+                raise RuntimeError('Unable to find ' + field + ' in ' +
+                                   grid + ' of ' + str(path))
+
+            with granule.lock:
+
+                sds = granule.sd.select(granule.datasets[(grid, field)])
+
+                try:
+
+                    storedShape = tuple(sds.info()[2])
+                    shape = (rows, cols) if cols and rows else storedShape
+
+                    if window:
+
+                        array = GranuleReader.upsampleWindow(
+                            lambda rowStart, rowEnd, colStart, colEnd, buf:
+                                sds.get(start=(rowStart, colStart),
+                                        count=(rowEnd - rowStart,
+                                               colEnd - colStart)),
+                            storedShape,
+                            window,
+                            shape[1],
+                            shape[0],
+                            out)
+
+                    else:
+                        array = sds.get()
+
+                finally:
+                    sds.endaccess()
+
+            # pyhdf allocates the decoded array.  Only the upsample uses out.
+            if cols and rows and not window:
+                array = GranuleReader.upsample(array, cols, rows, out)
+
+            xform = GranuleReader.scaleXform(granule.grids.get(grid),
+                                             storedShape,
+                                             shape[1],
+                                             shape[0])
+
+            return array, xform, GranuleReader.SINUSOIDAL_WKT
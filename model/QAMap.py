@@ -8,6 +8,7 @@ import numpy as np
 
 from modis_water.model.BandReader import BandReader
 from modis_water.model.Utils import Utils
+from modis_water.model.ValidRegion import ValidRegion
 
 
 """
@@ -121,14 +122,22 @@ class QAMap(object):
                    logger,
                    bandReader: BandReader,
                    geoTiff=False,
-                   georeferenced=False) -> str:
+                   georeferenced=False,
+                   validRegion: ValidRegion = None) -> str:
+
+        # ---
+        # With a valid region, the inputs are cropped to its window, and only
+        # the window is computed.  Every pixel outside it is out of
+        # projection.
+        # ---
+        crop = validRegion.crop if validRegion else lambda array: array
 
         # Search for, read in our post processing rasters.
         postProcessingArray = \
-            QAMap._getPostProcessingMask(tile,
-                                         postProcessingDir,
-                                         bandReader.getCols(),
-                                         bandReader.getRows())
+            crop(QAMap._getPostProcessingMask(tile,
+                                              postProcessingDir,
+                                              bandReader.getCols(),
+                                              bandReader.getRows()))
 
         demSlopeDataArray = QAMap._extractPackedBitBinaryArray(
             postProcessingArray,
@@ -142,35 +151,35 @@ class QAMap(object):
             postProcessingArray,
             QAMap.PERMANENT_BIT_MASK)
 
+        rows, cols = postProcessingArray.shape
+
         ancillaryDataArray = \
-            QAMap._extractAncillaryArray(postProcessingArray,
-                                         bandReader.getCols(),
-                                         bandReader.getRows())
+            QAMap._extractAncillaryArray(postProcessingArray, rows, cols)
 
-        totalWater = QAMap._getAnnualStatPath(
+        totalWater = crop(QAMap._getAnnualStatPath(
             year,
             tile,
             sensor,
             classifierName,
             QAMap.TOTAL_WATER_POST_STR,
-            outDir)
+            outDir))
 
-        totalLand = QAMap._getAnnualStatPath(
+        totalLand = crop(QAMap._getAnnualStatPath(
             year,
             tile,
             sensor,
             classifierName,
             QAMap.TOTAL_LAND_POST_STR,
-            outDir)
+            outDir))
 
         annualProductDataset = gdal.Open(annualProductPath)
         
         annualProductArray = \
-            annualProductDataset.GetRasterBand(1).ReadAsArray()
+            crop(annualProductDataset.GetRasterBand(1).ReadAsArray())
 
-        burnScarArray = QAMap._readAndResample(burnedAreaPath,
-                                               bandReader.getCols(),
-                                               bandReader.getRows())
+        burnScarArray = crop(QAMap._readAndResample(burnedAreaPath,
+                                                    bandReader.getCols(),
+                                                    bandReader.getRows()))
 
         annualProductOutput = annualProductArray.copy()
         qaOutput = np.zeros(annualProductArray.shape, dtype=QAMap.DTYPE)
@@ -290,6 +299,15 @@ class QAMap(object):
                             QAMap.QA_OUT_OF_PROJECTION,
                             qaOutput)
 
+        if validRegion:
+
+            annualProductOutput = \
+                validRegion.expand(annualProductOutput,
+                                   QAMap.ANNUAL_OUT_OF_PROJECTION)
+
+            qaOutput = validRegion.expand(qaOutput,
+                                          QAMap.QA_OUT_OF_PROJECTION)
+
         # Write out the final annual product in addition to the QA map.
         annualProductOutputName = \
             '{}44W.A{}.{}.{}.AnnualWaterProduct.{}'.format(
@@ -360,11 +378,11 @@ class QAMap(object):
     # -------------------------------------------------------------------------
     @staticmethod
     def _extractAncillaryArray(postProcessingMask: np.ndarray,
-                               cols: int,
-                               rows: int) -> np.ndarray:
+                               rows: int,
+                               cols: int) -> np.ndarray:
         
         ancillaryBitMaskDict = QAMap.ANCILLARY_BIT_MASK_DICT
-        ancillaryDataArray = np.zeros((cols, rows), dtype=QAMap.DTYPE)
+        ancillaryDataArray = np.zeros((rows, cols), dtype=QAMap.DTYPE)
         ancillaryDataArray.fill(QAMap.ANC_FILL_VALUE)
         
         for ancillaryValue in ancillaryBitMaskDict.keys():
@@ -1,13 +1,20 @@
 
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
 import os
+from pathlib import Path
 
 import joblib
 import numpy as np
-import pandas as pd
 
+from modis_water.model.BandCube import BandCube
 from modis_water.model.BandReader import BandReader
 from modis_water.model.Classifier import Classifier
+from modis_water.model.CompiledForest import CompiledForest
+from modis_water.model.NormalizedDifference import NormalizedDifference
 from modis_water.model.Utils import Utils
+from modis_water.model.ValidRegion import ValidRegion
 
 
 # -----------------------------------------------------------------------------
@@ -15,28 +22,127 @@ from modis_water.model.Utils import Utils
 #
 # The notebook specified hard-coded input files.  The files are opened as VRTs,
 # then read into a dictionary.
+#
+# The model predicts the good pixels of a day in chunks of chunkSize pixels,
+# on a pool of numThreads threads.  The forest's tree traversal releases the
+# GIL, so the chunks run in parallel.  The forest copies each chunk of the
+# feature matrix to C-ordered float32, so the chunk size bounds the memory
+# of those copies.
+#
+# With compileModel, the forest is compiled into a CompiledForest, which
+# predicts directly from the int16 features with the same results.  Either
+# way, each daily image records the SHA256 of the model file.
+#
+# With compiledModelDir, the compiled forest is saved there once and
+# memory-mapped from there after, without loading the model file at all.
+# Worker processes on a node share the one mapped copy.  The directory holds
+# a subdirectory of each compiled model, named by its hash, and a JSON file
+# recording the size, modification time and hash of the model file it was
+# compiled from.  A model file that changes is compiled again.
 # -----------------------------------------------------------------------------
 class RandomForestClassifier(Classifier):
 
     CLASSIFIER_NAME = 'RandomForest'
 
+    # Derived features
+    NDVI = 'ndvi'
+    ND_SR2_SR6 = 'nd_b02_b06'
+    ND_SR2_SR7 = 'nd_b02_b07'
+
+    # The model's features, in the order it was trained on
+    FEATURE_BANDS = [BandReader.SR1, BandReader.SR2, BandReader.SR3,
+                     BandReader.SR4, BandReader.SR5, BandReader.SR6,
+                     BandReader.SR7, NDVI, ND_SR2_SR6, ND_SR2_SR7]
+
+    # The number of pixels predicted at a time
+    CHUNK_SIZE = 2 ** 20
+
     # -------------------------------------------------------------------------
     # __init__
+    #
+    # Without numThreads, prediction uses every core, divided among the
+    # workers.  compiledModelDir implies compileModel.
     # -------------------------------------------------------------------------
-    def __init__(self, year, tile, outDir, modDir, startDay=1, endDay=365,
-                 logger=None, sensors=set([BandReader.MOD]), debug=False):
+    def __init__(self,
+                 br: BandReader,
+                 year,
+                 tile,
+                 outDir,
+                 sensors,
+                 startDay=1,
+                 endDay=365,
+                 logger=None,
+                 debug=False,
+                 prefetch=0,
+                 minUsableFraction=None,
+                 validRegion: ValidRegion = None,
+                 numThreads: int = None,
+                 chunkSize: int = CHUNK_SIZE,
+                 compileModel: bool = False,
+                 compiledModelDir: Path = None,
+                 numWorkers: int = 1,
+                 useProcesses: bool = False):
 
-        super(RandomForestClassifier, self). \
-            __init__(year, tile, outDir, modDir, startDay, endDay, logger,
-                     sensors, debug,
-                     [BandReader.SR1, BandReader.SR2, BandReader.SR3,
-                      BandReader.SR4, BandReader.SR5, BandReader.SR6,
-                      BandReader.SR7])
+        inBands = [BandReader.SR1, BandReader.SR2, BandReader.SR3,
+                   BandReader.SR4, BandReader.SR5, BandReader.SR6,
+                   BandReader.SR7]
+
+        super(RandomForestClassifier, self).__init__(
+            br=br,
+            year=year,
+            tile=tile,
+            outDir=outDir,
+            inBands=inBands,
+            sensors=sensors,
+            startDay=startDay,
+            endDay=endDay,
+            logger=logger,
+            debug=debug,
+            prefetch=prefetch,
+            minUsableFraction=minUsableFraction,
+            validRegion=validRegion,
+            numWorkers=numWorkers,
+            useProcesses=useProcesses)
+
+        if chunkSize < 1:
+
+            raise RuntimeError('The chunk size must be at least one ' +
+                               'pixel.  It was specified as ' +
+                               str(chunkSize))
+
+        self._chunkSize: int = chunkSize
+        self._numThreads: int = \
+            numThreads or max(1, (os.cpu_count() or 1) // numWorkers)
 
         # Read the model before we do any real work.
         modelFile = os.path.join(os.path.dirname(os.path.abspath(__file__)),
                                  'RandomForestModel.sav')
-        self._model = joblib.load(modelFile)
+
+        self._modelName: str = os.path.basename(modelFile)
+        self._modelHash: str = None
+
+        if compiledModelDir:
+
+            self._predictor = \
+                self._loadCompiledModel(modelFile, Path(compiledModelDir))
+
+        else:
+
+            model = self._loadModel(modelFile)
+            self._predictor = CompiledForest(model) if compileModel else model
+
+        if self._logger:
+
+            self._logger.info('Model ' + self._modelName + ', SHA256 ' +
+                              self._modelHash)
+
+            if isinstance(self._predictor, CompiledForest):
+
+                self._logger.info('Compiled ' +
+                                  str(self._predictor.getNumTrees()) +
+                                  ' trees, ' +
+                                  str(self._predictor.getNumNodes()) +
+                                  ' nodes')
 
     # -------------------------------------------------------------------------
     # getClassifierName
@@ -45,55 +151,181 @@ class RandomForestClassifier(Classifier):
         return RandomForestClassifier.CLASSIFIER_NAME
 
     # -------------------------------------------------------------------------
-    # _runOneSensorOneDay
+    # _getFeatureBands
     # -------------------------------------------------------------------------
-    def _runOneSensorOneDay(self, bandDict, outName):
+    def _getFeatureBands(self) -> list:
+        return RandomForestClassifier.FEATURE_BANDS
 
-        # ---
-        # Collapse the 2D bands into one dimension, and combine all bands
-        # into a 2D array.
-        #
-        # This model expects arrays in order from SR1 - SR7.  Just to be safe
-        # sort them explicitly.
-        # ---
-        dims = (BandReader.ROWS * BandReader.COLS, 10)
-        img = np.empty(dims, dtype=np.int16)
-        img[:, 0] = bandDict[BandReader.SR1].ravel()
-        img[:, 1] = bandDict[BandReader.SR2].ravel()
-        img[:, 2] = bandDict[BandReader.SR3].ravel()
-        img[:, 3] = bandDict[BandReader.SR4].ravel()
-        img[:, 4] = bandDict[BandReader.SR5].ravel()
-        img[:, 5] = bandDict[BandReader.SR6].ravel()
-        img[:, 6] = bandDict[BandReader.SR7].ravel()
-
-        img[:, 7] = self.computeNdvi(bandDict[BandReader.SR1],
-                                     bandDict[BandReader.SR2]).ravel()
+    # -------------------------------------------------------------------------
+    # _getOutputMetadata
+    # -------------------------------------------------------------------------
+    def _getOutputMetadata(self) -> dict:
+
+        return {'MODEL': self._modelName,
+                'MODEL_SHA256': self._modelHash}
+
+    # -------------------------------------------------------------------------
+    # _hashFile
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _hashFile(path: str) -> str:
+
+        digest = hashlib.sha256()
+
+        with open(path, 'rb') as f:
+
+            for block in iter(lambda: f.read(2 ** 20), b''):
+                digest.update(block)
+
+        return digest.hexdigest()
+
+    # -------------------------------------------------------------------------
+    # _loadCompiledModel
+    #
+    # Returns the compiled forest of the model file, memory-mapped from the
+    # directory, compiling and saving it first if the directory has no
+    # forest compiled from this model file.  Concurrent workers that compile
+    # the same model write the same files, so any of them may finish last.
+    # -------------------------------------------------------------------------
+    def _loadCompiledModel(self,
+                           modelFile: str,
+                           compiledModelDir: Path) -> CompiledForest:
+
+        stat = os.stat(modelFile)
+        source = {'modelSize': stat.st_size, 'modelMtimeNs': stat.st_mtime_ns}
+        recordFile = compiledModelDir / (self._modelName + '.json')
+
+        if recordFile.exists():
+
+            with open(recordFile) as f:
+                record = json.load(f)
+
+            forestDir = compiledModelDir / record['modelSha256']
+
+            if all([record.get(key) == value
+                    for key, value in source.items()]) and \
+               (forestDir / CompiledForest.DESCRIPTION_FILE).exists():
+
+                self._modelHash = record['modelSha256']
+
+                return CompiledForest(directory=forestDir)
+
+        if self._logger:
+
+            self._logger.info('Compiling ' + self._modelName + ' into ' +
+                              str(compiledModelDir))
+
+        model = self._loadModel(modelFile)
+        record = dict(source, modelSha256=self._modelHash)
+        forestDir = compiledModelDir / self._modelHash
+
+        CompiledForest(model).save(forestDir, record)
+
+        recordTmp = compiledModelDir / (self._modelName + '.json.tmp' +
+                                        str(os.getpid()))
+
+        with open(recordTmp, 'w') as f:
+            json.dump(record, f)
+
+        os.replace(recordTmp, recordFile)
+
+        return CompiledForest(directory=forestDir)
+
+    # -------------------------------------------------------------------------
+    # _loadModel
+    #
+    # Loads the pickled model, and records its hash.
+    # -------------------------------------------------------------------------
+    def _loadModel(self, modelFile: str):
+
+        model = joblib.load(modelFile)
+        self._modelHash = RandomForestClassifier._hashFile(modelFile)
 
         # ---
-        # Numpy sometimes alters data types when it encounters infinite
-        # numbers.  Use np.where to prevent this.
+        # The chunks are the parallelism, so each predicts on one thread
+        # rather than starting the model's own workers.
         # ---
-        img[:, 8] = \
-            np.where(img[:, 1] + img[:, 5] != 0,
-                     ((img[:, 1] - img[:, 5]) /
-                      (img[:, 1] + img[:, 5]) *
-                      10000).astype(np.int16),
-                     0)
-
-        img[:, 9] = \
-            np.where(img[:, 1] + img[:, 6] != 0,
-                     ((img[:, 1] - img[:, 6]) /
-                      (img[:, 1] + img[:, 6]) *
-                      10000).astype(np.int16),
-                     0)
+        if hasattr(model, 'n_jobs'):
+            model.n_jobs = 1
+
+        return model
+
+    # -------------------------------------------------------------------------
+    # _predict
+    #
+    # Predicts the rows of a (pixels, features) matrix into a new int16
+    # array, chunk by chunk.  The chunks are views of the matrix.
+    # -------------------------------------------------------------------------
+    def _predict(self, features: np.ndarray) -> np.ndarray:
+
+        numPixels = features.shape[0]
+        predictions = np.empty(numPixels, dtype=np.int16)
+
+        def predictChunk(start: int) -> None:
+
+            end = min(start + self._chunkSize, numPixels)
+            predictions[start:end] = \
+                self._predictor.predict(features[start:end])
+
+        starts = range(0, numPixels, self._chunkSize)
+
+        if self._numThreads > 1 and len(starts) > 1:
+
+            with ThreadPoolExecutor(max_workers=self._numThreads) as executor:
+                list(executor.map(predictChunk, starts))
+
+        else:
+
+            for start in starts:
+                predictChunk(start)
+
+        return predictions
+
+    # -------------------------------------------------------------------------
+    # _runOneSensorOneDay
+    #
+    # The good pixels arrive as a cube of the model's features, with the
+    # derived planes left to fill here.  The model predicts from the cube's
+    # feature matrix, a view of its block.  A compiled forest reads the view
+    # as it is.  A scikit-learn forest copies each chunk to float32.  Other
+    # band dictionaries, like the whole tile when debugging, are first put
+    # in a new cube.
+    # -------------------------------------------------------------------------
+    def _runOneSensorOneDay(self, bandDict, outName):
+
+        cube = bandDict
+        featureBands = RandomForestClassifier.FEATURE_BANDS
+
+        if not isinstance(cube, BandCube) or \
+           cube.getBandNames() != featureBands:
+
+            cube = BandCube(featureBands, bandDict[BandReader.SR1].shape)
+
+            for band in featureBands:
+
+                if band in bandDict:
+                    cube.setBand(band, bandDict[band])
+
+        shape = cube.getShape()
+        sr2 = cube[BandReader.SR2]
+
+        NormalizedDifference.compute(sr2,
+                                     cube[BandReader.SR1],
+                                     cube[RandomForestClassifier.NDVI])
+
+        # Normalized differences of SR2 with SR6 and SR7
+        NormalizedDifference.compute(sr2,
+                                     cube[BandReader.SR6],
+                                     cube[RandomForestClassifier.ND_SR2_SR6])
+
+        NormalizedDifference.compute(sr2,
+                                     cube[BandReader.SR7],
+                                     cube[RandomForestClassifier.ND_SR2_SR7])
 
         # Run the model.  Should be {0, 1}.
-        df = pd.DataFrame(img)
-        predictions = self._model.predict(df)
-        matrix = np.asarray(predictions, dtype=np.int16)
+        matrix = self._predict(cube.getFeatureMatrix())
 
-        reshp = matrix.reshape((BandReader.ROWS,
-                                BandReader.COLS)).astype(np.int16)
+        reshp = matrix.reshape(shape)
 
         if self._debug:
             self._writeDebugImage(matrix, 'matrix')
@@ -108,7 +340,7 @@ class RandomForestClassifier(Classifier):
         print('Type ' + name + ':', str(pixels.dtype))
         matrix = np.asarray(pixels, dtype=np.int16)
 
-        out = matrix.reshape((BandReader.ROWS,
-                              BandReader.COLS)).astype(np.int16)
+        out = matrix.reshape((self._bandReader.getRows(),
+                              self._bandReader.getCols())).astype(np.int16)
 
         Utils.writeRaster(self._outDir, out, name)
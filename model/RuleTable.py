@@ -0,0 +1,223 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+# -----------------------------------------------------------------------------
+# class RuleTable
+#
+# A decision tree expressed as an ordered table of rules.  Each rule is a
+# class value and the predicates that must all hold for a pixel to take it.
+# The first rule a pixel matches assigns its value; pixels matching no rule
+# keep the default.
+#
+# A predicate is (input, operator, threshold name), like
+# ('swir5', '<', 'swir5Low').  Each predicate is evaluated once per pixel and
+# shared by every rule that names it.  A rule names a predicate's complement
+# as ~name, which is derived from the predicate without comparing again.
+#
+# Threshold values are looked up by name, so another threshold set can be
+# plugged in without changing the rules.
+# -----------------------------------------------------------------------------
+class RuleTable(object):
+
+    OPERATORS = {'<': np.less,
+                 '<=': np.less_equal,
+                 '>': np.greater,
+                 '>=': np.greater_equal,
+                 '==': np.equal,
+                 '!=': np.not_equal}
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 predicates: dict,
+                 rules: list,
+                 thresholds: dict,
+                 default: int):
+
+        for name, (inputName, op, thresholdName) in predicates.items():
+
+            if op not in RuleTable.OPERATORS:
+
+                raise RuntimeError('Predicate ' + name +
+                                   ' has an invalid operator, ' + str(op))
+
+            if thresholdName not in thresholds:
+
+                raise RuntimeError('Predicate ' + name +
+                                   ' uses an undefined threshold, ' +
+                                   str(thresholdName))
+
+        for value, ruleNames in rules:
+
+            for ruleName in ruleNames:
+
+                if ruleName.lstrip('~') not in predicates:
+
+                    raise RuntimeError('Rule for ' + str(value) +
+                                       ' uses an undefined predicate, ' +
+                                       ruleName)
+
+        self._predicates: dict = predicates
+        self._rules: list = rules
+        self._thresholds: dict = dict(thresholds)
+        self._default: int = default
+
+    # -------------------------------------------------------------------------
+    # apply
+    #
+    # inputs maps each predicate input name to an array.  Results are
+    # written into out, if given, or into a new int16 array.
+    # -------------------------------------------------------------------------
+    def apply(self, inputs: dict, out: np.ndarray = None) -> np.ndarray:
+
+        shape = next(iter(inputs.values())).shape
+
+        if out is None:
+            out = np.empty(shape, dtype=np.int16)
+
+        out.fill(self._default)
+
+        cache = {}
+        unassigned = np.ones(shape, dtype=bool)
+        match = np.empty(shape, dtype=bool)
+
+        for value, ruleNames in self._rules:
+
+            np.copyto(match, unassigned)
+
+            for ruleName in ruleNames:
+
+                np.logical_and(match,
+                               self._evaluate(ruleName, inputs, cache),
+                               out=match)
+
+            np.copyto(out, value, where=match)
+            np.logical_xor(unassigned, match, out=unassigned)
+
+        return out
+
+    # -------------------------------------------------------------------------
+    # encode
+    #
+    # The table as arrays, for compiled kernels:
+    #
+    # - inputs[p]: the index in inputNames of predicate p's input
+    # - operators[p]: the index in OPERATORS of its operator
+    # - thresholds[p]: its threshold value
+    # - values[r]: the value of rule r
+    # - terms[r, :]: p + 1 for each predicate of rule r, -(p + 1) for a
+    #   complement, padded with 0
+    # -------------------------------------------------------------------------
+    def encode(self, inputNames: list) -> tuple:
+
+        names = sorted(self._predicates.keys())
+        operatorNames = list(RuleTable.OPERATORS.keys())
+        inputs = np.empty(len(names), dtype=np.int64)
+        operators = np.empty(len(names), dtype=np.int64)
+        thresholds = np.empty(len(names), dtype=np.float64)
+
+        for p, name in enumerate(names):
+
+            inputName, op, thresholdName = self._predicates[name]
+
+            if inputName not in inputNames:
+
+                raise RuntimeError('Predicate ' + name +
+                                   ' uses an input not given, ' + inputName)
+
+            inputs[p] = inputNames.index(inputName)
+            operators[p] = operatorNames.index(op)
+            thresholds[p] = self._thresholds[thresholdName]
+
+        numTerms = max([len(ruleNames) for value, ruleNames in self._rules],
+                       default=0)
+
+        values = np.empty(len(self._rules), dtype=np.int64)
+        terms = np.zeros((len(self._rules), numTerms), dtype=np.int64)
+
+        for r, (value, ruleNames) in enumerate(self._rules):
+
+            values[r] = value
+
+            for t, ruleName in enumerate(ruleNames):
+
+                p = names.index(ruleName.lstrip('~')) + 1
+                terms[r, t] = -p if ruleName.startswith('~') else p
+
+        return inputs, operators, thresholds, values, terms
+
+    # -------------------------------------------------------------------------
+    # _evaluate
+    # -------------------------------------------------------------------------
+    def _evaluate(self,
+                  ruleName: str,
+                  inputs: dict,
+                  cache: dict) -> np.ndarray:
+
+        if ruleName in cache:
+            return cache[ruleName]
+
+        if ruleName.startswith('~'):
+
+            result = np.logical_not(self._evaluate(ruleName[1:],
+                                                   inputs,
+                                                   cache))
+
+        else:
+
+            inputName, op, thresholdName = self._predicates[ruleName]
+
+            result = RuleTable.OPERATORS[op](inputs[inputName],
+                                             self._thresholds[thresholdName])
+
+        cache[ruleName] = result
+
+        return result
+
+    # -------------------------------------------------------------------------
+    # getDefault
+    # -------------------------------------------------------------------------
+    def getDefault(self) -> int:
+        return self._default
+
+    # -------------------------------------------------------------------------
+    # getThresholds
+    # -------------------------------------------------------------------------
+    def getThresholds(self) -> dict:
+        return dict(self._thresholds)
+
+    # -------------------------------------------------------------------------
+    # readThresholds
+    #
+    # Read a threshold set from a JSON object of name: value.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def readThresholds(path: Path) -> dict:
+
+        with open(path) as f:
+            thresholds = json.load(f)
+
+        if not isinstance(thresholds, dict):
+
+            raise RuntimeError('Thresholds in ' + str(path) +
+                               ' must be a JSON object of name: value.')
+
+        return thresholds
+
+    # -------------------------------------------------------------------------
+    # setThresholds
+    #
+    # Replace some or all of the thresholds.
+    # -------------------------------------------------------------------------
+    def setThresholds(self, thresholds: dict) -> None:
+
+        unknown = set(thresholds.keys()) - set(self._thresholds.keys())
+
+        if unknown:
+            raise RuntimeError('Unknown thresholds: ' + str(unknown))
+
+        self._thresholds.update(thresholds)
@@ -2,16 +2,87 @@
 import numpy as np
 
 from modis_water.model.BandReader import BandReader
+from modis_water.model.BufferPool import BufferPool
 from modis_water.model.Classifier import Classifier
+from modis_water.model.FusedDailyKernel import FusedDailyKernel
+from modis_water.model.MaskGenerator import MaskGenerator
+from modis_water.model.RuleTable import RuleTable
+from modis_water.model.ValidRegion import ValidRegion
 
 
 # -----------------------------------------------------------------------------
 # class SimpleClassifier
+#
+# The decision tree from water_change.c, as a RuleTable.  The thresholds can
+# be replaced, in whole or in part, by passing a dictionary of them.
 # -----------------------------------------------------------------------------
 class SimpleClassifier(Classifier):
 
     CLASSIFIER_NAME = 'Simple'
 
+    # ---
+    # Thresholds from water_change.c.  NDVI is scaled by 10,000.
+    # ---
+    THRESHOLDS = {'swir5Low': 1017,
+                  'swir5Min': 453,
+                  'swir7Low': 773,
+                  'swir7Max': 1950,
+                  'blueLand1': 675,
+                  'blueWater2': 651,
+                  'nirMin': 1000,
+                  'nirLow': 1777,
+                  'nirLand3': 1329,
+                  'ndviLow': 825,
+                  'ndviMid': 4125,
+                  'ndviUndefined': 0}
+
+    # Predicates: name: (input, operator, threshold name)
+    PREDICATES = {'swir5Low': ('swir5', '<', 'swir5Low'),
+                  'swir5Min': ('swir5', '>=', 'swir5Min'),
+                  'swir7Low': ('swir7', '<', 'swir7Low'),
+                  'swir7Max': ('swir7', '<', 'swir7Max'),
+                  'blueLand1': ('blue', '<', 'blueLand1'),
+                  'blueWater2': ('blue', '<', 'blueWater2'),
+                  'nirMin': ('nir', '>', 'nirMin'),
+                  'nirLow': ('nir', '<', 'nirLow'),
+                  'nirLand3': ('nir', '>=', 'nirLand3'),
+                  'ndviLow': ('ndvi', '<', 'ndviLow'),
+                  'ndviMid': ('ndvi', '<', 'ndviMid'),
+                  'ndviUndefined': ('redPlusNir', '==', 'ndviUndefined')}
+
+    # ---
+    # Rules, in order; the first match wins.  The names in comments are the
+    # conditions in water_change.c.  Each rule omits the conditions implied
+    # by an earlier rule not matching.
+    # ---
+    RULES = [
+        # NDVI could not be computed.
+        (Classifier.NO_DATA, ['ndviUndefined']),
+
+        # land1
+        (Classifier.LAND, ['swir5Low', 'swir7Low', 'swir5Min', 'blueLand1',
+                           'nirMin']),
+
+        # water1
+        (Classifier.WATER, ['swir5Low', 'swir7Low']),
+
+        # land5
+        (Classifier.LAND, ['~swir5Low', '~nirLow']),
+
+        # water2
+        (Classifier.WATER, ['~swir5Low', 'nirLow', 'ndviLow',
+                            'blueWater2']),
+
+        # land2
+        (Classifier.LAND, ['~swir5Low', 'nirLow', 'ndviLow']),
+
+        # land3
+        (Classifier.LAND, ['~swir5Low', 'nirLow', '~ndviLow', 'ndviMid',
+                           'nirLand3', 'swir7Max']),
+
+        # land4
+        (Classifier.LAND, ['~swir5Low', 'nirLow', '~ndviLow', '~ndviMid'])]
+
     # -------------------------------------------------------------------------
     # __init__
     # -------------------------------------------------------------------------
@@ -24,11 +95,18 @@ class SimpleClassifier(Classifier):
                  startDay=1,
                  endDay=365, 
                  logger=None, 
-                 debug=False):
-
-        inBands=[BandReader.SOLZ, BandReader.STATE, BandReader.SR1,
-                 BandReader.SR2, BandReader.SR3, BandReader.SR4,
-                 BandReader.SR5, BandReader.SR6, BandReader.SR7]
+                 debug=False,
+                 prefetch=0,
+                 minUsableFraction=None,
+                 thresholds: dict = None,
+                 jit: bool = False,
+                 validRegion: ValidRegion = None,
+                 numWorkers: int = 1,
+                 useProcesses: bool = False):
+
+        # The bands the rules use.  The masks add what they need.
+        inBands=[BandReader.SR1, BandReader.SR2, BandReader.SR3,
+                 BandReader.SR5, BandReader.SR7]
 
         super(SimpleClassifier, self).__init__(br=br,
                                                year=year, 
@@ -40,7 +118,47 @@ class SimpleClassifier(Classifier):
                                                startDay=startDay, 
                                                endDay=endDay, 
                                                logger=logger,
-                                               debug=debug)
+                                               debug=debug,
+                                               prefetch=prefetch,
+                                               minUsableFraction=\
+                                                   minUsableFraction,
+                                               validRegion=validRegion,
+                                               numWorkers=numWorkers,
+                                               useProcesses=useProcesses)
+
+        self._ruleTable = RuleTable(SimpleClassifier.PREDICATES,
+                                    SimpleClassifier.RULES,
+                                    SimpleClassifier.THRESHOLDS,
+                                    Classifier.NO_DATA)
+
+        if thresholds:
+
+            self._ruleTable.setThresholds(thresholds)
+
+            if self._logger:
+
+                self._logger.info('Thresholds: ' +
+                                  str(self._ruleTable.getThresholds()))
+
+        # ---
+        # With jit, each day is masked and classified by the compiled fused
+        # kernel, if Numba is installed.  The NumPy path remains the
+        # reference, and is used for debugging, which writes the
+        # intermediate images.
+        # ---
+        self._encodedRules: tuple = None
+
+        if jit and not FusedDailyKernel.isAvailable():
+
+            if self._logger:
+
+                self._logger.warning('Numba is not installed.  Using the ' +
+                                     'NumPy classifier.')
+
+        elif jit:
+
+            self._encodedRules = \
+                self._ruleTable.encode(FusedDailyKernel.SIMPLE_INPUTS)
 
     # -------------------------------------------------------------------------
     # getClassifierName
@@ -48,22 +166,57 @@ class SimpleClassifier(Classifier):
     def getClassifierName(self):
         return SimpleClassifier.CLASSIFIER_NAME
 
+    # -------------------------------------------------------------------------
+    # _maskClassify
+    # -------------------------------------------------------------------------
+    def _maskClassify(self, bandDict, outName, frame=None):
+
+        inBands = [bandDict[BandReader.SR1],
+                   bandDict[BandReader.SR2],
+                   bandDict[BandReader.SR3],
+                   bandDict[BandReader.SR5],
+                   bandDict[BandReader.SR7],
+                   bandDict[BandReader.SOLZ]]
+
+        useKernel = self._encodedRules is not None and \
+            not self._debug and \
+            self._npDt == np.int16 and \
+            all([band.dtype == np.int16 for band in inBands])
+
+        if not useKernel:
+
+            return super(SimpleClassifier, self)._maskClassify(bandDict,
+                                                               outName,
+                                                               frame)
+
+        if self._logger:
+            self._logger.info('Masking and classifying with the fused kernel')
+
+        frame = frame or BufferPool.Frame()
+
+        finalImage = frame.get('finalImage',
+                               bandDict[BandReader.SR1].shape,
+                               self._npDt)
+
+        FusedDailyKernel.runSimple(*inBands,
+                                   bandDict[BandReader.STATE],
+                                   MaskGenerator.GENERAL_STATE_LUT,
+                                   MaskGenerator.LAND_STATE_LUT,
+                                   self._encodedRules,
+                                   self._ruleTable.getDefault(),
+                                   Classifier.LAND,
+                                   Classifier.BAD_DATA,
+                                   self._badData,
+                                   finalImage)
+
+        return finalImage
+
     # -------------------------------------------------------------------------
     # _runOneSensorOneDay
     # -------------------------------------------------------------------------
     def _runOneSensorOneDay(self, bandDict, outName):
 
-        # Mark requested this currently unused variable to be defined.
-        red = bandDict[BandReader.SR1]
-        
-        # Name the arrays as named in water_change.c
-        nir = bandDict[BandReader.SR2]
-        blue = bandDict[BandReader.SR3]
-        swir5 = bandDict[BandReader.SR5]
-        swir7 = bandDict[BandReader.SR7]
-
         # ---
-        # Add NDVI to bandDict.
         # NDVI is normally calculated with range -1,1. This multiplies
         # that range by 10,000 making it an integer-friendly range.
         # The NDVI conditions listed in water_change.c are multiplied
@@ -72,43 +225,17 @@ class SimpleClassifier(Classifier):
         ndvi = self.computeNdvi(bandDict[BandReader.SR1],
                                 bandDict[BandReader.SR2])
                                 
-        ndviBadCalculation = (bandDict[BandReader.SR1] +
-                              bandDict[BandReader.SR2]) == 0
-
-        # ---
-        # Define the rules as masks.
-        # ---
-        subcondition1 = (swir5 >= 453) & (blue < 675) & (nir > 1000)
-        land1 = (swir5 < 1017) & (swir7 < 773) & subcondition1
-        water1 = (swir5 < 1017) & (swir7 < 773) & ~subcondition1
-
-        water2 = (swir5 >= 1017) & (nir < 1777) & (ndvi < 825) & \
-                 (blue < 651)
-
-        land2 = (swir5 >= 1017) & (nir < 1777) & (ndvi < 825) & \
-            (blue >= 651)
-
-        land3 = (swir5 >= 1017) & (nir < 1777) & (ndvi >= 825) & \
-                (ndvi < 4125) & (nir >= 1329) & (swir7 < 1950)
-
-        land4 = (swir5 >= 1017) & (nir < 1777) & (ndvi >= 825) & \
-                (ndvi >= 4125)
-
-        land5 = (swir5 >= 1017) & (nir >= 1777)
-        
-        waterConditions = water1 | water2
-        landConditions = land1 | land2 | land3 | land4 | land5
+        # Name the arrays as named in water_change.c
+        inputs = {'nir': bandDict[BandReader.SR2],
+                  'blue': bandDict[BandReader.SR3],
+                  'swir5': bandDict[BandReader.SR5],
+                  'swir7': bandDict[BandReader.SR7],
+                  'ndvi': ndvi,
+                  'redPlusNir': bandDict[BandReader.SR1] +
+                                bandDict[BandReader.SR2]}
 
         # Apply the model.
-        predictions = np.full((self._bandReader.getCols(), 
-                               self._bandReader.getRows()), 
-                               Classifier.NO_DATA)
-                               
-        predictions[waterConditions] = Classifier.WATER  # 1
-        predictions[landConditions] = Classifier.LAND    # 0
-        
-        predictions = np.where(ndviBadCalculation,
-                               Classifier.NO_DATA,
-                               predictions)
-
-        return predictions
+        predictions = np.empty(bandDict[BandReader.SR1].shape,
+                               dtype=np.int16)
+
+        return self._ruleTable.apply(inputs, predictions)
@@ -0,0 +1,179 @@
+import numpy as np
+
+from modis_water.model.BandCube import BandCube
+
+
+# -----------------------------------------------------------------------------
+# class ValidRegion
+#
+# Edge tiles of the sinusoidal grid are mostly outside the projection.  The
+# post-processing mask marks those pixels with both the ancillary no-data bit
+# and the out-of-projection bit.  ValidRegion is the bounding window of the
+# other pixels.  Stages compute inside the window only, then expand their
+# results to the full tile, filling the rest with their no-data value.
+#
+# Every pixel outside the window is one QAMap writes as out of projection, so
+# the final products do not change.
+# -----------------------------------------------------------------------------
+class ValidRegion(object):
+
+    # The bits, as in QAMap and PostProcessingGenerator
+    ANC_NODATA_BIT_MASK: int = 64  # 0b1000000
+    OOP_BIT_MASK: int = 32768  # 0b1000000000000000
+    OUTSIDE_BIT_MASK: int = ANC_NODATA_BIT_MASK | OOP_BIT_MASK
+
+    # -------------------------------------------------------------------------
+    # __init__
+    #
+    # The window is rows [rowStart, rowEnd) and columns [colStart, colEnd) of
+    # a tile of the given rows and columns.
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 rowStart: int,
+                 rowEnd: int,
+                 colStart: int,
+                 colEnd: int,
+                 rows: int,
+                 cols: int):
+
+        if not (0 <= rowStart <= rowEnd <= rows and
+                0 <= colStart <= colEnd <= cols):
+
+            raise RuntimeError('Invalid window, rows ' + str(rowStart) +
+                               ' - ' + str(rowEnd) + ' and columns ' +
+                               str(colStart) + ' - ' + str(colEnd) +
+                               ', for a tile of ' + str(rows) + ' x ' +
+                               str(cols))
+
+        self._rowStart: int = rowStart
+        self._rowEnd: int = rowEnd
+        self._colStart: int = colStart
+        self._colEnd: int = colEnd
+        self._rows: int = rows
+        self._cols: int = cols
+
+    # -------------------------------------------------------------------------
+    # __str__
+    # -------------------------------------------------------------------------
+    def __str__(self) -> str:
+
+        return 'rows ' + str(self._rowStart) + ' - ' + \
+            str(self._rowEnd) + ', columns ' + str(self._colStart) + \
+            ' - ' + str(self._colEnd) + ' of ' + str(self._rows) + ' x ' + \
+            str(self._cols) + ', ' + \
+            '{:.2%}'.format(self.getFraction()) + ' of the tile'
+
+    # -------------------------------------------------------------------------
+    # crop
+    #
+    # Returns a view of the window of a full-tile array.
+    # -------------------------------------------------------------------------
+    def crop(self, array: np.ndarray) -> np.ndarray:
+
+        if array.shape[-2:] != (self._rows, self._cols):
+
+            raise RuntimeError('Unable to crop an array of ' +
+                               str(array.shape) + ' to a window of a ' +
+                               str(self._rows) + ' x ' + str(self._cols) +
+                               ' tile.')
+
+        return array[..., self._rowStart:self._rowEnd,
+                     self._colStart:self._colEnd]
+
+    # -------------------------------------------------------------------------
+    # cropBands
+    # -------------------------------------------------------------------------
+    def cropBands(self, bandDict: dict) -> dict:
+
+        if isinstance(bandDict, BandCube):
+            return bandDict.window(self.crop(bandDict.getBlock()))
+
+        return {band: self.crop(array) for band, array in bandDict.items()}
+
+    # -------------------------------------------------------------------------
+    # expand
+    #
+    # Returns a full-tile array of the window array's type, holding the
+    # window array inside the window and fill outside it.  The result is
+    # written into out, if given.
+    # -------------------------------------------------------------------------
+    def expand(self,
+               array: np.ndarray,
+               fill: int,
+               out: np.ndarray = None) -> np.ndarray:
+
+        full = out
+
+        if full is None:
+            full = np.empty((self._rows, self._cols), dtype=array.dtype)
+
+        full.fill(fill)
+        self.crop(full)[...] = array
+
+        return full
+
+    # -------------------------------------------------------------------------
+    # fromPostProcessingMask
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def fromPostProcessingMask(postProcessingMask: np.ndarray):
+
+        outsideBits = ValidRegion.OUTSIDE_BIT_MASK
+
+        valid = (postProcessingMask & outsideBits) != outsideBits
+        rows, cols = valid.shape
+        validRows = np.flatnonzero(valid.any(axis=1))
+        validCols = np.flatnonzero(valid.any(axis=0))
+
+        if validRows.size == 0:
+            return ValidRegion(0, 0, 0, 0, rows, cols)
+
+        return ValidRegion(int(validRows[0]),
+                           int(validRows[-1]) + 1,
+                           int(validCols[0]),
+                           int(validCols[-1]) + 1,
+                           rows,
+                           cols)
+
+    # -------------------------------------------------------------------------
+    # getFraction
+    # -------------------------------------------------------------------------
+    def getFraction(self) -> float:
+
+        numPixels = self._rows * self._cols
+
+        return self.getSize() / numPixels if numPixels else 0.0
+
+    # -------------------------------------------------------------------------
+    # getShape
+    # -------------------------------------------------------------------------
+    def getShape(self) -> tuple:
+
+        return (self._rowEnd - self._rowStart, self._colEnd - self._colStart)
+
+    # -------------------------------------------------------------------------
+    # getSize
+    # -------------------------------------------------------------------------
+    def getSize(self) -> int:
+
+        rows, cols = self.getShape()
+
+        return rows * cols
+
+    # -------------------------------------------------------------------------
+    # getTileShape
+    #
+    # Returns the (rows, cols) of the tile the window is in.
+    # -------------------------------------------------------------------------
+    def getTileShape(self) -> tuple:
+
+        return (self._rows, self._cols)
+
+    # -------------------------------------------------------------------------
+    # getWindow
+    #
+    # Returns (rowStart, rowEnd, colStart, colEnd).
+    # -------------------------------------------------------------------------
+    def getWindow(self) -> tuple:
+
+        return (self._rowStart, self._rowEnd, self._colStart, self._colEnd)
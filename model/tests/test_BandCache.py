@@ -0,0 +1,137 @@
+import os
+from pathlib import Path
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from modis_water.model.BandCache import BandCache
+
+
+# -----------------------------------------------------------------------------
+# class BandCacheTestCase
+#
+# python -m unittest modis_water.model.tests.test_BandCache
+# -----------------------------------------------------------------------------
+class BandCacheTestCase(unittest.TestCase):
+
+    XFORM = (-11119505.197665, 231.656358, 0.0, 4447802.079066, 0.0,
+             -231.656358)
+
+    # -------------------------------------------------------------------------
+    # setUp
+    # -------------------------------------------------------------------------
+    def setUp(self):
+
+        self._tmp = tempfile.TemporaryDirectory()
+        self._cacheDir = Path(self._tmp.name) / 'cache'
+        self._cacheDir.mkdir()
+        self._granule = Path(self._tmp.name) / 'MOD09GA.A2003161.h09v05.hdf'
+        self._granule.write_bytes(b'granule')
+
+    # -------------------------------------------------------------------------
+    # tearDown
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    # -------------------------------------------------------------------------
+    # testInit
+    # -------------------------------------------------------------------------
+    def testInit(self):
+
+        with self.assertRaises(RuntimeError):
+            BandCache(Path(self._tmp.name) / 'missing')
+
+    # -------------------------------------------------------------------------
+    # testPutGet
+    # -------------------------------------------------------------------------
+    def testPutGet(self):
+
+        cache = BandCache(self._cacheDir)
+        band = np.arange(16, dtype=np.int16).reshape(4, 4)
+
+        self.assertIsNone(cache.get(self._granule, 'sur_refl_b01_1'))
+
+        cache.put(self._granule, 'sur_refl_b01_1', band,
+                  BandCacheTestCase.XFORM, 'proj')
+
+        array, xform, proj = cache.get(self._granule, 'sur_refl_b01_1')
+
+        self.assertIsInstance(array, np.memmap)
+        self.assertEqual(array.dtype, band.dtype)
+        self.assertTrue(np.array_equal(array, band))
+        self.assertEqual(xform, BandCacheTestCase.XFORM)
+        self.assertEqual(proj, 'proj')
+
+        # Writing to a loaded array does not change the entry.
+        array[0, 0] = 99
+        array, xform, proj = cache.get(self._granule, 'sur_refl_b01_1')
+        self.assertEqual(array[0, 0], 0)
+
+        # The size read and the band are part of the key.
+        self.assertIsNone(cache.get(self._granule, 'sur_refl_b01_1', 8, 8))
+        self.assertIsNone(cache.get(self._granule, 'sur_refl_b02_1'))
+
+        # A modified granule is not served from the cache.
+        stat = self._granule.stat()
+        os.utime(self._granule, ns=(stat.st_atime_ns,
+                                    stat.st_mtime_ns + 1000000000))
+
+        self.assertIsNone(cache.get(self._granule, 'sur_refl_b01_1'))
+
+    # -------------------------------------------------------------------------
+    # testEviction
+    # -------------------------------------------------------------------------
+    def testEviction(self):
+
+        band = np.zeros((32, 32), dtype=np.int16)
+        entryBytes = band.nbytes + 128
+        cache = BandCache(self._cacheDir, maxBytes=int(entryBytes * 2.5))
+
+        cache.put(self._granule, 'b1', band, None, '')
+        cache.put(self._granule, 'b2', band, None, '')
+
+        # Using b1 makes b2 the least recently used.
+        for arrayPath in self._cacheDir.glob('*.npy'):
+            os.utime(arrayPath, ns=(0, 0))
+
+        cache.get(self._granule, 'b1')
+
+        cache.put(self._granule, 'b3', band, None, '')
+
+        self.assertEqual(len(list(self._cacheDir.glob('*.npy'))), 2)
+        self.assertIsNotNone(cache.get(self._granule, 'b1'))
+        self.assertIsNotNone(cache.get(self._granule, 'b3'))
+
+    # -------------------------------------------------------------------------
+    # testScan
+    # -------------------------------------------------------------------------
+    def testScan(self):
+
+        band = np.zeros((32, 32), dtype=np.int16)
+        entryBytes = band.nbytes + 128
+        cache = BandCache(self._cacheDir, maxBytes=int(entryBytes * 2.5))
+
+        # ---
+        # The directory is scanned once, at construction, while the entries
+        # fit, and again to evict.
+        # ---
+        with patch.object(BandCache, '_scan', autospec=True,
+                          side_effect=BandCache._scan) as scan:
+
+            cache.put(self._granule, 'b1', band, None, '')
+            cache.put(self._granule, 'b2', band, None, '')
+            cache.get(self._granule, 'b1')
+            self.assertEqual(scan.call_count, 0)
+
+            cache.put(self._granule, 'b3', band, None, '')
+            self.assertEqual(scan.call_count, 1)
+
+        self.assertEqual(len(list(self._cacheDir.glob('*.npy'))), 2)
+
+        # A new cache is seeded with the entries already there.
+        other = BandCache(self._cacheDir, maxBytes=int(entryBytes * 2.5))
+        self.assertEqual(len(other._entries), 2)
+        self.assertEqual(other._totalBytes, cache._totalBytes)
@@ -0,0 +1,104 @@
+import unittest
+
+import numpy as np
+
+from modis_water.model.BandCube import BandCube
+from modis_water.model.BandReader import BandReader
+from modis_water.model.ValidRegion import ValidRegion
+
+
+# -----------------------------------------------------------------------------
+# class BandCubeTestCase
+#
+# python -m unittest modis_water.model.tests.test_BandCube
+# -----------------------------------------------------------------------------
+class BandCubeTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testInit
+    # -------------------------------------------------------------------------
+    def testInit(self):
+
+        with self.assertRaises(RuntimeError):
+            BandCube([BandReader.SR1, BandReader.SR1], (4, 6))
+
+        with self.assertRaises(RuntimeError):
+            BandCube([BandReader.SR1])
+
+        with self.assertRaises(RuntimeError):
+
+            BandCube([BandReader.SR1, BandReader.SR2],
+                     block=np.zeros((2, 4, 6), dtype=np.float32))
+
+        with self.assertRaises(RuntimeError):
+
+            BandCube([BandReader.SR1],
+                     block=np.zeros((2, 4, 6), dtype=np.int16))
+
+        cube = BandCube([BandReader.SR2, BandReader.SR1], (4, 6))
+        self.assertEqual(cube.getBandNames(), [BandReader.SR2,
+                                               BandReader.SR1])
+        self.assertEqual(list(cube), cube.getBandNames())
+        self.assertEqual(len(cube), 2)
+        self.assertEqual(cube.getIndex(BandReader.SR1), 1)
+        self.assertEqual(cube.getShape(), (4, 6))
+        self.assertEqual(cube.nbytes, 96)
+
+    # -------------------------------------------------------------------------
+    # testViews
+    # -------------------------------------------------------------------------
+    def testViews(self):
+
+        bands = [BandReader.SR1, BandReader.SR2, BandReader.STATE]
+        cube = BandCube(bands, (4, 6))
+        sr1 = np.arange(24, dtype=np.int16).reshape(4, 6)
+        state = np.full((4, 6), 65535, dtype=np.uint16)
+
+        cube.setBand(BandReader.SR1, sr1)
+        cube.setBand(BandReader.STATE, state)
+        cube[BandReader.SR2][...] = -sr1
+
+        # Bands are views of the block, each of its own type.
+        block = cube.getBlock()
+        self.assertTrue(np.shares_memory(cube[BandReader.SR1], block))
+        self.assertEqual(cube[BandReader.STATE].dtype, np.uint16)
+        np.testing.assert_array_equal(cube[BandReader.STATE], state)
+        np.testing.assert_array_equal(block[2], -1)
+
+        # The feature matrix is a (pixels, bands) view.
+        features = cube.getFeatureMatrix()
+        self.assertEqual(features.shape, (24, 3))
+        self.assertTrue(np.shares_memory(features, block))
+        np.testing.assert_array_equal(features[:, 0], sr1.ravel())
+        np.testing.assert_array_equal(features[:, 1], -sr1.ravel())
+
+        # A window shares the block.
+        region = ValidRegion(1, 3, 2, 5, 4, 6)
+        window = region.cropBands(cube)
+        self.assertIsInstance(window, BandCube)
+        self.assertEqual(window.getShape(), (2, 3))
+        self.assertEqual(window[BandReader.STATE].dtype, np.uint16)
+        np.testing.assert_array_equal(window[BandReader.SR1],
+                                      region.crop(sr1))
+
+        with self.assertRaises(RuntimeError):
+            cube.setBand(BandReader.SR1, np.zeros((4, 6)))
+
+        with self.assertRaises(RuntimeError):
+            cube.setBand(BandReader.SR1, np.zeros((2, 6), dtype=np.int16))
+
+    # -------------------------------------------------------------------------
+    # testCompress
+    # -------------------------------------------------------------------------
+    def testCompress(self):
+
+        sr1 = np.arange(24, dtype=np.int16).reshape(4, 6)
+        good = sr1 % 5 == 0
+        numGood = int(good.sum())
+
+        block = np.zeros((2, 24), dtype=np.int16)[:, :numGood]
+        compact = BandCube([BandReader.SR1, 'ndvi'], block=block)
+        compact.setBand(BandReader.SR1, sr1, good)
+
+        np.testing.assert_array_equal(compact[BandReader.SR1], sr1[good])
+        self.assertEqual(compact.getFeatureMatrix().shape, (numGood, 2))
@@ -0,0 +1,43 @@
+import unittest
+
+from modis_water.model.BandPlanner import BandPlanner
+from modis_water.model.BandReader import BandReader
+from modis_water.model.MaskGenerator import MaskGenerator
+
+
+# -----------------------------------------------------------------------------
+# class BandPlannerTestCase
+#
+# python -m unittest modis_water.model.tests.test_BandPlanner
+# -----------------------------------------------------------------------------
+class BandPlannerTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testGetBands
+    # -------------------------------------------------------------------------
+    def testGetBands(self):
+
+        planner = BandPlanner()
+
+        planner.addStage('simple', [BandReader.SR1, BandReader.SR2,
+                                    BandReader.SR3, BandReader.SR5,
+                                    BandReader.SR7])
+
+        planner.addStage('mask', MaskGenerator.REQUIRED_BANDS)
+
+        self.assertEqual(planner.getBands(),
+                         set([BandReader.SR1, BandReader.SR2, BandReader.SR3,
+                              BandReader.SR5, BandReader.SR7, BandReader.SOLZ,
+                              BandReader.STATE]))
+
+        self.assertEqual(planner.getSkippedBands(),
+                         set([BandReader.SENZ, BandReader.SR4,
+                              BandReader.SR6]))
+
+    # -------------------------------------------------------------------------
+    # testInvalidBand
+    # -------------------------------------------------------------------------
+    def testInvalidBand(self):
+
+        with self.assertRaises(RuntimeError):
+            BandPlanner().addStage('simple', [BandReader.SR1, 'sur_refl_b99'])
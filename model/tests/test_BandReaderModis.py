@@ -1,8 +1,13 @@
 import logging
 from pathlib import Path
 import sys
+import tempfile
 import unittest
 
+import numpy as np
+
+from osgeo import gdal
+
 from modis_water.model.BandReader import BandReader
 from modis_water.model.BandReaderModis import BandReaderModis
 
@@ -50,3 +55,143 @@ class BandReaderModisTestCase(unittest.TestCase):
         # ---
         self.assertEqual(bandDict[BandReader.SENZ][2112][2112], 1570)
         self.assertEqual(bandDict[BandReader.SR1][2112][2112], 784)
+
+    # -------------------------------------------------------------------------
+    # testReadFilesThreaded
+    # -------------------------------------------------------------------------
+    def testReadFilesThreaded(self):
+
+        bands = [BandReader.SENZ, BandReader.SOLZ, BandReader.SR1,
+                 BandReader.SR2, BandReader.STATE]
+
+        br = BandReaderModis(Path('/css/modis/Collection6.1/L2G'), logger)
+        br.setBands(bands)
+        bandDict = br.read(BandReaderModis.MOD, 2003, 161, 'h09v05')
+
+        brThreaded = BandReaderModis(Path('/css/modis/Collection6.1/L2G'),
+                                     logger,
+                                     numThreads=4)
+
+        brThreaded.setBands(bands)
+
+        threadedDict = \
+            brThreaded.read(BandReaderModis.MOD, 2003, 161, 'h09v05')
+
+        self.assertEqual(bandDict.keys(), threadedDict.keys())
+        self.assertEqual(br.getXform(), brThreaded.getXform())
+        self.assertEqual(br.getProj(), brThreaded.getProj())
+
+        for band in bands:
+            self.assertTrue((bandDict[band] == threadedDict[band]).all())
+
+    # -------------------------------------------------------------------------
+    # testUpsample
+    # -------------------------------------------------------------------------
+    def testUpsample(self):
+
+        native = np.arange(12, dtype=np.int16).reshape(3, 4)
+        upsampled = BandReader.upsample(native, 16, 12)
+        expected = np.repeat(np.repeat(native, 4, axis=0), 4, axis=1)
+
+        self.assertEqual(upsampled.dtype, native.dtype)
+        self.assertTrue(np.array_equal(upsampled, expected))
+        self.assertIs(BandReader.upsample(native, 4, 3), native)
+
+        with self.assertRaises(RuntimeError):
+            BandReader.upsample(native, 10, 12)
+
+    # -------------------------------------------------------------------------
+    # testNativeResolution
+    #
+    # Native-resolution decoding followed by upsampling must be bit-identical
+    # to having GDAL resample each band during the decode.
+    # -------------------------------------------------------------------------
+    def testNativeResolution(self):
+
+        baseDir = Path('/css/modis/Collection6.1/L2G')
+        br = BandReaderModis(baseDir, logger)
+        br.setBands(BandReader.ALL_BANDS)
+        bandDict = br.read(BandReaderModis.MOD, 2003, 161, 'h09v05')
+
+        for band in BandReader.ALL_BANDS:
+
+            product = 'GQ' if band in BandReaderModis.GQ_BANDS else 'GA'
+
+            hdfFile = next((baseDir / ('MOD09' + product) / '2003').
+                           glob('*' + product + '.A2003161.h09v05*.hdf'))
+
+            subDataSet = 'HDF4_EOS:EOS_GRID:"' + str(hdfFile) + '":' + \
+                         BandReaderModis._getFullBandNames()[band]
+
+            resampled = gdal.Open(subDataSet).ReadAsArray(0, 0, None, None,
+                                                          None,
+                                                          br.getCols(),
+                                                          br.getRows())
+
+            self.assertEqual(bandDict[band].dtype, resampled.dtype)
+            self.assertTrue(np.array_equal(bandDict[band], resampled))
+
+        # Native reads return each band at its stored size.
+        br.setNativeResolution(True)
+        nativeDict = br.read(BandReaderModis.MOD, 2003, 161, 'h09v05')
+        self.assertEqual(nativeDict[BandReader.SR1].shape, (4800, 4800))
+        self.assertEqual(nativeDict[BandReader.SR3].shape, (2400, 2400))
+        self.assertEqual(nativeDict[BandReader.STATE].shape, (1200, 1200))
+
+    # -------------------------------------------------------------------------
+    # testSelectGranule
+    # -------------------------------------------------------------------------
+    def testSelectGranule(self):
+
+        older = Path('MOD09GA.A2003161.h09v05.061.2020094170809.hdf')
+        newer = Path('MOD09GA.A2003161.h09v05.061.2021001000000.hdf')
+        nextDay = Path('MOD09GA.A2003162.h09v05.061.2020094170809.hdf')
+
+        br = BandReaderModis(Path(tempfile.gettempdir()), logger)
+
+        self.assertEqual(br._selectGranule([newer, older, nextDay]),
+                         [newer, nextDay])
+
+        self.assertEqual(br._selectGranule([older, newer]), [newer])
+
+        br = BandReaderModis(Path(tempfile.gettempdir()),
+                             logger,
+                             granulePolicy=BandReaderModis.EARLIEST)
+
+        self.assertEqual(br._selectGranule([newer, older]), [older])
+
+        with self.assertRaises(RuntimeError):
+
+            BandReaderModis(Path(tempfile.gettempdir()),
+                            logger,
+                            granulePolicy='newest')
+
+    # -------------------------------------------------------------------------
+    # testPyhdfBackend
+    #
+    # The pyhdf backend must return the same arrays as the GDAL backend.
+    # -------------------------------------------------------------------------
+    def testPyhdfBackend(self):
+
+        baseDir = Path('/css/modis/Collection6.1/L2G')
+        br = BandReaderModis(baseDir, logger)
+        br.setBands(BandReader.ALL_BANDS)
+        bandDict = br.read(BandReaderModis.MOD, 2003, 161, 'h09v05')
+
+        brPyhdf = BandReaderModis(baseDir,
+                                  logger,
+                                  backend=BandReaderModis.PYHDF)
+
+        brPyhdf.setBands(BandReader.ALL_BANDS)
+        pyhdfDict = brPyhdf.read(BandReaderModis.MOD, 2003, 161, 'h09v05')
+
+        for band in BandReader.ALL_BANDS:
+
+            self.assertEqual(bandDict[band].dtype, pyhdfDict[band].dtype)
+            self.assertTrue(np.array_equal(bandDict[band], pyhdfDict[band]))
+
+        for gdalValue, pyhdfValue in zip(br.getXform(), brPyhdf.getXform()):
+            self.assertAlmostEqual(gdalValue, pyhdfValue, places=4)
+
+        with self.assertRaises(RuntimeError):
+            BandReaderModis(baseDir, logger, backend='netcdf')
@@ -4,6 +4,7 @@ import sys
 import unittest
 
 import numpy as np
+from osgeo import gdal
 
 from modis_water.model.BandReader import BandReader
 from modis_water.model.BandReaderViirs import BandReaderViirs
@@ -104,6 +105,49 @@ class BandReaderViirsTestCase(unittest.TestCase):
         
         return True
 
+    # -------------------------------------------------------------------------
+    # testNativeResolution
+    #
+    # Bands decoded at their stored size and upsampled must match GDAL's
+    # nearest-neighbour resampling to 2400 x 2400.
+    # -------------------------------------------------------------------------
+    def testNativeResolution(self):
+
+        br = BandReaderViirs(Path('/explore/nobackup/projects/ilab/data/' +
+                                  'MODIS/compare_MODIS_VIIRS'),
+                             logger)
+
+        br.setBands(BandReader.ALL_BANDS)
+        bandDict = br.read(BandReaderViirs.VNP, 2020, 161, 'h09v05')
+        hdfFile = br._findHdfFiles(BandReaderViirs.VNP, 2020, 161, 'h09v05')[0]
+        fullNames = BandReaderViirs._getFullBandNames()
+
+        for band in BandReader.ALL_BANDS - set([BandReader.STATE]):
+
+            subDataSet = 'HDF5:"' + str(hdfFile) + '":' + fullNames[band]
+
+            resampled = gdal.Open(subDataSet).ReadAsArray(0, 0, None, None,
+                                                          None,
+                                                          br.getCols(),
+                                                          br.getRows())
+
+            self.assertEqual(bandDict[band].dtype, resampled.dtype)
+            self.assertTrue(np.array_equal(bandDict[band], resampled))
+
+        self.assertEqual(bandDict[BandReader.STATE].dtype, np.uint16)
+        self.assertEqual(bandDict[BandReader.STATE].shape, (2400, 2400))
+
+        # Native reads return each band at its stored size.
+        br.setNativeResolution(True)
+        nativeDict = br.read(BandReaderViirs.VNP, 2020, 161, 'h09v05')
+        self.assertEqual(nativeDict[BandReader.SR1].shape, (2400, 2400))
+        self.assertEqual(nativeDict[BandReader.SR3].shape, (1200, 1200))
+        self.assertEqual(nativeDict[BandReader.STATE].shape, (1200, 1200))
+
+        self.assertTrue(np.array_equal(
+            BandReader.upsample(nativeDict[BandReader.STATE], 2400, 2400),
+            bandDict[BandReader.STATE]))
+
     # -------------------------------------------------------------------------
     # validateOneStateComponent
     # -------------------------------------------------------------------------
@@ -151,4 +195,35 @@ class BandReaderViirsTestCase(unittest.TestCase):
                                         stateVal, 
                                         BandReaderViirs.VIIRS_AERO_MASK,
                                         MaskGenerator.AERO_MASK)
-        
\ No newline at end of file
+        
+    # -------------------------------------------------------------------------
+    # testH5pyBackend
+    #
+    # The h5py backend must return the same arrays as the GDAL backend.
+    # -------------------------------------------------------------------------
+    def testH5pyBackend(self):
+
+        baseDir = Path('/explore/nobackup/projects/ilab/data/' +
+                       'MODIS/compare_MODIS_VIIRS')
+
+        br = BandReaderViirs(baseDir, logger)
+        br.setBands(BandReader.ALL_BANDS)
+        bandDict = br.read(BandReaderViirs.VNP, 2020, 161, 'h09v05')
+
+        brH5py = BandReaderViirs(baseDir,
+                                 logger,
+                                 backend=BandReaderViirs.H5PY)
+
+        brH5py.setBands(BandReader.ALL_BANDS)
+        h5pyDict = brH5py.read(BandReaderViirs.VNP, 2020, 161, 'h09v05')
+
+        for band in BandReader.ALL_BANDS:
+
+            self.assertEqual(bandDict[band].dtype, h5pyDict[band].dtype)
+            self.assertTrue(np.array_equal(bandDict[band], h5pyDict[band]))
+
+        for gdalValue, h5pyValue in zip(br.getXform(), brH5py.getXform()):
+            self.assertAlmostEqual(gdalValue, h5pyValue, places=4)
+
+        with self.assertRaises(RuntimeError):
+            BandReaderViirs(baseDir, logger, backend='netcdf')
@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+from modis_water.model.BufferPool import BufferPool
+
+
+# -----------------------------------------------------------------------------
+# class BufferPoolTestCase
+#
+# python -m unittest modis_water.model.tests.test_BufferPool
+# -----------------------------------------------------------------------------
+class BufferPoolTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testAcquireRelease
+    # -------------------------------------------------------------------------
+    def testAcquireRelease(self):
+
+        with self.assertRaises(RuntimeError):
+            BufferPool(0)
+
+        pool = BufferPool(2)
+        self.assertEqual(pool.getNumFrames(), 2)
+
+        frame1 = pool.acquire()
+        frame2 = pool.acquire()
+        self.assertIsNot(frame1, frame2)
+
+        # No free frames
+        self.assertIsNone(pool.acquire(timeout=0.01))
+
+        pool.release(frame1)
+        self.assertIs(pool.acquire(timeout=0.01), frame1)
+
+    # -------------------------------------------------------------------------
+    # testFrame
+    # -------------------------------------------------------------------------
+    def testFrame(self):
+
+        frame = BufferPool.Frame()
+        self.assertIsNone(frame.find('a'))
+
+        a = frame.get('a', (4, 6), np.int16)
+        self.assertEqual(a.shape, (4, 6))
+        self.assertEqual(a.dtype, np.int16)
+        self.assertEqual(frame.getBytes(), 48)
+
+        # The same shape and type reuse the array.
+        self.assertIs(frame.get('a', (4, 6), np.int16), a)
+        self.assertIs(frame.find('a'), a)
+
+        # Others reallocate it.
+        b = frame.get('a', (4, 6), np.uint8)
+        self.assertIsNot(b, a)
+        self.assertEqual(b.dtype, np.uint8)
+        self.assertIsNot(frame.get('a', (2, 6), np.uint8), b)
+
+        c = np.zeros(3)
+        frame.keep('c', c)
+        self.assertIs(frame.find('c'), c)
@@ -0,0 +1,268 @@
+import queue
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from modis_water.model.BandReader import BandReader
+from modis_water.model.BufferPool import BufferPool
+from modis_water.model.Classifier import Classifier
+from modis_water.model.MaskGenerator import MaskGenerator
+
+
+# -----------------------------------------------------------------------------
+# class FakeBandReader
+#
+# Random bands of a small tile, recording the days read.  Reading a day in
+# failDays raises an error.
+# -----------------------------------------------------------------------------
+class FakeBandReader(object):
+
+    SIZE = 20
+
+    def __init__(self):
+
+        rng = np.random.default_rng(0)
+        shape = (FakeBandReader.SIZE, FakeBandReader.SIZE)
+
+        self.days = {day: {band: rng.integers(-200, 5000, shape)
+                           .astype(np.int16)
+                           for band in BandReader.ALL_BANDS}
+                     for day in range(1, 6)}
+
+        self.daysRead = []
+        self.failDays = set()
+
+    def getCols(self):
+        return FakeBandReader.SIZE
+
+    def getRows(self):
+        return FakeBandReader.SIZE
+
+    def readDay(self,
+                sensor,
+                year,
+                day,
+                tile,
+                bands=None,
+                frame=None,
+                window=None):
+
+        self.daysRead.append(day)
+
+        if day in self.failDays:
+            raise RuntimeError('Unable to read day ' + str(day))
+
+        bands = self.bands if bands is None else bands
+        rowStart, rowEnd, colStart, colEnd = window or (None,) * 4
+
+        return {band: self.days[day][band][rowStart:rowEnd, colStart:colEnd]
+                for band in bands}, None, None
+
+    def sensors(self):
+        return set(['MOD'])
+
+    def setBands(self, bands):
+        self.bands = set(bands)
+
+
+# -----------------------------------------------------------------------------
+# class PixelClassifier
+#
+# Classifies each pixel from its own values, so classifying any subset of
+# the pixels gives the same classes as classifying the whole tile.
+# -----------------------------------------------------------------------------
+class PixelClassifier(Classifier):
+
+    def __init__(self, br, outDir, **kwargs):
+
+        super(PixelClassifier, self).__init__(br,
+                                              2003,
+                                              'h09v05',
+                                              outDir,
+                                              [BandReader.SR1,
+                                               BandReader.SR2],
+                                              set(['MOD']),
+                                              **kwargs)
+
+    def getClassifierName(self):
+        return 'Pixel'
+
+    def _runOneSensorOneDay(self, bandDict, outName):
+
+        return np.where(bandDict[BandReader.SR1] > bandDict[BandReader.SR2],
+                        Classifier.WATER,
+                        Classifier.LAND).astype(np.int16)
+
+
+# -----------------------------------------------------------------------------
+# class ClassifierTestCase
+#
+# python -m unittest modis_water.model.tests.test_Classifier
+# -----------------------------------------------------------------------------
+class ClassifierTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testClassifyGoodPixels
+    # -------------------------------------------------------------------------
+    def testClassifyGoodPixels(self):
+
+        br = FakeBandReader()
+        rng = np.random.default_rng(1)
+        shape = (FakeBandReader.SIZE, FakeBandReader.SIZE)
+
+        with tempfile.TemporaryDirectory() as outDir:
+
+            classifier = PixelClassifier(br, outDir)
+
+            # ---
+            # The frame is reused from day to day, as in a run, so a day's
+            # predictions cannot be left over from the previous day's.
+            # ---
+            frame = BufferPool.Frame()
+
+            for day, goodFraction in ((1, 0.5), (2, 0.9), (3, 0.0)):
+
+                bandDict = br.days[day]
+
+                generalMask = np.where(rng.random(shape) < goodFraction,
+                                       MaskGenerator.GOOD_DATA,
+                                       MaskGenerator.BAD_DATA) \
+                    .astype(np.uint8)
+
+                wholeTile = classifier._runOneSensorOneDay(bandDict, 'out')
+
+                expected = np.where(generalMask == MaskGenerator.GOOD_DATA,
+                                    wholeTile,
+                                    Classifier.BAD_DATA)
+
+                predictions = \
+                    classifier._classifyGoodPixels(bandDict,
+                                                   generalMask,
+                                                   'out',
+                                                   frame)
+
+                self.assertEqual(predictions.shape, shape)
+                np.testing.assert_array_equal(predictions, expected)
+
+    # -------------------------------------------------------------------------
+    # _assertAllFramesFree
+    # -------------------------------------------------------------------------
+    def _assertAllFramesFree(self, classifier):
+
+        pool = classifier._bufferPool
+        frames = [pool.acquire(timeout=1) for i in range(pool.getNumFrames())]
+        self.assertNotIn(None, frames)
+
+        for frame in frames:
+            pool.release(frame)
+
+    # -------------------------------------------------------------------------
+    # _startPrefetch
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _startPrefetch(classifier, days, prefetch):
+
+        dayQueue = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+
+        producer = threading.Thread(target=classifier._prefetchDays,
+                                    args=('MOD', days, dayQueue, stop),
+                                    daemon=True)
+        producer.start()
+
+        return producer, dayQueue, stop
+
+    # -------------------------------------------------------------------------
+    # testPrefetch
+    # -------------------------------------------------------------------------
+    def testPrefetch(self):
+
+        days = [1, 2, 3, 4, 5]
+        prefetch = 2
+
+        with tempfile.TemporaryDirectory() as outDir:
+
+            # ---
+            # The days arrive in order, each read into its frame, and a read
+            # error is raised to the caller for its day only.
+            # ---
+            br = FakeBandReader()
+            br.failDays = set([3])
+            classifier = PixelClassifier(br, outDir, prefetch=prefetch)
+            producer, dayQueue, stop = \
+                self._startPrefetch(classifier, days, prefetch)
+
+            for day in days:
+
+                if day in br.failDays:
+
+                    with self.assertRaisesRegex(RuntimeError, 'day 3'):
+                        classifier._getPrefetchedDay(dayQueue, day)
+
+                    continue
+
+                (bandDict, usable, geo), frame = \
+                    classifier._getPrefetchedDay(dayQueue, day)
+
+                self.assertTrue(usable)
+                self.assertIs(bandDict, frame.find('bandCube'))
+
+                for band in bandDict:
+
+                    np.testing.assert_array_equal(bandDict[band],
+                                                  br.days[day][band])
+
+                classifier._bufferPool.release(frame)
+
+            producer.join(timeout=10)
+            self.assertFalse(producer.is_alive())
+            self.assertEqual(br.daysRead, days)
+            self.assertTrue(dayQueue.empty())
+            self._assertAllFramesFree(classifier)
+
+            # ---
+            # Stopping early ends the producer, which reads ahead only as
+            # far as the frames allow.  Draining the queue releases the
+            # frames of the days read but not classified.
+            # ---
+            br = FakeBandReader()
+            classifier = PixelClassifier(br, outDir, prefetch=prefetch)
+            producer, dayQueue, stop = \
+                self._startPrefetch(classifier, days, prefetch)
+
+            (bandDict, usable, geo), frame = \
+                classifier._getPrefetchedDay(dayQueue, 1)
+
+            while not dayQueue.full():
+                producer.join(timeout=0.01)
+
+            stop.set()
+            producer.join(timeout=10)
+            self.assertFalse(producer.is_alive())
+
+            self.assertLessEqual(len(br.daysRead), prefetch + 2)
+            self.assertEqual(br.daysRead, days[:len(br.daysRead)])
+
+            classifier._drainPrefetchQueue(dayQueue)
+            self.assertTrue(dayQueue.empty())
+            classifier._bufferPool.release(frame)
+            self._assertAllFramesFree(classifier)
+
+            # ---
+            # A day other than the one expected is an error, and its frame
+            # is released.
+            # ---
+            br = FakeBandReader()
+            classifier = PixelClassifier(br, outDir, prefetch=prefetch)
+            producer, dayQueue, stop = \
+                self._startPrefetch(classifier, days, prefetch)
+
+            with self.assertRaisesRegex(RuntimeError, 'Expected day 2'):
+                classifier._getPrefetchedDay(dayQueue, 2)
+
+            stop.set()
+            producer.join(timeout=10)
+            classifier._drainPrefetchQueue(dayQueue)
+            self._assertAllFramesFree(classifier)
@@ -0,0 +1,178 @@
+from pathlib import Path
+import pickle
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+try:
+    from sklearn.ensemble import RandomForestClassifier
+    SKLEARN_AVAILABLE = True
+
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+from modis_water.model import CompiledForest as compiledForestModule
+from modis_water.model.CompiledForest import CompiledForest
+
+
+# -----------------------------------------------------------------------------
+# class CompiledForestTestCase
+#
+# python -m unittest modis_water.model.tests.test_CompiledForest
+# -----------------------------------------------------------------------------
+@unittest.skipUnless(SKLEARN_AVAILABLE, 'scikit-learn is not installed.')
+class CompiledForestTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # _makeForest
+    #
+    # A forest of int16 features like the model's, with noisy labels so the
+    # trees are deep and some pixels are near ties.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _makeForest(classes: list):
+
+        rng = np.random.default_rng(0)
+        features = rng.integers(-1000, 9000, (4000, 10)).astype(np.int16)
+        labels = (features[:, 4] < features[:, 1]).astype(int)
+        flip = rng.random(labels.shape[0]) < 0.1
+        labels[flip] = 1 - labels[flip]
+
+        forest = RandomForestClassifier(n_estimators=12,
+                                        max_depth=12,
+                                        random_state=0)
+
+        forest.fit(features, np.asarray(classes)[labels])
+
+        testFeatures = \
+            rng.integers(-32768, 32767, (5000, 10)).astype(np.int16)
+
+        # Features equal to the thresholds and one off
+        thresholds = forest.estimators_[0].tree_.threshold
+        thresholds = np.floor(thresholds[thresholds > -2]).astype(np.int16)
+        testFeatures[:thresholds.size, :] = thresholds[:, np.newaxis]
+        testFeatures[-thresholds.size:, :] = thresholds[:, np.newaxis] + 1
+
+        return forest, np.concatenate([features, testFeatures])
+
+    # -------------------------------------------------------------------------
+    # testPredict
+    # -------------------------------------------------------------------------
+    def testPredict(self):
+
+        for classes in ([0, 1], [-1, 7]):
+
+            forest, features = CompiledForestTestCase._makeForest(classes)
+            compiled = CompiledForest(forest)
+
+            self.assertEqual(compiled.getNumTrees(), 12)
+
+            self.assertEqual(compiled.getNumNodes(),
+                             sum([e.tree_.node_count
+                                  for e in forest.estimators_]))
+
+            expected = forest.predict(features)
+            expectedProba = forest.predict_proba(features)
+
+            # The feature matrix of a band cube is a transposed view.
+            featureView = np.ascontiguousarray(features.T).T
+
+            np.testing.assert_array_equal(compiled.predict(featureView),
+                                          expected)
+
+            np.testing.assert_array_equal(compiled.predictProba(features),
+                                          expectedProba)
+
+            # The NumPy traversal, when Numba is installed
+            with patch.object(compiledForestModule,
+                              'NUMBA_AVAILABLE',
+                              False):
+
+                np.testing.assert_array_equal(compiled.predict(features),
+                                              expected)
+
+                np.testing.assert_array_equal(
+                    compiled.predictProba(features), expectedProba)
+
+    # -------------------------------------------------------------------------
+    # testPickle
+    # -------------------------------------------------------------------------
+    def testPickle(self):
+
+        forest, features = CompiledForestTestCase._makeForest([0, 1])
+        compiled = CompiledForest(forest)
+        copy = pickle.loads(pickle.dumps(compiled))
+
+        np.testing.assert_array_equal(copy.predict(features),
+                                      forest.predict(features))
+
+        with tempfile.TemporaryDirectory() as tempDir:
+
+            compiled.save(Path(tempDir), {'modelSha256': 'abc'})
+            loaded = CompiledForest(directory=Path(tempDir))
+
+            # A loaded forest is copied as its directory, and maps it again.
+            pickled = pickle.dumps(loaded)
+            self.assertLess(len(pickled), 1024)
+
+            copy = pickle.loads(pickled)
+            self.assertIsInstance(copy._value, np.memmap)
+            self.assertEqual(copy.getInfo(), {'modelSha256': 'abc'})
+
+            np.testing.assert_array_equal(copy.predict(features),
+                                          forest.predict(features))
+
+            del loaded, copy
+
+    # -------------------------------------------------------------------------
+    # testSaveLoad
+    # -------------------------------------------------------------------------
+    def testSaveLoad(self):
+
+        forest, features = CompiledForestTestCase._makeForest([0, 1])
+        compiled = CompiledForest(forest)
+
+        with tempfile.TemporaryDirectory() as tempDir:
+
+            directory = Path(tempDir) / 'forest'
+
+            with self.assertRaises(RuntimeError):
+                CompiledForest(directory=directory)
+
+            compiled.save(directory, {'modelSha256': 'abc'})
+            loaded = CompiledForest(directory=directory)
+
+            self.assertEqual(loaded.getInfo(), {'modelSha256': 'abc'})
+            self.assertEqual(loaded.getNumNodes(), compiled.getNumNodes())
+            self.assertIsInstance(loaded._value, np.memmap)
+            self.assertFalse(loaded._value.flags.writeable)
+
+            np.testing.assert_array_equal(loaded.getClasses(),
+                                          forest.classes_)
+
+            np.testing.assert_array_equal(loaded.predict(features),
+                                          forest.predict(features))
+
+            del loaded
+
+        with self.assertRaises(RuntimeError):
+            CompiledForest(forest, directory)
+
+    # -------------------------------------------------------------------------
+    # testInvalid
+    # -------------------------------------------------------------------------
+    def testInvalid(self):
+
+        with self.assertRaises(RuntimeError):
+            CompiledForest(RandomForestClassifier())
+
+        forest, features = CompiledForestTestCase._makeForest([0, 1])
+        compiled = CompiledForest(forest)
+
+        with self.assertRaises(RuntimeError):
+            compiled.predict(features.astype(np.float32))
+
+        with self.assertRaises(RuntimeError):
+            compiled.predict(features[:, :9])
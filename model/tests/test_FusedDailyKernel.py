@@ -0,0 +1,163 @@
+from concurrent.futures import ThreadPoolExecutor
+import unittest
+
+import numpy as np
+
+from modis_water.model.BandReader import BandReader
+from modis_water.model.Classifier import Classifier
+from modis_water.model.FusedDailyKernel import FusedDailyKernel
+from modis_water.model.MaskGenerator import MaskGenerator
+from modis_water.model.NormalizedDifference import NormalizedDifference
+from modis_water.model.RuleTable import RuleTable
+from modis_water.model.SimpleClassifier import SimpleClassifier
+
+
+# -----------------------------------------------------------------------------
+# class FusedDailyKernelTestCase
+#
+# python -m unittest modis_water.model.tests.test_FusedDailyKernel
+# -----------------------------------------------------------------------------
+@unittest.skipUnless(FusedDailyKernel.isAvailable(), 'Numba is not installed.')
+class FusedDailyKernelTestCase(unittest.TestCase):
+
+    LAND_BAD_DATA = -998
+
+    # -------------------------------------------------------------------------
+    # _makeBands
+    #
+    # Random bands around the thresholds, with some pixels at the extremes
+    # so sums wrap around and NDVI is undefined.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _makeBands(numPixels: int) -> dict:
+
+        rng = np.random.default_rng(0)
+        shape = (numPixels // 100, 100)
+        bandDict = {}
+
+        for band in [BandReader.SR1, BandReader.SR2, BandReader.SR3,
+                     BandReader.SR5, BandReader.SR7]:
+
+            bandDict[band] = rng.integers(-200, 3000, shape).astype(np.int16)
+
+        extreme = rng.random(shape) < 0.01
+
+        bandDict[BandReader.SR2][extreme] = \
+            rng.integers(-32768, 32768, extreme.sum()).astype(np.int16)
+
+        undefined = rng.random(shape) < 0.01
+
+        bandDict[BandReader.SR2][undefined] = \
+            -bandDict[BandReader.SR1][undefined]
+
+        bandDict[BandReader.SOLZ] = \
+            rng.integers(0, 7000, shape).astype(np.int16)
+
+        bandDict[BandReader.STATE] = \
+            rng.integers(-32768, 32768, shape).astype(np.int16)
+
+        return bandDict
+
+    # -------------------------------------------------------------------------
+    # _runNumPy
+    #
+    # The NumPy path of SimpleClassifier and Classifier._maskClassify.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _runNumPy(bandDict: dict, ruleTable: RuleTable) -> np.ndarray:
+
+        maskGen = MaskGenerator(bandDict)
+        generalMask = maskGen.generateGeneralMask()
+        landMask = maskGen.generateLandMask()
+        sr1 = bandDict[BandReader.SR1]
+        sr2 = bandDict[BandReader.SR2]
+
+        inputs = {'nir': sr2,
+                  'blue': bandDict[BandReader.SR3],
+                  'swir5': bandDict[BandReader.SR5],
+                  'swir7': bandDict[BandReader.SR7],
+                  'ndvi': NormalizedDifference.compute(sr2, sr1),
+                  'redPlusNir': sr1 + sr2}
+
+        predictedImage = ruleTable.apply(inputs)
+
+        generalMaskedImage = \
+            np.where(generalMask == MaskGenerator.GOOD_DATA,
+                     predictedImage,
+                     Classifier.BAD_DATA).astype(np.int16)
+
+        predictedLandAndMasked = ((generalMaskedImage == Classifier.LAND) &
+                                  (landMask == MaskGenerator.BAD_DATA))
+
+        return np.where(predictedLandAndMasked,
+                        FusedDailyKernelTestCase.LAND_BAD_DATA,
+                        generalMaskedImage).astype(np.int16)
+
+    # -------------------------------------------------------------------------
+    # _runFused
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _runFused(bandDict: dict, ruleTable: RuleTable) -> np.ndarray:
+
+        out = np.empty(bandDict[BandReader.SR1].shape, dtype=np.int16)
+
+        return FusedDailyKernel.runSimple(
+            bandDict[BandReader.SR1],
+            bandDict[BandReader.SR2],
+            bandDict[BandReader.SR3],
+            bandDict[BandReader.SR5],
+            bandDict[BandReader.SR7],
+            bandDict[BandReader.SOLZ],
+            bandDict[BandReader.STATE],
+            MaskGenerator.GENERAL_STATE_LUT,
+            MaskGenerator.LAND_STATE_LUT,
+            ruleTable.encode(FusedDailyKernel.SIMPLE_INPUTS),
+            ruleTable.getDefault(),
+            Classifier.LAND,
+            Classifier.BAD_DATA,
+            FusedDailyKernelTestCase.LAND_BAD_DATA,
+            out)
+
+    # -------------------------------------------------------------------------
+    # testMatchesNumPy
+    # -------------------------------------------------------------------------
+    def testMatchesNumPy(self):
+
+        bandDict = FusedDailyKernelTestCase._makeBands(100000)
+
+        ruleTable = RuleTable(SimpleClassifier.PREDICATES,
+                              SimpleClassifier.RULES,
+                              SimpleClassifier.THRESHOLDS,
+                              Classifier.NO_DATA)
+
+        expected = FusedDailyKernelTestCase._runNumPy(bandDict, ruleTable)
+        fused = FusedDailyKernelTestCase._runFused(bandDict, ruleTable)
+
+        np.testing.assert_array_equal(fused, expected)
+
+        # Threads may run the kernel at once, whatever the threading layer.
+        with ThreadPoolExecutor(max_workers=4) as executor:
+
+            results = list(executor.map(
+                lambda i: FusedDailyKernelTestCase._runFused(bandDict,
+                                                             ruleTable),
+                range(8)))
+
+        for fused in results:
+            np.testing.assert_array_equal(fused, expected)
+
+        # Every outcome occurs, so every path is compared.
+        for value in [Classifier.BAD_DATA,
+                      Classifier.NO_DATA,
+                      Classifier.LAND,
+                      Classifier.WATER,
+                      FusedDailyKernelTestCase.LAND_BAD_DATA]:
+
+            self.assertTrue((expected == value).any())
+
+        # Replaced thresholds reach the kernel.
+        ruleTable.setThresholds({'nirLow': 1000.5, 'swir5Low': 1500})
+        expected = FusedDailyKernelTestCase._runNumPy(bandDict, ruleTable)
+        fused = FusedDailyKernelTestCase._runFused(bandDict, ruleTable)
+
+        np.testing.assert_array_equal(fused, expected)
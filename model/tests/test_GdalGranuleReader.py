@@ -0,0 +1,173 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from osgeo import gdal
+
+from modis_water.model import GdalGranuleReader as gdalModule
+from modis_water.model.GdalGranuleReader import GdalGranuleReader
+
+
+# -----------------------------------------------------------------------------
+# class FakeDataset
+#
+# A 4 x 6 int16 band, for every name opened, recording the windows read.
+# -----------------------------------------------------------------------------
+class FakeDataset(object):
+
+    RasterXSize = 6
+    RasterYSize = 4
+
+    def __init__(self, name):
+
+        self.name = name
+        self.reads = []
+
+    def GetGeoTransform(self):
+        return (0.0, 1.0, 0.0, 0.0, 0.0, -1.0)
+
+    def GetProjection(self):
+        return 'sinusoidal'
+
+    def GetRasterBand(self, index):
+        return self
+
+    @property
+    def DataType(self):
+        return gdal.GDT_Int16
+
+    def ReadAsArray(self,
+                    xoff=0,
+                    yoff=0,
+                    xsize=None,
+                    ysize=None,
+                    buf_obj=None,
+                    buf_xsize=None,
+                    buf_ysize=None):
+
+        xsize = 6 if xsize is None else xsize
+        ysize = 4 if ysize is None else ysize
+        self.reads.append((xoff, yoff, xsize, ysize))
+
+        array = np.arange(24, dtype=np.int16).reshape(4, 6)
+        array = array[yoff:yoff + ysize, xoff:xoff + xsize]
+
+        if buf_obj is not None:
+
+            buf_obj[:] = array
+            return buf_obj
+
+        return array
+
+
+# -----------------------------------------------------------------------------
+# class GdalGranuleReaderTestCase
+#
+# python -m unittest modis_water.model.tests.test_GdalGranuleReader
+# -----------------------------------------------------------------------------
+class GdalGranuleReaderTestCase(unittest.TestCase):
+
+    PREFIX = 'HDF4_EOS:EOS_GRID'
+
+    # -------------------------------------------------------------------------
+    # setUp
+    # -------------------------------------------------------------------------
+    def setUp(self):
+
+        self.opened = []
+        self.datasets = []
+
+        def fakeOpen(name):
+
+            self.opened.append(name)
+            self.datasets.append(FakeDataset(name))
+
+            return self.datasets[-1]
+
+        patcher = patch.object(gdalModule.gdal, 'Open', fakeOpen)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    # -------------------------------------------------------------------------
+    # testOpenOnce
+    # -------------------------------------------------------------------------
+    def testOpenOnce(self):
+
+        gr = GdalGranuleReader()
+        prefix = GdalGranuleReaderTestCase.PREFIX
+
+        # ---
+        # The granule and each of its sub-datasets are opened once, however
+        # often a band is read.
+        # ---
+        for band in [':Grid:b1', ':Grid:b2', ':Grid:b1']:
+
+            array, xform, proj = gr.readBand('a.hdf', prefix, band)
+
+            self.assertTrue(np.array_equal(array,
+                                           np.arange(24).reshape(4, 6)))
+
+            self.assertEqual(proj, 'sinusoidal')
+
+        self.assertEqual(self.opened,
+                         ['a.hdf',
+                          prefix + ':"a.hdf"::Grid:b1',
+                          prefix + ':"a.hdf"::Grid:b2'])
+
+        # A band is read into out when out fits it.
+        out = np.zeros((4, 6), np.int16)
+        array, xform, proj = gr.readBand('a.hdf', prefix, ':Grid:b1', out=out)
+        self.assertIs(array, out)
+        self.assertEqual(len(self.opened), 3)
+
+        # Closing the granules opens them again on the next read.
+        gr.close()
+        gr.readBand('a.hdf', prefix, ':Grid:b1')
+        self.assertEqual(len(self.opened), 5)
+
+    # -------------------------------------------------------------------------
+    # testReadWindow
+    # -------------------------------------------------------------------------
+    def testReadWindow(self):
+
+        gr = GdalGranuleReader()
+        prefix = GdalGranuleReaderTestCase.PREFIX
+        stored = np.arange(24).reshape(4, 6)
+
+        # A window is read with ReadAsArray from the stored pixels.
+        out = np.zeros((2, 3), np.int16)
+
+        array, xform, proj = \
+            gr.readBand('a.hdf', prefix, ':Grid:b1', out=out,
+                        window=(1, 3, 2, 5))
+
+        self.assertIs(array, out)
+        self.assertTrue(np.array_equal(array, stored[1:3, 2:5]))
+        self.assertEqual(self.datasets[-1].reads, [(2, 1, 3, 2)])
+        self.assertEqual(xform, (0.0, 1.0, 0.0, 0.0, 0.0, -1.0))
+
+        # ---
+        # A window of the band upsampled is read from the stored pixels
+        # covering it, and the geotransform is the upsampled band's.
+        # ---
+        array, xform, proj = \
+            gr.readBand('a.hdf', prefix, ':Grid:b1', 12, 8,
+                        window=(3, 6, 1, 10))
+
+        upsampled = stored.repeat(2, axis=0).repeat(2, axis=1)
+        self.assertTrue(np.array_equal(array, upsampled[3:6, 1:10]))
+        self.assertEqual(self.datasets[-1].reads[-1], (0, 1, 5, 2))
+        self.assertEqual(xform, (0.0, 0.5, 0.0, 0.0, 0.0, -0.5))
+
+    # -------------------------------------------------------------------------
+    # testOpenFails
+    # -------------------------------------------------------------------------
+    def testOpenFails(self):
+
+        gr = GdalGranuleReader()
+
+        with patch.object(gdalModule.gdal, 'Open', lambda name: None):
+
+            with self.assertRaises(RuntimeError):
+                gr.readBand('a.hdf', GdalGranuleReaderTestCase.PREFIX, ':b')
@@ -0,0 +1,99 @@
+from pathlib import Path
+import tempfile
+import unittest
+
+from modis_water.model.GranuleIndex import GranuleIndex
+
+
+# -----------------------------------------------------------------------------
+# class GranuleIndexTestCase
+#
+# python -m unittest modis_water.model.tests.test_GranuleIndex
+# -----------------------------------------------------------------------------
+class GranuleIndexTestCase(unittest.TestCase):
+
+    NAMES = ['MOD09GA.A2003161.h09v05.061.2020094170809.hdf',
+             'MOD09GA.A2003161.h09v05.061.2021001000000.hdf',
+             'MOD09GA.A2003161.h10v05.061.2020094170809.hdf',
+             'MOD09GA.A2003162.h09v05.061.2020094170809.hdf',
+             'MOD09GA.A2003162.h09v05.061.2020094170809.hdf.xml',
+             'notes.txt']
+
+    # -------------------------------------------------------------------------
+    # setUp
+    # -------------------------------------------------------------------------
+    def setUp(self):
+
+        self._tmp = tempfile.TemporaryDirectory()
+        self._dir = Path(self._tmp.name) / 'MOD09GA' / '2003'
+        self._dir.mkdir(parents=True)
+
+        for name in GranuleIndexTestCase.NAMES:
+            (self._dir / name).touch()
+
+    # -------------------------------------------------------------------------
+    # tearDown
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    # -------------------------------------------------------------------------
+    # testFind
+    # -------------------------------------------------------------------------
+    def testFind(self):
+
+        index = GranuleIndex('.hdf')
+        found = index.find(self._dir, 'MOD', '09GA', 2003, 161, 'h09v05')
+
+        self.assertEqual([f.name for f in found],
+                         GranuleIndexTestCase.NAMES[:2])
+
+        found = index.find(self._dir, 'MOD', '09GA', 2003, 162, 'h09v05')
+        self.assertEqual(found, [self._dir / GranuleIndexTestCase.NAMES[3]])
+
+        self.assertEqual(
+            index.find(self._dir, 'MYD', '09GA', 2003, 161, 'h09v05'), [])
+
+        self.assertEqual(
+            index.find(self._dir, 'MOD', '09GA', 2003, 163, 'h09v05'), [])
+
+        # Without a day, every day of the year is returned.
+        found = index.find(self._dir, 'MOD', '09GA', 2003, None, 'h09v05')
+        self.assertEqual(len(found), 3)
+
+    # -------------------------------------------------------------------------
+    # testMissingDir
+    # -------------------------------------------------------------------------
+    def testMissingDir(self):
+
+        index = GranuleIndex('.hdf')
+        missing = self._dir.parent / '2004'
+
+        self.assertEqual(
+            index.find(missing, 'MOD', '09GA', 2004, 1, 'h09v05'), [])
+
+    # -------------------------------------------------------------------------
+    # testSidecar
+    # -------------------------------------------------------------------------
+    def testSidecar(self):
+
+        sidecarDir = Path(self._tmp.name)
+        index = GranuleIndex('.hdf', sidecarDir)
+        index.find(self._dir, 'MOD', '09GA', 2003, 161, 'h09v05')
+
+        sidecars = list(sidecarDir.glob('*.json'))
+        self.assertEqual(len(sidecars), 1)
+
+        # A new index reads the sidecar instead of listing the directory.
+        self.assertEqual(len(GranuleIndex('.hdf', sidecarDir).
+                             _readSidecar(self._dir)), 4)
+
+        # Adding a granule invalidates the sidecar.
+        (self._dir / 'MOD09GA.A2003163.h09v05.061.2020094170809.hdf').touch()
+        self.assertIsNone(GranuleIndex('.hdf', sidecarDir).
+                          _readSidecar(self._dir))
+
+        found = GranuleIndex('.hdf', sidecarDir). \
+            find(self._dir, 'MOD', '09GA', 2003, 163, 'h09v05')
+
+        self.assertEqual(len(found), 1)
@@ -0,0 +1,261 @@
+import pickle
+import threading
+import unittest
+
+import numpy as np
+
+from modis_water.model.GranuleReader import GranuleReader
+
+
+# -----------------------------------------------------------------------------
+# class CountingGranuleReader
+#
+# Opening a path in gates waits until its event is set.
+# -----------------------------------------------------------------------------
+class CountingGranuleReader(GranuleReader):
+
+    def __init__(self, maxOpen: int):
+
+        super(CountingGranuleReader, self).__init__(maxOpen)
+        self.opened = []
+        self.closed = []
+        self.gates = {}
+
+    def _close(self, handle) -> None:
+        self.closed.append(handle)
+
+    def _open(self, path: str):
+
+        self.opened.append(path)
+
+        if path in self.gates:
+            self.gates[path].wait(timeout=10)
+
+        return path
+
+    def readBand(self, path, subDsPrefix, bandName, cols=None, rows=None):
+
+        with self._granule(path) as handle:
+            return handle, None, None
+
+
+# -----------------------------------------------------------------------------
+# class GranuleReaderTestCase
+#
+# python -m unittest modis_water.model.tests.test_GranuleReader
+# -----------------------------------------------------------------------------
+class GranuleReaderTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testInit
+    # -------------------------------------------------------------------------
+    def testInit(self):
+
+        with self.assertRaises(RuntimeError):
+            CountingGranuleReader(0)
+
+    # -------------------------------------------------------------------------
+    # testOpenOnce
+    # -------------------------------------------------------------------------
+    def testOpenOnce(self):
+
+        gr = CountingGranuleReader(2)
+
+        for band in ['b1', 'b2', 'b3']:
+            gr.readBand('a.hdf', None, band)
+            gr.readBand('b.hdf', None, band)
+
+        self.assertEqual(gr.opened, ['a.hdf', 'b.hdf'])
+        self.assertEqual(gr.closed, [])
+
+    # -------------------------------------------------------------------------
+    # testEviction
+    # -------------------------------------------------------------------------
+    def testEviction(self):
+
+        gr = CountingGranuleReader(2)
+        gr.readBand('a.hdf', None, 'b1')
+        gr.readBand('b.hdf', None, 'b1')
+        gr.readBand('a.hdf', None, 'b1')
+        gr.readBand('c.hdf', None, 'b1')
+
+        # b.hdf was the least recently used.
+        self.assertEqual(gr.closed, ['b.hdf'])
+
+        gr.close()
+        self.assertEqual(sorted(gr.closed), ['a.hdf', 'b.hdf', 'c.hdf'])
+
+    # -------------------------------------------------------------------------
+    # testInUseNotEvicted
+    # -------------------------------------------------------------------------
+    def testInUseNotEvicted(self):
+
+        gr = CountingGranuleReader(1)
+
+        with gr._granule('a.hdf'):
+
+            gr.readBand('b.hdf', None, 'b1')
+
+            # a.hdf is in use, so b.hdf is the only one that can go.
+            self.assertEqual(gr.closed, ['b.hdf'])
+
+        gr.readBand('c.hdf', None, 'b1')
+        self.assertEqual(gr.closed, ['b.hdf', 'a.hdf'])
+
+    # -------------------------------------------------------------------------
+    # testOpenOutsideLock
+    # -------------------------------------------------------------------------
+    def testOpenOutsideLock(self):
+
+        gr = CountingGranuleReader(2)
+        gate = threading.Event()
+        gr.gates['slow.hdf'] = gate
+
+        slowReads = [threading.Thread(target=gr.readBand,
+                                      args=('slow.hdf', None, band))
+                     for band in ['b1', 'b2', 'b3']]
+
+        for thread in slowReads:
+            thread.start()
+
+        while 'slow.hdf' not in gr.opened:
+            gate.wait(timeout=0.01)
+
+        # Another granule is read while slow.hdf is being opened.
+        otherRead = threading.Thread(target=gr.readBand,
+                                     args=('a.hdf', None, 'b1'))
+        otherRead.start()
+        otherRead.join(timeout=5)
+        self.assertFalse(otherRead.is_alive())
+
+        gate.set()
+
+        for thread in slowReads:
+            thread.join(timeout=5)
+            self.assertFalse(thread.is_alive())
+
+        # The reads of slow.hdf waited for one open.
+        self.assertEqual(gr.opened, ['slow.hdf', 'a.hdf'])
+        self.assertEqual(gr.closed, [])
+
+    # -------------------------------------------------------------------------
+    # testPickle
+    # -------------------------------------------------------------------------
+    def testPickle(self):
+
+        gr = CountingGranuleReader(2)
+        gr.readBand('a.hdf', None, 'b1')
+
+        copy = pickle.loads(pickle.dumps(gr))
+
+        # The copy opens its own granules.
+        self.assertEqual(len(copy._handles), 0)
+        copy.readBand('a.hdf', None, 'b1')
+        self.assertEqual(copy.opened, ['a.hdf', 'a.hdf'])
+        self.assertEqual(gr.opened, ['a.hdf'])
+
+    # -------------------------------------------------------------------------
+    # testUpsampleWindow
+    # -------------------------------------------------------------------------
+    def testUpsampleWindow(self):
+
+        stored = np.arange(30, dtype=np.int16).reshape(5, 6)
+        upsampled = GranuleReader.upsample(stored, 12, 10)
+        reads = []
+
+        def readStored(rowStart, rowEnd, colStart, colEnd, out):
+
+            reads.append((rowStart, rowEnd, colStart, colEnd))
+            return stored[rowStart:rowEnd, colStart:colEnd]
+
+        # ---
+        # Each window matches the window of the whole upsampled array, and
+        # only the stored pixels covering it are read.
+        # ---
+        for window, covering in (((3, 7, 1, 12), (1, 4, 0, 6)),
+                                 ((0, 10, 0, 12), (0, 5, 0, 6)),
+                                 ((4, 5, 5, 6), (2, 3, 2, 3)),
+                                 ((2, 2, 3, 3), (1, 1, 1, 2))):
+
+            rowStart, rowEnd, colStart, colEnd = window
+
+            array = GranuleReader.upsampleWindow(readStored,
+                                                 stored.shape,
+                                                 window,
+                                                 12,
+                                                 10)
+
+            self.assertTrue(np.array_equal(
+                array, upsampled[rowStart:rowEnd, colStart:colEnd]))
+
+            self.assertEqual(reads[-1], covering)
+
+            self.assertTrue(np.array_equal(
+                GranuleReader.upsample(stored, 12, 10, window=window),
+                array))
+
+        # The window is written into out when out fits it.
+        out = np.zeros((4, 11), dtype=np.int16)
+        array = GranuleReader.upsample(stored, 12, 10, out, (3, 7, 1, 12))
+        self.assertIs(array, out)
+        self.assertTrue(np.array_equal(out, upsampled[3:7, 1:12]))
+
+        # Without upsampling, the window is read as stored.
+        out = np.zeros((2, 3), dtype=np.int16)
+        array = GranuleReader.upsample(stored, 6, 5, out, (1, 3, 2, 5))
+        self.assertIs(array, out)
+        self.assertTrue(np.array_equal(out, stored[1:3, 2:5]))
+
+        with self.assertRaises(RuntimeError):
+            GranuleReader.upsample(stored, 12, 10, window=(0, 11, 0, 12))
+
+        with self.assertRaises(RuntimeError):
+            GranuleReader.upsample(stored, 9, 10, window=(0, 1, 0, 1))
+
+    # -------------------------------------------------------------------------
+    # testParseGridMetadata
+    # -------------------------------------------------------------------------
+    def testParseGridMetadata(self):
+
+        structMetadata = (
+            'GROUP=SwathStructure\n'
+            'END_GROUP=SwathStructure\n'
+            'GROUP=GridStructure\n'
+            '\tGROUP=GRID_1\n'
+            '\t\tGridName="MODIS_Grid_1km_2D"\n'
+            '\t\tXDim=1200\n'
+            '\t\tYDim=1200\n'
+            '\t\tUpperLeftPointMtrs=(-8895604.157333,4447802.078667)\n'
+            '\t\tLowerRightMtrs=(-7783653.637667,3335851.559000)\n'
+            '\t\tProjection=GCTP_SNSOID\n'
+            '\t\tGROUP=DataField\n'
+            '\t\t\tOBJECT=DataField_1\n'
+            '\t\t\t\tDataFieldName="state_1km_1"\n'
+            '\t\t\t\tDimList=("YDim","XDim")\n'
+            '\t\t\tEND_OBJECT=DataField_1\n'
+            '\t\tEND_GROUP=DataField\n'
+            '\tEND_GROUP=GRID_1\n'
+            '\tGROUP=GRID_2\n'
+            '\t\tGridName="MODIS_Grid_500m_2D"\n'
+            '\t\tXDim=2400\n'
+            '\t\tYDim=2400\n'
+            '\t\tUpperLeftPointMtrs=(-8895604.157333,4447802.078667)\n'
+            '\t\tLowerRightMtrs=(-7783653.637667,3335851.559000)\n'
+            '\tEND_GROUP=GRID_2\n'
+            'END_GROUP=GridStructure\n')
+
+        grids = GranuleReader._parseGridMetadata(structMetadata)
+
+        self.assertEqual(sorted(grids.keys()),
+                         ['MODIS_Grid_1km_2D', 'MODIS_Grid_500m_2D'])
+
+        xform = grids['MODIS_Grid_1km_2D']
+        self.assertEqual(xform[0], -8895604.157333)
+        self.assertEqual(xform[3], 4447802.078667)
+        self.assertAlmostEqual(xform[1], 926.625433, places=5)
+        self.assertAlmostEqual(xform[5], -926.625433, places=5)
+        self.assertEqual((xform[2], xform[4]), (0.0, 0.0))
+
+        self.assertAlmostEqual(grids['MODIS_Grid_500m_2D'][1],
+                               463.312717,
+                               places=5)
@@ -0,0 +1,154 @@
+from pathlib import Path
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+from modis_water.model.GranuleReader import GranuleReader
+from modis_water.model.H5pyGranuleReader import H5pyGranuleReader
+
+
+# -----------------------------------------------------------------------------
+# class H5pyGranuleReaderTestCase
+#
+# python -m unittest modis_water.model.tests.test_H5pyGranuleReader
+# -----------------------------------------------------------------------------
+class H5pyGranuleReaderTestCase(unittest.TestCase):
+
+    BAND = '//HDFEOS/GRIDS/VIIRS_Grid_1km_2D/Data_Fields/SolarZenith_1'
+
+    STRUCT_METADATA = (
+        'GROUP=GridStructure\n'
+        '\tGROUP=GRID_1\n'
+        '\t\tGridName="VIIRS_Grid_1km_2D"\n'
+        '\t\tXDim=12\n'
+        '\t\tYDim=12\n'
+        '\t\tUpperLeftPointMtrs=(-8895604.157333,4447802.078667)\n'
+        '\t\tLowerRightMtrs=(-7783653.637667,3335851.559000)\n'
+        '\tEND_GROUP=GRID_1\n'
+        'END_GROUP=GridStructure\n')
+
+    # -------------------------------------------------------------------------
+    # setUp
+    #
+    # Write a small granule laid out like a VIIRS one, with 4 x 4 chunks.
+    # -------------------------------------------------------------------------
+    def setUp(self):
+
+        self._tempDir = tempfile.TemporaryDirectory()
+        self._path = Path(self._tempDir.name) / 'VNP09GA.A2020161.h09v05.h5'
+        self._array = np.arange(144, dtype=np.int16).reshape(12, 12)
+
+        with h5py.File(self._path, 'w') as f:
+
+            f['HDFEOS INFORMATION/StructMetadata.0'] = \
+                np.bytes_(H5pyGranuleReaderTestCase.STRUCT_METADATA)
+
+            f.create_dataset(
+                'HDFEOS/GRIDS/VIIRS_Grid_1km_2D/Data Fields/SolarZenith_1',
+                data=self._array,
+                chunks=(4, 4),
+                compression='gzip')
+
+    # -------------------------------------------------------------------------
+    # tearDown
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+        self._tempDir.cleanup()
+
+    # -------------------------------------------------------------------------
+    # testReadBand
+    # -------------------------------------------------------------------------
+    def testReadBand(self):
+
+        gr = H5pyGranuleReader()
+
+        array, xform, proj = gr.readBand(self._path,
+                                         'HDF5',
+                                         H5pyGranuleReaderTestCase.BAND)
+
+        self.assertEqual(array.dtype, np.int16)
+        self.assertTrue(np.array_equal(array, self._array))
+        self.assertEqual(xform[0], -8895604.157333)
+        self.assertAlmostEqual(xform[1], 92662.543306, places=5)
+        self.assertEqual(proj, GranuleReader.SINUSOIDAL_WKT)
+
+        # Reading at twice the size upsamples by nearest neighbour.
+        array, xform, proj = gr.readBand(self._path,
+                                         'HDF5',
+                                         H5pyGranuleReaderTestCase.BAND,
+                                         24,
+                                         24)
+
+        self.assertEqual(array.shape, (24, 24))
+        self.assertEqual(array[5, 7], self._array[2, 3])
+        self.assertAlmostEqual(xform[1], 92662.543306 / 2, places=5)
+        upsampled = array
+
+        # ---
+        # A window of the upsampled band is read from the stored pixels
+        # covering it, and the geotransform is still the whole band's.
+        # ---
+        for window in ((3, 17, 5, 6), (0, 24, 0, 24), (4, 8, 9, 23)):
+
+            rowStart, rowEnd, colStart, colEnd = window
+
+            array, windowXform, proj = \
+                gr.readBand(self._path,
+                            'HDF5',
+                            H5pyGranuleReaderTestCase.BAND,
+                            24,
+                            24,
+                            window=window)
+
+            self.assertTrue(np.array_equal(
+                array, upsampled[rowStart:rowEnd, colStart:colEnd]))
+
+            self.assertEqual(windowXform, xform)
+
+        # A window at the stored size is read into out when out fits it.
+        out = np.zeros((2, 7), dtype=np.int16)
+
+        array, xform, proj = gr.readBand(self._path,
+                                         'HDF5',
+                                         H5pyGranuleReaderTestCase.BAND,
+                                         out=out,
+                                         window=(10, 12, 1, 8))
+
+        self.assertIs(array, out)
+        self.assertTrue(np.array_equal(out, self._array[10:12, 1:8]))
+
+        with self.assertRaises(RuntimeError):
+
+            gr.readBand(self._path,
+                        'HDF5',
+                        '//HDFEOS/GRIDS/VIIRS_Grid_1km_2D/Data_Fields/Nope')
+
+        gr.close()
+
+    # -------------------------------------------------------------------------
+    # testReadWindow
+    # -------------------------------------------------------------------------
+    def testReadWindow(self):
+
+        gr = H5pyGranuleReader()
+        band = H5pyGranuleReaderTestCase.BAND
+
+        # The window crosses chunk boundaries.
+        window = gr.readWindow(self._path, band, 3, 9, 5, 6)
+        self.assertTrue(np.array_equal(window, self._array[3:9, 5:6]))
+
+        window = gr.readWindow(self._path, band, 0, 12)
+        self.assertTrue(np.array_equal(window, self._array))
+
+        # A window is read into out when out fits it.
+        out = np.zeros((2, 7), dtype=np.int16)
+        window = gr.readWindow(self._path, band, 10, 12, 1, 8, out)
+        self.assertIs(window, out)
+        self.assertTrue(np.array_equal(out, self._array[10:12, 1:8]))
+
+        with self.assertRaises(RuntimeError):
+            gr.readWindow(self._path, band, 6, 13)
+
+        gr.close()
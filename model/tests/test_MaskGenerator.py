@@ -136,3 +136,71 @@ class MaskGeneratorTestCase(unittest.TestCase):
 
         self.srTester(BandReader.SR1)
         self.srTester(BandReader.SR2)
+
+    # -------------------------------------------------------------------------
+    # testStateLuts
+    #
+    # The lookup tables must agree with the bit tests for every state value.
+    # -------------------------------------------------------------------------
+    def testStateLuts(self):
+
+        state = np.arange(65536).reshape(256, 256)
+        bd = dict(MaskGeneratorTestCase.bandDict)
+
+        for band in bd:
+            bd[band] = np.zeros(state.shape, dtype=np.int16)
+
+        bd[BandReader.STATE] = state
+        mg = MaskGenerator(bd)
+
+        generalMask = mg.generateGeneralMask()
+        landMask = mg.generateLandMask()
+
+        self.assertEqual(generalMask.dtype, np.uint8)
+        self.assertEqual(landMask.dtype, np.uint8)
+
+        expectedGeneral = np.where(
+            state & MaskGenerator.AERO_MASK == MaskGenerator.AERO_MASK,
+            MaskGenerator.BAD_DATA,
+            MaskGenerator.GOOD_DATA)
+
+        self.assertTrue(np.array_equal(generalMask, expectedGeneral))
+
+        expectedLand = np.where(
+            ((state & MaskGenerator.CLOUDY == MaskGenerator.CLOUDY) |
+             (state & MaskGenerator.CLOUD_MIXED ==
+                MaskGenerator.CLOUD_MIXED) |
+             (state & MaskGenerator.CLOUD_SHADOW ==
+                MaskGenerator.CLOUD_SHADOW) |
+             (state & MaskGenerator.CLOUD_INT == MaskGenerator.CLOUD_INT)),
+            MaskGenerator.BAD_DATA,
+            MaskGenerator.GOOD_DATA)
+
+        self.assertTrue(np.array_equal(landMask, expectedLand))
+
+        # Signed state decodes from its low 16 bits.
+        bd[BandReader.STATE] = state.astype(np.uint16).view(np.int16)
+        self.assertTrue(np.array_equal(mg.generateLandMask(), expectedLand))
+
+    # -------------------------------------------------------------------------
+    # testCountUsable
+    # -------------------------------------------------------------------------
+    def testCountUsable(self):
+
+        bd = {BandReader.STATE: np.array([[0, MaskGenerator.AERO_MASK],
+                                          [MaskGenerator.CLOUDY, 0]]),
+              BandReader.SOLZ: np.array([[6500, 0], [0, 6501]])}
+
+        # Aerosol and high solar zenith are unusable; clouds are not.
+        self.assertEqual(MaskGenerator.countUsable(bd), 2)
+
+        # Every pixel countUsable rejects is bad in the general mask.
+        bd = dict(MaskGeneratorTestCase.bandDict)
+        bd[BandReader.STATE] = np.array([[0, MaskGenerator.AERO_MASK],
+                                         [MaskGenerator.CLOUDY, 0]])
+
+        bd[BandReader.SOLZ] = np.array([[6500, 0], [0, 6501]])
+        generalMask = MaskGenerator(bd).generateGeneralMask()
+
+        self.assertEqual(int(np.count_nonzero(generalMask)),
+                         MaskGenerator.countUsable(bd))
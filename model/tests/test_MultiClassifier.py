@@ -0,0 +1,323 @@
+import logging
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from modis_water.model.BandReader import BandReader
+from modis_water.model.MultiClassifier import MultiClassifier
+from modis_water.model.SimpleClassifier import SimpleClassifier
+from modis_water.model.ValidRegion import ValidRegion
+
+
+# -----------------------------------------------------------------------------
+# class FakeBandReader
+#
+# Random bands of a small tile, counting the bands read.  Reading a day in
+# failDays raises an error.
+# -----------------------------------------------------------------------------
+class FakeBandReader(object):
+
+    SIZE = 40
+
+    def __init__(self):
+
+        rng = np.random.default_rng(0)
+        shape = (FakeBandReader.SIZE, FakeBandReader.SIZE)
+        self.days = {}
+        self.failDays = set()
+        self.numBandsRead = 0
+
+        for day in (1, 2, 3):
+
+            bands = {band: rng.integers(-200, 5000, shape).astype(np.int16)
+                     for band in BandReader.ALL_BANDS}
+
+            bands[BandReader.STATE] = \
+                rng.integers(0, 65536, shape).astype(np.uint16)
+
+            self.days[day] = bands
+
+        # Day 2 is all cloud.
+        self.days[2][BandReader.STATE][:] = 1
+
+    def getCols(self):
+        return FakeBandReader.SIZE
+
+    def getProj(self):
+        return None
+
+    def getRows(self):
+        return FakeBandReader.SIZE
+
+    def getXform(self):
+        return None
+
+    def read(self,
+             sensor,
+             year,
+             day,
+             tile,
+             bands=None,
+             frame=None,
+             window=None):
+
+        bands = self.bands if bands is None else bands
+        self.numBandsRead += len(bands)
+        rowStart, rowEnd, colStart, colEnd = window or (None,) * 4
+
+        return {band: self.days[day][band][rowStart:rowEnd,
+                                           colStart:colEnd].copy()
+                for band in bands}
+
+    def readDay(self,
+                sensor,
+                year,
+                day,
+                tile,
+                bands=None,
+                frame=None,
+                window=None):
+
+        if day in self.failDays:
+            raise RuntimeError('Unable to read day ' + str(day))
+
+        return self.read(sensor, year, day, tile, bands, frame, window), \
+            None, None
+
+    def sensors(self):
+        return set(['MOD'])
+
+    def setBands(self, bands):
+        self.bands = set(bands)
+
+
+# -----------------------------------------------------------------------------
+# class NamedSimpleClassifier
+#
+# A simple classifier with its own name and thresholds, keeping its outputs
+# and saving them next to the output names, so those of worker processes can
+# be compared.
+# -----------------------------------------------------------------------------
+class NamedSimpleClassifier(SimpleClassifier):
+
+    def __init__(self, name, *args, **kwargs):
+
+        self.name = name
+        self.outputs = {}
+        super(NamedSimpleClassifier, self).__init__(*args, **kwargs)
+
+    def _createOutputImage(self, name, predictions, geo=None):
+
+        self.outputs[name] = predictions.copy()
+        np.save(name + '.npy', predictions)
+
+    def getClassifierName(self):
+        return self.name
+
+
+# -----------------------------------------------------------------------------
+# class MultiClassifierTestCase
+#
+# python -m unittest modis_water.model.tests.test_MultiClassifier
+# -----------------------------------------------------------------------------
+class MultiClassifierTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # _makeClassifiers
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _makeClassifiers(br, outDir, validRegion=None):
+
+        return [NamedSimpleClassifier('A', br, 2003, 'h09v05', outDir,
+                                      set(['MOD']), 1, 3,
+                                      validRegion=validRegion),
+                NamedSimpleClassifier('B', br, 2003, 'h09v05', outDir,
+                                      set(['MOD']), 1, 3,
+                                      thresholds={'nirLow': 1000},
+                                      validRegion=validRegion)]
+
+    # -------------------------------------------------------------------------
+    # testRun
+    # -------------------------------------------------------------------------
+    def testRun(self):
+
+        validRegion = ValidRegion(5, 30, 2, 38, 40, 40)
+        wholeTile = {}
+
+        for region in (None, validRegion):
+
+            for prefetch, minUsableFraction in ((0, None), (2, 0.0)):
+
+                with tempfile.TemporaryDirectory() as outDir:
+
+                    # Each alone
+                    br = FakeBandReader()
+                    alone = self._makeClassifiers(br, outDir, region)
+
+                    for classifier in alone:
+                        classifier.run()
+
+                    aloneBandsRead = br.numBandsRead
+
+                    # Together
+                    br = FakeBandReader()
+                    together = self._makeClassifiers(br, outDir, region)
+
+                    MultiClassifier(together,
+                                    prefetch=prefetch,
+                                    minUsableFraction=minUsableFraction).run()
+
+                    self.assertLess(br.numBandsRead, aloneBandsRead)
+
+                    for classifier, expected in zip(together, alone):
+
+                        self.assertEqual(len(classifier.outputs), 3)
+
+                        self.assertEqual(classifier.outputs.keys(),
+                                         expected.outputs.keys())
+
+                        for name, image in expected.outputs.items():
+
+                            np.testing.assert_array_equal(
+                                classifier.outputs[name], image)
+
+                            # ---
+                            # Reading only the valid region's window gives
+                            # the whole tile's classes inside it.
+                            # ---
+                            key = (classifier.getClassifierName(),
+                                   os.path.basename(name),
+                                   prefetch)
+
+                            if region:
+
+                                np.testing.assert_array_equal(
+                                    region.crop(image),
+                                    region.crop(wholeTile[key]))
+
+                            else:
+                                wholeTile[key] = image
+
+                    # The thresholds differ.
+                    name = list(alone[0].outputs.keys())[2]
+
+                    self.assertFalse(np.array_equal(
+                        together[0].outputs[name],
+                        together[1].outputs[name.replace('-A', '-B')]))
+
+    # -------------------------------------------------------------------------
+    # testRunParallel
+    # -------------------------------------------------------------------------
+    def testRunParallel(self):
+
+        validRegion = ValidRegion(5, 30, 2, 38, 40, 40)
+        logger = logging.getLogger('testRunParallel')
+
+        with tempfile.TemporaryDirectory() as serialDir:
+
+            serial = self._makeClassifiers(FakeBandReader(),
+                                           serialDir,
+                                           validRegion)
+
+            for classifier in serial:
+                classifier.run()
+
+            for useProcesses in (False, True):
+
+                with tempfile.TemporaryDirectory() as outDir:
+
+                    br = FakeBandReader()
+                    br.failDays.add(3)
+
+                    parallel = self._makeClassifiers(br, outDir, validRegion)
+
+                    with self.assertLogs(logger, logging.INFO) as logs:
+
+                        MultiClassifier(parallel,
+                                        logger=logger,
+                                        numWorkers=2,
+                                        useProcesses=useProcesses).run()
+
+                    messages = [record.getMessage()
+                                for record in logs.records]
+
+                    self.assertIn('Sensor MOD, day 3 skipped due to a ' +
+                                  'run-time error.',
+                                  messages)
+
+                    # The workers' records, too
+                    self.assertIn('Reading MOD tile h09v05 for day 1',
+                                  messages)
+
+                    self.assertIn('Creating ' +
+                                  os.path.join(outDir,
+                                               '2003-002-h09v05-MOD-B.tif'),
+                                  messages)
+
+                    # Days 1 and 2 are as a serial run writes them.
+                    for classifier in serial:
+
+                        for name, image in classifier.outputs.items():
+
+                            outFile = os.path.join(outDir,
+                                                   os.path.basename(name) +
+                                                   '.npy')
+
+                            if '-003-' in os.path.basename(name):
+                                self.assertFalse(os.path.exists(outFile))
+
+                            else:
+
+                                np.testing.assert_array_equal(
+                                    np.load(outFile), image)
+
+        with tempfile.TemporaryDirectory() as outDir:
+
+            with self.assertRaises(RuntimeError):
+
+                MultiClassifier(self._makeClassifiers(FakeBandReader(),
+                                                      outDir),
+                                prefetch=2,
+                                numWorkers=2)
+
+    # -------------------------------------------------------------------------
+    # testInit
+    # -------------------------------------------------------------------------
+    def testInit(self):
+
+        with tempfile.TemporaryDirectory() as outDir:
+
+            br = FakeBandReader()
+
+            with self.assertRaises(RuntimeError):
+                MultiClassifier([])
+
+            a, b = self._makeClassifiers(br, outDir)
+            b.name = 'A'
+
+            with self.assertRaises(RuntimeError):
+                MultiClassifier([a, b])
+
+            a, b = self._makeClassifiers(FakeBandReader(), outDir)
+            a._bandReader = br
+
+            with self.assertRaises(RuntimeError):
+                MultiClassifier([a, b])
+
+            # The valid regions differ.
+            a, b = self._makeClassifiers(br, outDir)
+            a._validRegion = ValidRegion(5, 30, 2, 38, 40, 40)
+
+            with self.assertRaises(RuntimeError):
+                MultiClassifier([a, b])
+
+            b._validRegion = ValidRegion(5, 30, 2, 38, 40, 40)
+            MultiClassifier([a, b])
+
+            a, b = self._makeClassifiers(br, outDir)
+            multi = MultiClassifier([a, b])
+
+            self.assertEqual(multi.getClassifierName(), 'A+B')
+            self.assertEqual(br.bands, a._bands | b._bands)
@@ -0,0 +1,90 @@
+import unittest
+import warnings
+
+import numpy as np
+
+from modis_water.model.NormalizedDifference import NormalizedDifference
+
+
+# -----------------------------------------------------------------------------
+# class NormalizedDifferenceTestCase
+#
+# python -m unittest modis_water.model.tests.test_NormalizedDifference
+# -----------------------------------------------------------------------------
+class NormalizedDifferenceTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # _floatNd
+    #
+    # The float64 expression the classifiers used before.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _floatNd(x, y):
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+
+            nd = (((x - y) / (x + y)) * 10000).astype(np.int16)
+            return np.where(x + y != 0, nd, 0)
+
+    # -------------------------------------------------------------------------
+    # testMatchesFloat
+    # -------------------------------------------------------------------------
+    def testMatchesFloat(self):
+
+        rng = np.random.default_rng(0)
+
+        # Full int16 range, so the sums and differences wrap around.
+        x = rng.integers(-32768, 32768, 1000000).astype(np.int16)
+        y = rng.integers(-32768, 32768, 1000000).astype(np.int16)
+
+        with warnings.catch_warnings():
+
+            warnings.simplefilter('error')
+            nd = NormalizedDifference.compute(x, y)
+
+        self.assertEqual(nd.dtype, np.int16)
+        self.assertTrue(np.array_equal(nd, self._floatNd(x, y)))
+
+        # Every pair in a typical reflectance range
+        values = np.arange(-300, 301, dtype=np.int16)
+        x, y = np.meshgrid(values, values)
+
+        self.assertTrue(np.array_equal(NormalizedDifference.compute(x, y),
+                                       self._floatNd(x, y)))
+
+    # -------------------------------------------------------------------------
+    # testExactQuotients
+    #
+    # Quotients that are integers, where float64 can land just below.
+    # -------------------------------------------------------------------------
+    def testExactQuotients(self):
+
+        # (n, d) with d dividing n * 10000, as x = (n + d) / 2, y = (d - n) / 2
+        pairs = [(-26724, -32750), (-22707, -32625), (-22494, -32600),
+                 (-26520, -32500), (-32562, -32400), (-22533, -32375),
+                 (2, 4), (-3, 5)]
+
+        x = np.array([(n + d) // 2 for n, d in pairs], dtype=np.int16)
+        y = np.array([(d - n) // 2 for n, d in pairs], dtype=np.int16)
+
+        self.assertTrue(np.array_equal(x - y, [n for n, d in pairs]))
+
+        # Float64 lands one below the exact quotient, 8160, here.
+        self.assertEqual(self._floatNd(x, y)[0], 8159)
+
+        self.assertTrue(np.array_equal(NormalizedDifference.compute(x, y),
+                                       self._floatNd(x, y)))
+
+    # -------------------------------------------------------------------------
+    # testOut
+    # -------------------------------------------------------------------------
+    def testOut(self):
+
+        img = np.zeros((4, 3), dtype=np.int16)
+        img[:, 0] = [300, 0, -5, 7]
+        img[:, 1] = [100, 0, 5, 0]
+
+        out = NormalizedDifference.compute(img[:, 0], img[:, 1], img[:, 2])
+
+        self.assertTrue(np.shares_memory(out, img))
+        self.assertEqual(img[:, 2].tolist(), [5000, 0, 0, 10000])
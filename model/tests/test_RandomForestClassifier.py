@@ -0,0 +1,108 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+try:
+    from sklearn.ensemble import RandomForestClassifier as SkForest
+    SKLEARN_AVAILABLE = True
+
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+from modis_water.model import RandomForestClassifier as rfModule
+from modis_water.model.RandomForestClassifier import RandomForestClassifier
+
+
+# -----------------------------------------------------------------------------
+# class FakeBandReader
+# -----------------------------------------------------------------------------
+class FakeBandReader(object):
+
+    def sensors(self):
+        return set(['MOD'])
+
+    def setBands(self, bands):
+        self.bands = set(bands)
+
+
+# -----------------------------------------------------------------------------
+# class RandomForestClassifierTestCase
+#
+# python -m unittest modis_water.model.tests.test_RandomForestClassifier
+# -----------------------------------------------------------------------------
+@unittest.skipUnless(SKLEARN_AVAILABLE, 'scikit-learn is not installed.')
+class RandomForestClassifierTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # _makeClassifier
+    #
+    # A classifier of a small forest, in place of the model file.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _makeClassifier(forest, outDir, **kwargs):
+
+        with patch.object(rfModule.joblib, 'load', return_value=forest), \
+             patch.object(RandomForestClassifier,
+                          '_hashFile',
+                          return_value='abc'):
+
+            return RandomForestClassifier(FakeBandReader(),
+                                          2003,
+                                          'h09v05',
+                                          outDir,
+                                          set(['MOD']),
+                                          **kwargs)
+
+    # -------------------------------------------------------------------------
+    # testPredict
+    # -------------------------------------------------------------------------
+    def testPredict(self):
+
+        rng = np.random.default_rng(0)
+        features = rng.integers(-1000, 9000, (4500, 10)).astype(np.int16)
+        labels = (features[:, 4] < features[:, 1]).astype(int)
+
+        forest = SkForest(n_estimators=8, max_depth=8, random_state=0)
+        forest.fit(features, labels)
+        expected = forest.predict(features)
+
+        with tempfile.TemporaryDirectory() as outDir:
+
+            # Five chunks, the last of 500 pixels, on several threads
+            for compileModel in (False, True):
+
+                rf = RandomForestClassifierTestCase._makeClassifier(
+                    forest,
+                    outDir,
+                    numThreads=3,
+                    chunkSize=1000,
+                    compileModel=compileModel)
+
+                with patch.object(rf._predictor,
+                                  'predict',
+                                  wraps=rf._predictor.predict) as predict:
+
+                    predictions = rf._predict(features)
+
+                chunkSizes = sorted([call.args[0].shape[0]
+                                     for call in predict.call_args_list])
+
+                self.assertEqual(chunkSizes, [500, 1000, 1000, 1000, 1000])
+                self.assertEqual(predictions.dtype, np.int16)
+                np.testing.assert_array_equal(predictions, expected)
+
+            # One chunk on one thread
+            rf = RandomForestClassifierTestCase._makeClassifier(
+                forest,
+                outDir,
+                numThreads=1)
+
+            np.testing.assert_array_equal(rf._predict(features), expected)
+
+            with self.assertRaises(RuntimeError):
+
+                RandomForestClassifierTestCase._makeClassifier(forest,
+                                                               outDir,
+                                                               chunkSize=0)
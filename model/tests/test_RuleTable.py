@@ -0,0 +1,119 @@
+import unittest
+
+import numpy as np
+
+from modis_water.model.Classifier import Classifier
+from modis_water.model.RuleTable import RuleTable
+from modis_water.model.SimpleClassifier import SimpleClassifier
+
+
+# -----------------------------------------------------------------------------
+# class RuleTableTestCase
+#
+# python -m unittest modis_water.model.tests.test_RuleTable
+# -----------------------------------------------------------------------------
+class RuleTableTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # _classify
+    #
+    # The rules as SimpleClassifier wrote them before the rule table.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _classify(red, nir, blue, swir5, swir7, ndvi):
+
+        ndviBadCalculation = (red + nir) == 0
+
+        subcondition1 = (swir5 >= 453) & (blue < 675) & (nir > 1000)
+        land1 = (swir5 < 1017) & (swir7 < 773) & subcondition1
+        water1 = (swir5 < 1017) & (swir7 < 773) & ~subcondition1
+
+        water2 = (swir5 >= 1017) & (nir < 1777) & (ndvi < 825) & \
+            (blue < 651)
+
+        land2 = (swir5 >= 1017) & (nir < 1777) & (ndvi < 825) & \
+            (blue >= 651)
+
+        land3 = (swir5 >= 1017) & (nir < 1777) & (ndvi >= 825) & \
+            (ndvi < 4125) & (nir >= 1329) & (swir7 < 1950)
+
+        land4 = (swir5 >= 1017) & (nir < 1777) & (ndvi >= 825) & \
+            (ndvi >= 4125)
+
+        land5 = (swir5 >= 1017) & (nir >= 1777)
+
+        predictions = np.full(red.shape, Classifier.NO_DATA)
+        predictions[water1 | water2] = Classifier.WATER
+        predictions[land1 | land2 | land3 | land4 | land5] = Classifier.LAND
+
+        return np.where(ndviBadCalculation, Classifier.NO_DATA, predictions)
+
+    # -------------------------------------------------------------------------
+    # testSimpleRules
+    # -------------------------------------------------------------------------
+    def testSimpleRules(self):
+
+        rng = np.random.default_rng(0)
+        shape = (300, 300)
+
+        # Draw values around every threshold, so each branch is taken.
+        edges = np.array(sorted(SimpleClassifier.THRESHOLDS.values()))
+        edges = np.concatenate([edges - 1, edges, edges + 1, [-100, 5000]])
+
+        def band():
+            return rng.choice(edges, shape).astype(np.int16)
+
+        red, nir, blue, swir5, swir7 = band(), band(), band(), band(), band()
+        red[0, :10] = -nir[0, :10]
+        ndvi = rng.choice(np.concatenate([edges, -edges]), shape)
+        ndvi = ndvi.astype(np.int16)
+
+        expected = RuleTableTestCase._classify(red, nir, blue, swir5, swir7,
+                                               ndvi)
+
+        table = RuleTable(SimpleClassifier.PREDICATES,
+                          SimpleClassifier.RULES,
+                          SimpleClassifier.THRESHOLDS,
+                          Classifier.NO_DATA)
+
+        inputs = {'nir': nir,
+                  'blue': blue,
+                  'swir5': swir5,
+                  'swir7': swir7,
+                  'ndvi': ndvi,
+                  'redPlusNir': red + nir}
+
+        predictions = table.apply(inputs)
+
+        self.assertEqual(predictions.dtype, np.int16)
+        self.assertTrue(np.array_equal(predictions, expected))
+
+        for value in [Classifier.NO_DATA, Classifier.LAND, Classifier.WATER]:
+            self.assertTrue((predictions == value).any())
+
+    # -------------------------------------------------------------------------
+    # testThresholds
+    # -------------------------------------------------------------------------
+    def testThresholds(self):
+
+        table = RuleTable({'high': ('x', '>=', 'cut')},
+                          [(1, ['high']), (0, ['~high'])],
+                          {'cut': 10},
+                          -1)
+
+        x = np.array([[5, 10], [15, 20]])
+        out = np.zeros(x.shape, dtype=np.int8)
+
+        self.assertTrue(np.array_equal(table.apply({'x': x}, out),
+                                       [[0, 1], [1, 1]]))
+
+        table.setThresholds({'cut': 16})
+        self.assertTrue(np.array_equal(table.apply({'x': x}),
+                                       [[0, 0], [0, 1]]))
+
+        with self.assertRaises(RuntimeError):
+            table.setThresholds({'unknown': 1})
+
+        with self.assertRaises(RuntimeError):
+            RuleTable({'high': ('x', '>=', 'cut')}, [(1, ['low'])],
+                      {'cut': 10}, -1)
@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+
+from modis_water.model.ValidRegion import ValidRegion
+
+
+# -----------------------------------------------------------------------------
+# class ValidRegionTestCase
+#
+# python -m unittest modis_water.model.tests.test_ValidRegion
+# -----------------------------------------------------------------------------
+class ValidRegionTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testFromPostProcessingMask
+    # -------------------------------------------------------------------------
+    def testFromPostProcessingMask(self):
+
+        outside = ValidRegion.OUTSIDE_BIT_MASK
+        mask = np.full((10, 12), outside, dtype=np.uint16)
+
+        # Valid pixels, other bits notwithstanding
+        mask[2, 5] = 8
+        mask[6, 3] = 16 | 1
+
+        # Pixels with only one of the bits are inside the projection.
+        mask[4, 9] = ValidRegion.ANC_NODATA_BIT_MASK
+        mask[7, 4] = ValidRegion.OOP_BIT_MASK | 4
+
+        region = ValidRegion.fromPostProcessingMask(mask)
+
+        self.assertEqual(region.getWindow(), (2, 8, 3, 10))
+        self.assertEqual(region.getShape(), (6, 7))
+        self.assertEqual(region.getTileShape(), (10, 12))
+        self.assertEqual(region.getSize(), 42)
+        self.assertAlmostEqual(region.getFraction(), 42 / 120)
+
+        # Every pixel outside the window has both bits.
+        outsideWindow = np.ones(mask.shape, dtype=bool)
+        region.crop(outsideWindow)[...] = False
+
+        self.assertTrue((mask[outsideWindow] & outside == outside).all())
+
+        # No valid pixels
+        region = ValidRegion.fromPostProcessingMask(
+            np.full((10, 12), outside, dtype=np.uint16))
+
+        self.assertEqual(region.getShape(), (0, 0))
+        self.assertEqual(region.getFraction(), 0)
+
+    # -------------------------------------------------------------------------
+    # testCropExpand
+    # -------------------------------------------------------------------------
+    def testCropExpand(self):
+
+        region = ValidRegion(1, 3, 2, 5, 4, 6)
+        array = np.arange(24, dtype=np.int16).reshape(4, 6)
+
+        cropped = region.crop(array)
+        np.testing.assert_array_equal(cropped, [[8, 9, 10], [14, 15, 16]])
+
+        bandDict = region.cropBands({'a': array, 'b': array + 1})
+        np.testing.assert_array_equal(bandDict['b'], cropped + 1)
+
+        expanded = region.expand(cropped, -9999)
+        self.assertEqual(expanded.dtype, np.int16)
+        self.assertEqual(expanded.shape, (4, 6))
+        np.testing.assert_array_equal(region.crop(expanded), cropped)
+        self.assertEqual((expanded == -9999).sum(), 18)
+
+        out = np.zeros((4, 6), dtype=np.int16)
+        self.assertIs(region.expand(cropped, -9999, out), out)
+        np.testing.assert_array_equal(out, expanded)
+
+        with self.assertRaises(RuntimeError):
+            region.crop(np.zeros((6, 4)))
+
+        with self.assertRaises(RuntimeError):
+            ValidRegion(3, 1, 0, 6, 4, 6)
@@ -6,15 +6,16 @@ from pathlib import Path
 import sys
 
 from modis_water.model.AnnualMap import AnnualMap
+from modis_water.model.BandCache import BandCache
 from modis_water.model.BandReaderModis import BandReaderModis
 from modis_water.model.BurnScarMap import BurnScarMap
+from modis_water.model.MultiClassifier import MultiClassifier
 from modis_water.model.QAMap import QAMap
-
-# Disabling per comment in README.
-# from modis_water.model.RandomForestClassifier import RandomForestClassifier
-
+from modis_water.model.RandomForestClassifier import RandomForestClassifier
+from modis_water.model.RuleTable import RuleTable
 from modis_water.model.SevenClass import SevenClassMap
 from modis_water.model.SimpleClassifier import SimpleClassifier
+from modis_water.model.ValidRegion import ValidRegion
 
 
 # -----------------------------------------------------------------------------
@@ -36,9 +37,12 @@ def main():
     parser = argparse.ArgumentParser(description=desc)
 
     parser.add_argument('--classifier',
-                        default='simple',
+                        nargs='+',
+                        default=['simple'],
                         choices=['simple', 'rf'],
-                        help='Choose which classifier to use')
+                        help='Choose which classifier to use.  With more ' +
+                             'than one, each day is read and masked once ' +
+                             'for all of them')
 
     parser.add_argument('--sensor',
                         action='store',
@@ -84,12 +88,104 @@ def main():
                         action='store_true',
                         help='Write products out as geotiff instead of bin.')
 
+    parser.add_argument('--threads',
+                        default=1,
+                        type=int,
+                        help='Number of threads used to read the bands of ' +
+                             'a granule')
+
+    parser.add_argument('--indexDir',
+                        default=None,
+                        help='Directory in which to save granule indexes ' +
+                             'for reuse by later runs')
+
+    parser.add_argument('--granulePolicy',
+                        default=BandReaderModis.LATEST,
+                        choices=BandReaderModis.GRANULE_POLICIES,
+                        help='Which version of a reprocessed granule to read')
+
+    parser.add_argument('--backend',
+                        default=BandReaderModis.GDAL,
+                        choices=BandReaderModis.BACKENDS,
+                        help='Library used to read the HDF4 granules')
+
+    parser.add_argument('--cacheDir',
+                        default=None,
+                        help='Directory in which to cache decoded bands ' +
+                             'for reruns')
+
+    parser.add_argument('--cacheSize',
+                        default=100,
+                        type=float,
+                        help='Maximum size of the band cache in GiB')
+
+    parser.add_argument('--prefetch',
+                        default=0,
+                        type=int,
+                        help='Number of days to read ahead while the ' +
+                             'current day is classified')
+
+    parser.add_argument('--minUsableFraction',
+                        default=None,
+                        type=float,
+                        help='Read state and solar zenith first, and skip ' +
+                             'the other bands of days with no more than ' +
+                             'this fraction of usable pixels')
+
+    parser.add_argument('--workers',
+                        default=1,
+                        type=int,
+                        help='Number of days to read, classify and write ' +
+                             'at once')
+
+    parser.add_argument('--processes',
+                        action='store_true',
+                        help='Run the workers as processes, rather than ' +
+                             'threads')
+
+    parser.add_argument('--thresholds',
+                        default=None,
+                        help='JSON file of thresholds that replace those ' +
+                             'of the simple classifier')
+
+    parser.add_argument('--jit',
+                        action='store_true',
+                        help='Mask and classify each day with the ' +
+                             'Numba-compiled kernel, if Numba is installed')
+
+    parser.add_argument('--validRegion',
+                        action='store_true',
+                        help='Classify and post-process only the window of ' +
+                             'the tile inside the projection, according ' +
+                             'to the post-processing mask')
+
+    parser.add_argument('--predictThreads',
+                        default=None,
+                        type=int,
+                        help='Number of threads on which the random ' +
+                             'forest predicts; all cores by default')
+
+    parser.add_argument('--compileModel',
+                        action='store_true',
+                        help='Compile the random forest into flat arrays ' +
+                             'and predict from those')
+
+    parser.add_argument('--compiledModelDir',
+                        default=None,
+                        help='Directory in which to save the compiled ' +
+                             'random forest once, to memory-map it after')
+
     args = parser.parse_args()
 
     # ---
     # BandReader
     # ---
-    br = BandReaderModis(Path(args.mod))
+    br = BandReaderModis(
+        Path(args.mod),
+        numThreads=args.threads,
+        indexDir=Path(args.indexDir) if args.indexDir else None,
+        granulePolicy=args.granulePolicy,
+        backend=args.backend)
     sensors = set(args.sensor) & br.sensors()
     sensorStr = '.'.join(list(sensors))
 
@@ -104,7 +200,8 @@ def main():
     )
     
     ch.setFormatter(formatter)
-    logFileName = f'{args.y}.{args.t}.{args.classifier}{sensorStr}.log'
+    classifierStr = '+'.join(args.classifier)
+    logFileName = f'{args.y}.{args.t}.{classifierStr}{sensorStr}.log'
     fh = logging.FileHandler(os.path.join(args.o, logFileName))
     fh.setLevel(logging.INFO)
     fh.setFormatter(formatter)
@@ -113,40 +210,103 @@ def main():
     
     br.setLogger(logger)
 
+    if args.cacheDir:
+
+        br.setBandCache(BandCache(Path(args.cacheDir),
+                                  int(args.cacheSize * 1024 ** 3),
+                                  logger))
+
     # ---
     # Validate day range.
     # ---
     # if args.startDay > args.endDay:
     #     raise ValueError('The start day must be before the end day.')
 
-    classifier = None
-
-    if args.classifier == 'simple':
-
-        classifier = SimpleClassifier(br=br,
-                                      year=args.y,
-                                      tile=args.t,
-                                      outDir=args.o,
-                                      sensors=sensors,
-                                      startDay=1,  # args.startDay,
-                                      endDay=366,  # args.endDay,
-                                      logger=logger,
-                                      debug=args.debug)
-
-    # Disabled per comment in README.
-    # elif args.classifier == 'rf':
-    #
-    #     classifier = RandomForestClassifier(args.y,
-    #                                         args.t,
-    #                                         args.o,
-    #                                         args.mod,
-    #                                         startDay=1,  # args.startDay,
-    #                                         endDay=366,  # args.endDay,
-    #                                         logger=logger,
-    #                                         sensors=sensors,
-    #                                         debug=args.debug)
-
-    classifier.run()
+    # ---
+    # Valid region
+    # ---
+    validRegion = None
+
+    if args.validRegion:
+
+        validRegion = ValidRegion.fromPostProcessingMask(
+            QAMap._getPostProcessingMask(args.t,
+                                         args.postprocessing,
+                                         br.getCols(),
+                                         br.getRows()))
+
+    classifiers = []
+
+    if 'simple' in args.classifier:
+
+        thresholds = RuleTable.readThresholds(Path(args.thresholds)) \
+            if args.thresholds else None
+
+        classifiers.append(SimpleClassifier(
+            br=br,
+            year=args.y,
+            tile=args.t,
+            outDir=args.o,
+            sensors=sensors,
+            startDay=1,  # args.startDay,
+            endDay=366,  # args.endDay,
+            logger=logger,
+            debug=args.debug,
+            prefetch=args.prefetch,
+            minUsableFraction=args.minUsableFraction,
+            thresholds=thresholds,
+            jit=args.jit,
+            validRegion=validRegion,
+            numWorkers=args.workers,
+            useProcesses=args.processes))
+
+    if 'rf' in args.classifier:
+
+        compiledModelDir = Path(args.compiledModelDir) \
+            if args.compiledModelDir else None
+
+        classifiers.append(RandomForestClassifier(
+            br=br,
+            year=args.y,
+            tile=args.t,
+            outDir=args.o,
+            sensors=sensors,
+            startDay=1,  # args.startDay,
+            endDay=366,  # args.endDay,
+            logger=logger,
+            debug=args.debug,
+            prefetch=args.prefetch,
+            minUsableFraction=args.minUsableFraction,
+            validRegion=validRegion,
+            numThreads=args.predictThreads,
+            compileModel=args.compileModel,
+            compiledModelDir=compiledModelDir,
+            numWorkers=args.workers,
+            useProcesses=args.processes))
+
+    if len(classifiers) > 1:
+
+        MultiClassifier(classifiers,
+                        logger=logger,
+                        prefetch=args.prefetch,
+                        minUsableFraction=args.minUsableFraction,
+                        numWorkers=args.workers,
+                        useProcesses=args.processes).run()
+
+    else:
+        classifiers[0].run()
+
+    for classifier in classifiers:
+        postProcess(args, br, classifier.getClassifierName(), sensors,
+                    validRegion, logger)
+
+
+# -----------------------------------------------------------------------------
+# postProcess
+#
+# Create the annual map and final products of one classifier.
+# -----------------------------------------------------------------------------
+def postProcess(args, br, classifierName, sensors, validRegion, logger):
 
     # ---
     # Create the annual map.
@@ -159,10 +319,11 @@ def main():
             args.y,
             args.t,
             sensor,
-            classifier.getClassifierName(),
+            classifierName,
             logger,
             bandReader=br,
-            georeferenced=args.georeferenced)
+            georeferenced=args.georeferenced,
+            validRegion=validRegion)
 
         # ---
         # Post processing
@@ -173,7 +334,7 @@ def main():
             args.y,
             args.t,
             args.burn,
-            classifier.getClassifierName(),
+            classifierName,
             args.o,
             logger)
 
@@ -185,12 +346,13 @@ def main():
             postAnnualBurnScarPath,
             args.postprocessing,
             annualMapPath,
-            classifier.getClassifierName(),
+            classifierName,
             args.o,
             logger,
             bandReader=br,
             geoTiff=args.geotiff,
-            georeferenced=args.georeferenced)
+            georeferenced=args.georeferenced,
+            validRegion=validRegion)
 
         SevenClassMap.generateSevenClass(
             sensor,
@@ -198,7 +360,7 @@ def main():
             args.t,
             args.postprocessing,
             postAnnualPath,
-            classifier.getClassifierName(),
+            classifierName,
             args.o,
             logger,
             bandReader=br,
@@ -6,11 +6,14 @@ from pathlib import Path
 import sys
 
 from modis_water.model.AnnualMap import AnnualMap
+from modis_water.model.BandCache import BandCache
 from modis_water.model.BandReaderViirs import BandReaderViirs
 from modis_water.model.BurnScarMap import BurnScarMap
 from modis_water.model.QAMap import QAMap
+from modis_water.model.RuleTable import RuleTable
 from modis_water.model.SevenClass import SevenClassMap
 from modis_water.model.SimpleClassifier import SimpleClassifier
+from modis_water.model.ValidRegion import ValidRegion
 
 
 # -----------------------------------------------------------------------------
@@ -72,12 +75,88 @@ def main():
                         action='store_true',
                         help='Write products out as geotiff instead of bin.')
 
+    parser.add_argument('--threads',
+                        default=1,
+                        type=int,
+                        help='Number of threads used to read the bands of ' +
+                             'a granule')
+
+    parser.add_argument('--indexDir',
+                        default=None,
+                        help='Directory in which to save granule indexes ' +
+                             'for reuse by later runs')
+
+    parser.add_argument('--granulePolicy',
+                        default=BandReaderViirs.LATEST,
+                        choices=BandReaderViirs.GRANULE_POLICIES,
+                        help='Which version of a reprocessed granule to read')
+
+    parser.add_argument('--backend',
+                        default=BandReaderViirs.GDAL,
+                        choices=BandReaderViirs.BACKENDS,
+                        help='Library used to read the HDF5 granules')
+
+    parser.add_argument('--cacheDir',
+                        default=None,
+                        help='Directory in which to cache decoded bands ' +
+                             'for reruns')
+
+    parser.add_argument('--cacheSize',
+                        default=100,
+                        type=float,
+                        help='Maximum size of the band cache in GiB')
+
+    parser.add_argument('--prefetch',
+                        default=0,
+                        type=int,
+                        help='Number of days to read ahead while the ' +
+                             'current day is classified')
+
+    parser.add_argument('--minUsableFraction',
+                        default=None,
+                        type=float,
+                        help='Read state and solar zenith first, and skip ' +
+                             'the other bands of days with no more than ' +
+                             'this fraction of usable pixels')
+
+    parser.add_argument('--workers',
+                        default=1,
+                        type=int,
+                        help='Number of days to read, classify and write ' +
+                             'at once')
+
+    parser.add_argument('--processes',
+                        action='store_true',
+                        help='Run the workers as processes, rather than ' +
+                             'threads')
+
+    parser.add_argument('--thresholds',
+                        default=None,
+                        help='JSON file of thresholds that replace those ' +
+                             'of the simple classifier')
+
+    parser.add_argument('--jit',
+                        action='store_true',
+                        help='Mask and classify each day with the ' +
+                             'Numba-compiled kernel, if Numba is installed')
+
+    parser.add_argument('--validRegion',
+                        action='store_true',
+                        help='Classify and post-process only the window of ' +
+                             'the tile inside the projection, according ' +
+                             'to the post-processing mask')
+
     args = parser.parse_args()
 
     # ---
     # BandReader
     # ---
-    br = BandReaderViirs(Path(args.viirs))
+    br = BandReaderViirs(
+        Path(args.viirs),
+        numThreads=args.threads,
+        indexDir=Path(args.indexDir) if args.indexDir else None,
+        granulePolicy=args.granulePolicy,
+        backend=args.backend)
     sensors = set(args.sensor) & br.sensors()
     sensorStr = '.'.join(list(sensors))
 
@@ -100,10 +179,32 @@ def main():
     
     br.setLogger(logger)
 
+    if args.cacheDir:
+
+        br.setBandCache(BandCache(Path(args.cacheDir),
+                                  int(args.cacheSize * 1024 ** 3),
+                                  logger))
+
+    # ---
+    # Valid region
+    # ---
+    validRegion = None
+
+    if args.validRegion:
+
+        validRegion = ValidRegion.fromPostProcessingMask(
+            QAMap._getPostProcessingMask(args.t,
+                                         args.postprocessing,
+                                         br.getCols(),
+                                         br.getRows()))
+
     classifier = None
 
     if args.classifier == 'simple':
 
+        thresholds = RuleTable.readThresholds(Path(args.thresholds)) \
+            if args.thresholds else None
+
         classifier = SimpleClassifier(br=br,
                                       year=args.y,
                                       tile=args.t,
@@ -112,7 +213,14 @@ def main():
                                       startDay=1,  # args.startDay,
                                       endDay=366,  # args.endDay,
                                       logger=logger,
-                                      debug=args.debug)
+                                      debug=args.debug,
+                                      prefetch=args.prefetch,
+                                      minUsableFraction=args.minUsableFraction,
+                                      thresholds=thresholds,
+                                      jit=args.jit,
+                                      validRegion=validRegion,
+                                      numWorkers=args.workers,
+                                      useProcesses=args.processes)
 
     classifier.run()
 
@@ -130,7 +238,8 @@ def main():
             classifier.getClassifierName(),
             logger,
             bandReader=br,
-            georeferenced=args.georeferenced)
+            georeferenced=args.georeferenced,
+            validRegion=validRegion)
 
         # ---
         # Post processing
@@ -158,7 +267,8 @@ def main():
             logger,
             bandReader=br,
             geoTiff=args.geotiff,
-            georeferenced=args.georeferenced)
+            georeferenced=args.georeferenced,
+            validRegion=validRegion)
 
         SevenClassMap.generateSevenClass(
             sensor,